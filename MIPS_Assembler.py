@@ -1,5 +1,15 @@
-import re
 import os
+import struct
+import hashlib
+import pickle
+import bisect
+import difflib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from MIPS_Object import pack_object, read_object, OBJECT_EXTENSION
+from MIPS_Data import assemble_data, DATA_BASE
 
 # List of instructions that can be translated
 # Index: R = 0 to 26, I = 27 to 52, J = 53 to 54
@@ -80,146 +90,695 @@ register_names = [
     "$fp", "$ra",
     ]
 
-def Parse_Instructions(tokens):
-    if ':' in tokens[0] and len(tokens) == 1:
-        return '0'      # Returns 0 if there is only label but no instructions
-    final_list = tokens
-    if ':' in tokens[0]:        # Removes label
-        final_list = tokens[1:]
-    for ind in range(len(instructions)):
-        if instructions[ind] == final_list[0]:      # Find a match from the instructions list
-            information = instructions_formats[ind].split()
-            parsed_dict = {}
-            for i in range(len(information)):
-                if i == 0:
-                    parsed_dict['index'] = ind      # Appends dictionary with the index of the instruction
-                    parsed_dict['operation'] = information[i]
-                else:
-                    parsed_dict[information[i]] = final_list[i]
-                    if information[i] == 'address':
-                        # Splits address in the form of imm(rs) into imm and rs, and place them in the final dictionary
-                        tem = re.split(r'(?:via|[\(\)])+', final_list[i])
-                        parsed_dict['imm'] = tem[0]
-                        parsed_dict['rs'] = tem[1]
-            return parsed_dict
-    return '0'      # Returns 0 if the operation is not found in the instructions list
-
-def Assemble(index, final_string):
-    binary_string = ''
-    if (index >= 0) and (index <= 26):  # R-type instructions
-        bin_length = [6, 5, 5, 5, 5, 6]
-        for elem in range(len(final_string)):
-            if (elem == 0) or (elem == 5):  # Hexadecimal to binary for the opcode, function
-                scale = 16
-                num_of_bits = bin_length[elem]
-                binary_string += bin(int(final_string[elem], scale))[2:].zfill(num_of_bits)
-            else:  # Decimal to binary for the rs, rt, rd, sa
-                num_of_bits = bin_length[elem]
-                binary_string += bin(int(final_string[elem], 10))[2:].zfill(num_of_bits)
-    elif (index >= 27) and (index <= 52):  # I-type instructions
-        bin_length = [6, 5, 5, 16]
-        for elem in range(len(final_string)):
-            if elem == 0:  # Hexadecimal to binary for the opcode(6)
-                binary_string += bin(int(final_string[elem], 16))[2:].zfill(6)
-            else:  # Decimal to binary for the rs, rt, imm
-                scale = 10
-                num_of_bits = bin_length[elem]
-                if '-' in final_string[elem]:  # Find the complement for negative integers
-                    val = final_string[elem][1:]
-                    initial = bin(int(final_string[elem], scale) + 1)[2:].zfill(num_of_bits)
-                    complement = ''
-                    for dig in initial:
-                        if dig == '1':
-                            complement += '0'
-                        else:
-                            complement += '1'
-                    binary_string += complement
+# Lookup tables ------------------------------------------------------------------------------------
+
+TEXT_BASE = 0x400000
+
+# Index of each instruction in the instructions list
+instruction_indices = {name: index for index, name in enumerate(instructions)}
+
+# Register number of each register name, and of its numeric form ($0 to $31)
+register_numbers = {name: number for number, name in enumerate(register_names)}
+register_numbers.update(("$" + str(number), number) for number in range(32))
+
+# Operands of each instruction in the order they are written, at the same index as the instructions list
+operand_names = [instruction_format.split()[1:] for instruction_format in instructions_formats]
+
+# Encoding of each instruction, at the same index as the instructions list
+# (word with the constant fields set, [(operand, shift, mask)] of the fields taken from the operands)
+encodings = []
+for index in range(len(instructions)):
+    if index <= 26:     # R-type instructions: opcode rs rt rd shamt function
+        shifts = [26, 21, 16, 11, 6, 0]
+        widths = [6, 5, 5, 5, 5, 6]
+        hexadecimal = [0, 5]
+    elif index <= 52:   # I-type instructions: opcode rs rt imm
+        shifts = [26, 21, 16, 0]
+        widths = [6, 5, 5, 16]
+        hexadecimal = [0]
+    else:               # J-type instructions: opcode target
+        shifts = [26, 0]
+        widths = [6, 26]
+        hexadecimal = [0]
+    base = 0
+    fields = []
+    for elem, part in enumerate(translations[index].split()):
+        if part in ('rs', 'rt', 'rd', 'shamt', 'imm', 'labl', 'targ'):
+            fields.append((part, shifts[elem], (1 << widths[elem]) - 1))
+        else:
+            base |= int(part, 16 if elem in hexadecimal else 10) << shifts[elem]
+    encodings.append((base, fields))
+
+
+# Encoding -----------------------------------------------------------------------------------------
+
+def parse_integer(token):
+    # Decimal, or hexadecimal with 0x
+    if token == "":
+        return 0
+    if token.lstrip('+-').startswith(('0x', '0X')):
+        return int(token, 16)
+    return int(token, 10)
+
+def parse_operands(index, tokens):
+    # Returns a dictionary of the operands of an instruction, from its tokens after the mnemonic
+    names = operand_names[index]
+    if len(tokens) < len(names):
+        raise ValueError(instructions[index] + " needs operands " + ", ".join(names))
+    operands = {}
+    for name, token in zip(names, tokens):
+        if name == 'address':
+            # Splits address in the form of imm(rs) into imm and rs
+            imm, _, rs = token.partition('(')
+            operands['imm'] = imm
+            operands['rs'] = rs.rstrip(')')
+        else:
+            operands[name] = token
+    return operands
+
+def label_field(field, label_address, address):
+    if field == 'labl':
+        # Signed difference between the address of the following instruction and the label, in words
+        difference = (label_address - (address + 4)) >> 2
+        if not -0x8000 <= difference < 0x8000:
+            raise ValueError("Branch to address " + hex(label_address) + " out of range")
+        return difference & 0xFFFF
+    return (label_address & 0x0FFFFFFF) >> 2       # Word address within the 256MB region
+
+def encode_instruction(index, operands, address, Labels):
+    # Returns the word of the instruction at address, every label it uses must be in Labels
+    base, fields = encodings[index]
+    word = base
+    for field, shift, mask in fields:
+        if field == 'labl' or field == 'targ':
+            label = operands['label' if field == 'labl' else 'target']
+            if label not in Labels:
+                raise ValueError("Undefined label " + label)
+            word |= label_field(field, Labels[label], address)
+        elif field == 'shamt' or field == 'imm':
+            word |= (parse_integer(operands.get(field, "")) & mask) << shift
+        else:
+            name = operands.get(field)
+            if name is None:
+                continue        # Not written for this instruction (rs of sll, srl and sra)
+            if name not in register_numbers:
+                raise ValueError("Unknown register " + name)
+            word |= register_numbers[name] << shift
+    return word
+
+
+# Assembled program --------------------------------------------------------------------------------
+
+# Changes whenever the machine code or labels produced for a source change, so that cached programs are assembled
+# again
+ASSEMBLER_VERSION = 4
+
+class AssembledProgram:
+    # Result of assemble(): machine code of the instructions under .text (one word each), image of the static
+    # data, addresses of the text labels and of the data labels, and the source lines under .text
+
+    def __init__(self, machine_code, data, labels, data_labels, text_lines):
+        self.machine_code = machine_code
+        self.data = data
+        self.labels = labels
+        self.data_labels = data_labels
+        self.text_lines = text_lines
+
+    def binary_strings(self):
+        return [bin(word)[2:].zfill(32) for word in self.machine_code]
+
+    def to_text(self):
+        # Text output, one line of 32 '0'/'1' characters per instruction
+        return "".join(binary_string + "\n" for binary_string in self.binary_strings())
+
+    def to_object(self):
+        # Data and text labels are separate namespaces, so both are kept when they share a name. They are written
+        # in address order, whatever the order they were found in
+        return pack_object(self.machine_code, self.data,
+                           sorted(self.data_labels.items(), key=lambda item: (item[1], item[0])) +
+                           sorted(self.labels.items(), key=lambda item: (item[1], item[0])))
+
+    def write(self, output_name):
+        # Writes a binary object if output_name ends in .mobj, and the text output otherwise
+        if output_name.endswith(OBJECT_EXTENSION):
+            with open(output_name, 'wb') as output_file:
+                output_file.write(self.to_object())
+        else:
+            with open(output_name, 'w', encoding="utf-8") as output_file:
+                output_file.write(self.to_text())
+
+
+def get_text_lines(source):
+    # Lines under .text, as kept by assemble()
+    return scan_text(source, TEXT_BASE)[0]
+
+def assemble(source, cache_directory=None):
+    # Assembles the MIPS source text and returns an AssembledProgram
+    # With cache_directory, the program is kept there as an object file named by a hash of the source, and
+    # read back instead of being assembled again when the same source comes back
+    if cache_directory is not None:
+        key = hashlib.sha256((str(ASSEMBLER_VERSION) + "\n" + source).encode('utf-8')).hexdigest()
+        cache_name = os.path.join(cache_directory, key + OBJECT_EXTENSION)
+        if os.path.isfile(cache_name):
+            with open(cache_name, 'rb') as cache_file:
+                cached = read_object(cache_file.read())
+            machine_code = list(struct.unpack('<' + str(len(cached['text']) // 4) + 'I', cached['text']))
+            labels = {}
+            data_labels = {}
+            for name, address in cached['symbols']:
+                if address >= DATA_BASE:
+                    data_labels[name] = address
                 else:
-                    binary_string += bin(int(final_string[elem], scale))[2:].zfill(num_of_bits)
-    elif (index >= 53) and (index <= 54):  # J-type instructions
-        for elem in range(len(final_string)):
-            if elem == 0:  # Hexadecimal to binary for the opcode(6)
-                binary_string += bin(int(final_string[elem], 16))[2:].zfill(6)
-            elif elem == 1:  # Decimal to binary for the target(26)
-                binary_string += bin(int(final_string[elem], 10))[2:].zfill(26)
-    return binary_string
-
-
-# Phase 1 (Parse instructions, Get labels) -----------------------------------------------------------
-
-filename = input('Enter assembly text file name (Must be in same folder): ')
-while not os.path.exists(filename):
-    filename=input("Your input is wrong, please enter the correct name: ")
-assembly_file = open(filename, 'r')
-
-Labels = {}         # Stores address of labels
-All_Lines = []
-Text_Lines = []     # Stores MIPS code under .text
-text_segment = 0
-Memory = []         # Stores dictionary of parsed instructions
-
-line_address = int(hex(0x400000), 16)
-for line in assembly_file:
-    line = line.replace("\n", "").replace("\t", "")
-    if line == "":
-        continue
-    final_line = line.split('#')[0]      # Removes comments
-    All_Lines.append(final_line)
-    if text_segment == 1:
+                    labels[name] = address
+            return AssembledProgram(machine_code, bytearray(cached['data']), labels, data_labels,
+                                    get_text_lines(source))
+
+    # A first pass gets every label and instruction line, then the instructions are encoded
+    Text_Lines, Labels, Instruction_Lines, Instruction_Sources = scan_text(source, TEXT_BASE)
+    Machine_Code = encode_lines(Instruction_Lines, TEXT_BASE, Labels, Instruction_Sources)
+
+    Data_Image, Data_Labels = assemble_data(source)
+    program = AssembledProgram(Machine_Code, Data_Image, Labels, Data_Labels, Text_Lines)
+
+    if cache_directory is not None:
+        os.makedirs(cache_directory, exist_ok=True)
+        temporary_name = cache_name + "." + str(os.getpid())
+        with open(temporary_name, 'wb') as cache_file:
+            cache_file.write(program.to_object())
+        os.replace(temporary_name, cache_name)       # Other processes never see a partly written file
+    return program
+
+
+# Parallel and multi-file assembly -----------------------------------------------------------------
+
+# Number of instructions encoded by a worker process at a time
+CHUNK_SIZE = 20000
+
+# Labels of all the sources, kept by each worker process
+worker_labels = None
+
+
+# What a line under .text holds, as flags: a text line is a line kept once its tabs are removed
+TEXT_LINE = 1
+INSTRUCTION_LINE = 2
+LABEL_LINE = 4
+
+
+def text_section(lines):
+    # Lines after the first one holding .text
+    for position, line in enumerate(lines):
+        if '.text' in line.replace("\t", ""):
+            return lines[position + 1:]
+    return []
+
+def scan_text(source, address):
+    # Returns the lines under .text, the address of the labels they define, each instruction without its label
+    # or comment, and the line under .text holding each instruction, the first instruction being placed at address
+    return scan_text_lines(text_section(source.splitlines()), address)[:4]
+
+def scan_text_lines(lines, address):
+    # scan_text on lines under .text, also returning the flags of each line
+    Text_Lines = []
+    Labels = {}
+    Instruction_Lines = []
+    Instruction_Sources = []
+    Kinds = []
+    for line in lines:
+        line = line.replace("\t", "")
+        if line == "":
+            Kinds.append(0)
+            continue
         Text_Lines.append(line)
-        tokens = re.split(r'(?:via|[ ,])+', final_line)     # Splits line by spaces and commas
-        final_tokens = []
-        for string in tokens:
-            if string != '':    # Removes empty string from list
-                final_tokens.append(string)
-        parsed_line = Parse_Instructions(final_tokens)      # Parse the instructions
-        if ':' in line:
-            label = line.split(':')[0]
-            label_index = line_address
-            Labels[label] = label_index     # Stores index of labels
-        if parsed_line != '0':
-            Memory.append(parsed_line)      # Stores parsed instructions to a list
-            line_address += 4
-    if '.text' in line:
-        text_segment = 1
-
-
-# Phase 2 (Assemble to machine code) ------------------------------------------------------------------
-
-output_name = input('Enter output file name (eg: my_output.txt): ')
-output_file = open(output_name, 'w', encoding="utf-8")
-PC = int(hex(0x400000), 16)     # Initial address is set to 0x40000
-for dic in Memory:
-    if dic == {}:
-        continue
+        kind = TEXT_LINE
+        final_line = line.split('#')[0]      # Removes comments
+        if ':' in final_line:
+            label, final_line = final_line.split(':', 1)
+            Labels[label.strip()] = address
+            kind |= LABEL_LINE
+        tokens = final_line.replace(',', ' ').split()
+        if tokens and tokens[0] in instruction_indices:      # Lines without an instruction are skipped
+            Instruction_Lines.append(final_line)
+            Instruction_Sources.append(line)
+            address += 4
+            kind |= INSTRUCTION_LINE
+        Kinds.append(kind)
+    return Text_Lines, Labels, Instruction_Lines, Instruction_Sources, Kinds
+
+def encode_lines(lines, address, Labels, sources=None):
+    # Returns the words of instructions placed from address, each line holding one instruction without its label
+    # or comment. All labels must be in Labels. Errors quote the line of sources at the same position if given
+    Machine_Code = []
+    for position, final_line in enumerate(lines):
+        tokens = final_line.replace(',', ' ').split()
+        index = instruction_indices[tokens[0]]
+        try:
+            word = encode_instruction(index, parse_operands(index, tokens[1:]), address, Labels)
+        except ValueError as error:
+            raise ValueError(str(error) + " in line: " + (final_line if sources is None else sources[position]))
+        Machine_Code.append(word)
+        address += 4
+    return Machine_Code
+
+def start_encoder(Labels):
+    global worker_labels
+    worker_labels = Labels
+
+def encode_chunk(lines, address, sources):
+    return encode_lines(lines, address, worker_labels, sources)
+
+def assemble_files(sources, workers=None, chunk_size=CHUNK_SIZE):
+    # Assembles several MIPS sources into one program and returns an AssembledProgram
+    # Their .text sections follow each other from 0x400000 and their static data from 0x500000 (each file's data
+    # starting on a word), and labels are shared by all the files. As in a single source, data labels and text
+    # labels are apart, so a name may be both
+    # A first pass gets every label, then chunks of instructions are encoded in parallel by worker processes
+    # The result is the same as assemble() on a single source, whatever the number of workers
+    Labels = {}
+    Data_Labels = {}
+    Text_Lines = []
+    Instruction_Lines = []      # Each instruction without its label or comment
+    Instruction_Sources = []
+    Data_Image = bytearray()
+
+    for source in sources:
+        Data_Image += bytes(-len(Data_Image) % 4)
+        image, labels = assemble_data(source, DATA_BASE + len(Data_Image))
+        Data_Image += image
+        file_text_lines, file_labels, file_instruction_lines, file_sources = scan_text(
+            source, TEXT_BASE + 4 * len(Instruction_Lines))
+        Text_Lines.extend(file_text_lines)
+        Instruction_Lines.extend(file_instruction_lines)
+        Instruction_Sources.extend(file_sources)
+        for label in labels:
+            if label in Data_Labels:
+                raise ValueError("Data label " + label + " is defined in more than one file")
+        for label in file_labels:
+            if label in Labels:
+                raise ValueError("Label " + label + " is defined in more than one file")
+        Data_Labels.update(labels)
+        Labels.update(file_labels)
+
+    if workers == 1 or len(Instruction_Lines) <= chunk_size:
+        Machine_Code = encode_lines(Instruction_Lines, TEXT_BASE, Labels, Instruction_Sources)
     else:
-        PC += 4
-        index = dic['index']
-        wanted_string = translations[index].split()
-        final_string = []
-        for comp in wanted_string:
-            if comp == 'rs' or comp == 'rt' or comp == 'rd':
-                for name_index in range(len(register_names)):
-                    if register_names[name_index] == dic[comp]:
-                        final_string.append(str(name_index))        # Covert to register number (index at register list)
-            elif comp == 'shamt' or comp == 'imm':
-                final_string.append(dic[comp])
-            elif comp == 'labl':
-                # Take the signed difference between the address of the following instruction and target label
-                # Drop the two low order bits
-                difference = (Labels[dic['label']] - PC) / 4
-                final_string.append(str(int(difference)))
-            elif comp == 'targ':
-                adr = str(Labels[dic['target']])
-                adr = bin(int(adr, 10))[2:].zfill(32)
-                adr = adr[4:]
-                adr = int(adr, 2)
-                adr = int(adr / 4)
-                final_string.append(str(adr))
+        starts = range(0, len(Instruction_Lines), chunk_size)
+        with ProcessPoolExecutor(max_workers=workers, initializer=start_encoder, initargs=(Labels,)) as executor:
+            chunks = executor.map(encode_chunk, [Instruction_Lines[start:start + chunk_size] for start in starts],
+                                  [TEXT_BASE + 4 * start for start in starts],
+                                  [Instruction_Sources[start:start + chunk_size] for start in starts])
+            Machine_Code = [word for chunk in chunks for word in chunk]      # In the order of the chunks
+    return AssembledProgram(Machine_Code, Data_Image, Labels, Data_Labels, Text_Lines)
+
+
+# Incremental assembly ----------------------------------------------------------------------------
+
+ANCHOR_LINES = 16       # Lines of a run splitting the windows of a large source compared for an update
+MAX_ANCHOR_TRIES = 64   # Places where the first line of a run is found, tried before looking elsewhere
+
+def label_reference(index, operands):
+    # Returns (field, label) of an instruction using a label, or None
+    for field, shift, mask in encodings[index][1]:
+        if field == 'labl':
+            return field, operands['label']
+        if field == 'targ':
+            return field, operands['target']
+    return None
+
+def common_lines(old, new, i1, i2, j1, j2, backward=False):
+    # Number of lines in common at the start of old[i1:i2] and new[j1:j2], or at their end when backward. Slices
+    # of growing then shrinking length are compared, so that long runs of equal lines are compared at C speed
+    limit = min(i2 - i1, j2 - j1)
+    length = 0
+    step = 1
+    while step:
+        if length + step > limit:
+            step //= 2
+        elif (old[i2 - length - step:i2 - length] == new[j2 - length - step:j2 - length] if backward else
+              old[i1 + length:i1 + length + step] == new[j1 + length:j1 + length + step]):
+            length += step
+            step *= 2
+        else:
+            step //= 2
+    return length
+
+def find_anchor(old, new, i1, i2, j1, j2):
+    # Returns (i, j) where the ANCHOR_LINES lines from new[j] are also found from old[i], inside both windows, or
+    # None. The lines are taken from the middle of the new window, then from its quarters, and looked for from
+    # the same offset in the old window onwards, then before it
+    if i2 - i1 < ANCHOR_LINES or j2 - j1 < ANCHOR_LINES:
+        return None
+    for j in ((j1 + j2) // 2, (3 * j1 + j2) // 4, (j1 + 3 * j2) // 4):
+        j = max(j1, min(j, j2 - ANCHOR_LINES))
+        anchor = new[j:j + ANCHOR_LINES]
+        expected = min(max(i1, i1 + j - j1), i2 - ANCHOR_LINES)
+        for start, end in ((expected, i2 - ANCHOR_LINES + 1), (i1, expected)):
+            tries = 0
+            while start < end and tries < MAX_ANCHOR_TRIES:
+                try:
+                    i = old.index(anchor[0], start, end)
+                except ValueError:
+                    break
+                if old[i:i + ANCHOR_LINES] == anchor:
+                    return i, j
+                start = i + 1
+                tries += 1
+    return None
+
+def defined_labels(lines):
+    # Labels defined by lines under .text, once for each definition
+    labels = []
+    for line in lines:
+        final_line = line.replace("\t", "").split('#')[0]
+        if ':' in final_line:
+            labels.append(final_line.split(':', 1)[0].strip())
+    return labels
+
+def count_kinds(kinds, flag):
+    # Number of lines of kinds holding flag
+    if flag == TEXT_LINE:
+        return len(kinds) - kinds.count(0)
+    return sum(kinds.count(kind) for kind in range(8) if kind & flag)
+
+class IncrementalAssembler:
+    # Keeps the parse of the last version of a source: each line under .text and what it holds, each instruction,
+    # its word and the label it uses, and the address of each label. update() compares the lines under .text of the
+    # next version with them, scans and encodes only the lines that changed, moves the labels following a change in
+    # the number of instructions, and corrects the branches and jumps whose label moved relative to them
+    # Beyond the changed lines, an update compares the lines of both versions, and only when labels moved, were
+    # added or were removed, goes once over the labels and once over the instructions using one
+    # Nothing is changed before every changed line is encoded and every label resolved, so that an update raising
+    # ValueError leaves the state of the last version, and can be followed by a corrected one
+    # The static data is assembled again only when the lines before .text change
+
+    # Windows of differing lines larger than this are first split at runs of lines found in both versions, and
+    # only the smaller windows are compared line by line
+    MAX_DIFF_LINES = 5000
+    # Changes whenever the attributes kept change, so that a state saved before is dropped by load()
+    STATE_VERSION = 2
+
+    def __init__(self):
+        self.data_key = None        # Lines read by assemble_data for the last version
+        self.data_image = bytearray()
+        self.data_labels = {}
+        self.text_source = []       # Lines under .text
+        self.kinds = []             # Flags of each of them, TEXT_LINE, INSTRUCTION_LINE and LABEL_LINE
+        self.text_lines = []        # Lines under .text without tabs and empty lines, as kept by assemble()
+        self.labels = {}
+        self.sources = []           # Line under .text holding each instruction
+        self.machine_code = []
+        self.references = []        # (field, label) of each instruction using a label, or None
+        self.definitions = Counter()        # Number of definitions of each label, the last one being used
+        self.reencoded = 0          # Number of instructions encoded by the last update
+        self.patched = 0            # Number of label fields corrected by the last update
+
+    def save(self, filename):
+        # The state is stamped with ASSEMBLER_VERSION, since its words are only patched where the source changes
+        with open(filename, 'wb') as state_file:
+            pickle.dump({'version': ASSEMBLER_VERSION, 'state_version': self.STATE_VERSION, 'state': self.__dict__},
+                        state_file)
+
+    def load(self, filename):
+        # Returns True when the state of filename is kept. A state that cannot be read, or saved by another
+        # version of the assembler, is dropped, so that the next update encodes the whole source again instead of
+        # mixing words of two encoders
+        with open(filename, 'rb') as state_file:
+            try:
+                saved = pickle.load(state_file)
+            except Exception:
+                saved = None
+        if not isinstance(saved, dict) or saved.get('version') != ASSEMBLER_VERSION or \
+                saved.get('state_version') != self.STATE_VERSION:
+            self.__init__()
+            return False
+        self.__dict__.update(saved['state'])
+        return True
+
+    def changed_regions(self, old, new):
+        # Returns (i1, i2, j1, j2) for each region where old[i1:i2] became new[j1:j2], in order
+        regions = []
+        self.match(old, new, 0, len(old), 0, len(new), regions)
+        return regions
+
+    def match(self, old, new, i1, i2, j1, j2, regions):
+        # Adds the regions where old[i1:i2] and new[j1:j2] differ
+        # The lines in common at both ends are skipped. A window small enough is compared by difflib, a larger one
+        # is split at a run of lines found in both versions, and the windows on each side matched the same way
+        prefix = common_lines(old, new, i1, i2, j1, j2)
+        i1 += prefix
+        j1 += prefix
+        suffix = common_lines(old, new, i1, i2, j1, j2, backward=True)
+        i2 -= suffix
+        j2 -= suffix
+        if i1 == i2 and j1 == j2:
+            return
+        if i1 == i2 or j1 == j2:
+            regions.append((i1, i2, j1, j2))
+        elif i2 - i1 <= self.MAX_DIFF_LINES and j2 - j1 <= self.MAX_DIFF_LINES:
+            matcher = difflib.SequenceMatcher(None, old[i1:i2], new[j1:j2], autojunk=False)
+            regions.extend((i1 + a1, i1 + a2, j1 + b1, j1 + b2)
+                           for tag, a1, a2, b1, b2 in matcher.get_opcodes() if tag != 'equal')
+        else:
+            anchor = find_anchor(old, new, i1, i2, j1, j2)
+            if anchor is None:
+                regions.append((i1, i2, j1, j2))
+                return
+            i, j = anchor
+            self.match(old, new, i1, i, j1, j, regions)
+            self.match(old, new, i + ANCHOR_LINES, i2, j + ANCHOR_LINES, j2, regions)
+
+    def update(self, source):
+        # Assembles the next version of the source and returns an AssembledProgram
+        all_lines = source.splitlines()
+        boundary = 0
+        while boundary < len(all_lines) and '.text' not in all_lines[boundary].split('#')[0]:
+            boundary += 1
+        data_key = all_lines[:boundary]
+        data_image, data_labels = self.data_image, self.data_labels
+        if data_key != self.data_key:
+            data_image, data_labels = assemble_data(source)
+
+        self.update_text(text_section(all_lines))
+        self.data_key, self.data_image, self.data_labels = data_key, data_image, data_labels
+        # The program gets copies, which the next update leaves as they are
+        return AssembledProgram(list(self.machine_code), data_image, dict(self.labels), data_labels,
+                                list(self.text_lines))
+
+    def last_definitions(self, text_source, wanted, instructions):
+        # Returns the address of the last definition of each label of wanted in text_source, the lines under .text
+        # of the next version, holding that many instructions. The lines are scanned from the end, a chunk at a time
+        found = {}
+        end = len(text_source)
+        while len(found) < len(wanted) and end > 0:
+            start = max(0, end - 256)
+            Text_Lines, Labels, Instruction_Lines = scan_text_lines(text_source[start:end], 0)[:3]
+            instructions -= len(Instruction_Lines)
+            for label in wanted:
+                if label in Labels and label not in found:
+                    found[label] = TEXT_BASE + 4 * instructions + Labels[label]
+            end = start
+        return found
+
+    def update_text(self, text_source):
+        # Brings the lines under .text to text_source, the lines under .text of the next version
+        old_source = self.text_source
+        kinds = self.kinds
+        labels = self.labels
+        definitions = self.definitions
+
+        # Scans the new lines of each region. Each change is (i1, i2, first old instruction, old instructions,
+        # first old text line, old text lines, first new instruction, scan of the new lines)
+        changes = []
+        undefined = Counter()       # Definitions of labels in the old lines of the regions
+        defined = Counter()         # and in their new lines
+        added = {}      # Address of the last definition of each label in the new lines of the regions
+        first = 0
+        first_text = 0
+        done = 0        # Old lines before the next region
+        shift = 0       # Instructions added by the regions so far
+        for i1, i2, j1, j2 in self.changed_regions(old_source, text_source):
+            gap = kinds[done:i1]
+            first += count_kinds(gap, INSTRUCTION_LINE)
+            first_text += count_kinds(gap, TEXT_LINE)
+            region = kinds[i1:i2]
+            count = count_kinds(region, INSTRUCTION_LINE)
+            text_count = count_kinds(region, TEXT_LINE)
+            scan = scan_text_lines(text_source[j1:j2], TEXT_BASE + 4 * (first + shift))
+            if count_kinds(region, LABEL_LINE):
+                undefined.update(defined_labels(old_source[i1:i2]))
+            if count_kinds(scan[4], LABEL_LINE):
+                defined.update(defined_labels(text_source[j1:j2]))
+            added.update(scan[1])
+            changes.append((i1, i2, first, count, first_text, text_count, first + shift, scan))
+            shift += len(scan[2]) - count
+            first += count
+            first_text += text_count
+            done = i2
+        resized = any(len(scan[2]) != count for i1, i2, first, count, first_text, text_count, new_first, scan
+                      in changes)
+
+        # New address of each label changed, None for the labels no longer defined. The address of a label is its
+        # last definition: it is found by scanning the new version when definitions of it remain outside the
+        # regions while others were added or removed
+        addresses = {}
+        unsure = set()      # Labels whose last definition is looked up
+        for label in set(undefined) | set(defined):
+            remaining = definitions[label] - undefined[label] + defined[label]
+            if remaining == 0:
+                addresses[label] = None
+            elif remaining == defined[label]:
+                addresses[label] = added[label]
             else:
-                final_string.append(comp)
+                unsure.add(label)
+
+        # The other labels move by the instructions added before them. A label at the first old instruction of a
+        # region is before it, unless the region had no instruction and the label follows it
+        if resized:
+            starts = [change[2] for change in changes]
+            before = {}         # Labels just before each region with no old instruction
+            for label, address in labels.items():
+                if label in addresses or label in unsure:
+                    continue
+                position = (address - TEXT_BASE) >> 2
+                region = bisect.bisect_left(starts, position)
+                while region < len(changes) and starts[region] == position and changes[region][3] == 0:
+                    if region not in before:
+                        line = changes[region][0]
+                        while line > 0 and not kinds[line - 1] & INSTRUCTION_LINE:
+                            line -= 1
+                        before[region] = defined_labels(old_source[line:changes[region][0]])
+                    if label in before[region]:
+                        if definitions[label] > 1:
+                            unsure.add(label)       # Maybe another of its definitions
+                        break
+                    region += 1
+                label_shift = changes[region][6] - changes[region][2] if region < len(changes) else shift
+                if label_shift and label not in unsure:
+                    addresses[label] = address + 4 * label_shift
+        if unsure:
+            addresses.update(self.last_definitions(text_source, unsure, len(self.machine_code) + shift))
+
+        undo = {}       # Address of each label changed before the update, None when it was not defined
+        try:
+            for label, address in addresses.items():
+                undo[label] = labels.get(label)
+                if address is None:
+                    del labels[label]
+                else:
+                    labels[label] = address
+
+            encoded = []
+            for i1, i2, first, count, first_text, text_count, new_first, scan in changes:
+                words = []
+                region_references = []
+                address = TEXT_BASE + 4 * new_first
+                for final_line, line in zip(scan[2], scan[3]):
+                    tokens = final_line.replace(',', ' ').split()
+                    index = instruction_indices[tokens[0]]
+                    try:
+                        operands = parse_operands(index, tokens[1:])
+                        words.append(encode_instruction(index, operands, address, labels))
+                    except ValueError as error:
+                        raise ValueError(str(error) + " in line: " + line)
+                    region_references.append(label_reference(index, operands))
+                    address += 4
+                encoded.append((words, region_references))
+
+            # Branch offsets change when a branch moves differently from its label, jump targets when the label
+            # moves. The instructions of the regions were encoded with the labels as they now are
+            patches = []
+            if addresses or resized:
+                region = 0
+                shift = 0       # Instructions added before position
+                for position, reference in enumerate(self.references):
+                    while region < len(changes) and position >= changes[region][2] + changes[region][3]:
+                        shift = changes[region][6] + len(changes[region][7][2]) - changes[region][2] - \
+                            changes[region][3]
+                        region += 1
+                    if reference is None or (region < len(changes) and position >= changes[region][2]):
+                        continue        # Encoded again when in a region
+                    field, label = reference
+                    if label not in addresses and (field == 'targ' or not shift):
+                        continue
+                    if label not in labels:
+                        raise ValueError("Undefined label " + label + " in line: " + self.sources[position])
+                    mask = 0xFFFF if field == 'labl' else 0x3FFFFFF
+                    try:
+                        value = label_field(field, labels[label], TEXT_BASE + 4 * (position + shift))
+                    except ValueError as error:
+                        raise ValueError(str(error) + " in line: " + self.sources[position])
+                    if self.machine_code[position] & mask != value:
+                        patches.append((position, (self.machine_code[position] & ~mask) | value))
+        except ValueError:
+            for label, address in undo.items():
+                if address is None:
+                    labels.pop(label, None)
+                else:
+                    labels[label] = address
+            raise
+
+        # Patched in place, the regions being replaced from the last one so that the positions of the earlier
+        # ones stay valid
+        for position, word in patches:
+            self.machine_code[position] = word
+        for (i1, i2, first, count, first_text, text_count, new_first, scan), (words, region_references) in \
+                reversed(list(zip(changes, encoded))):
+            kinds[i1:i2] = scan[4]
+            self.text_lines[first_text:first_text + text_count] = scan[0]
+            self.sources[first:first + count] = scan[3]
+            self.machine_code[first:first + count] = words
+            self.references[first:first + count] = region_references
+        definitions.subtract(undefined)
+        definitions.update(defined)
+        for label in undefined:
+            if not definitions[label]:
+                del definitions[label]
+        self.text_source = text_source
+        self.reencoded = sum(len(change[7][2]) for change in changes)
+        self.patched = len(patches)
+
+def main():
+    parser = argparse.ArgumentParser(description='Assemble a MIPS source, asking for the file names when not given')
+    parser.add_argument(dest='filename', type=str, nargs='?')
+    parser.add_argument(dest='output_name', type=str, nargs='?')
+    parser.add_argument('--cache', default=None, help='directory of assembled programs kept by hash of the source')
+    parser.add_argument('--link', action='append', default=[], metavar='FILENAME',
+                        help='another source assembled after filename, sharing its labels (can be repeated)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='encode the instructions with this many worker processes')
+    parser.add_argument('--incremental', default=None, metavar='STATE_FILENAME',
+                        help='keep the parse in this file, and only encode the lines changed since the last run')
+    args = parser.parse_args()
+    if args.cache is not None and (args.incremental is not None or args.link or args.jobs is not None):
+        # Only a single source assembled at once is kept in the cache
+        parser.error("--cache cannot be combined with --incremental, --link or --jobs")
+
+    filename = args.filename
+    if filename is None:
+        filename = input('Enter assembly text file name (Must be in same folder): ')
+        while not os.path.exists(filename):
+            filename=input("Your input is wrong, please enter the correct name: ")
+    with open(filename, 'r') as assembly_file:
+        source = assembly_file.read()
+    if args.incremental is not None:
+        assembler = IncrementalAssembler()
+        if os.path.isfile(args.incremental):
+            assembler.load(args.incremental)
+        program = assembler.update(source)
+        assembler.save(args.incremental)
+    elif args.link or args.jobs is not None:
+        sources = [source]
+        for link_name in args.link:
+            with open(link_name, 'r') as assembly_file:
+                sources.append(assembly_file.read())
+        program = assemble_files(sources, args.jobs)
+    else:
+        program = assemble(source, args.cache)
+
+    output_name = args.output_name
+    if output_name is None:
+        output_name = input('Enter output file name (eg: my_output.txt, or my_output.mobj for a binary object): ')
+    program.write(output_name)
 
-        binary_string = Assemble(index, final_string)
-        print(binary_string, file=output_file)
 
-output_file.close()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from MIPS_Simulator import Simulator, read_inputs, process_exit_status
+
+# Runs many (MIPS, binary, .in, .out) jobs across a pool of worker processes
+# Each line of the manifest holds one job: MIPS_filename filename In_filename Out_filename
+# Out_filename can be "-" when only the results file is wanted. Batch runs do not write checkpoints
+
+# Number of instructions simulated between two checks of the wall-clock timeout
+TIMEOUT_CHECK_STEPS = 100000
+
+# State kept by each worker process between jobs
+worker_simulator = None
+worker_programs = {}     # (MIPS_filename, filename) -> (asm_text, machine_code)
+
+
+def read_manifest(manifest_filename):
+    jobs = []
+    with open(manifest_filename, 'r') as manifest_file:
+        for line in manifest_file:
+            line = line.split('#')[0].strip()      # Removes comments
+            if line == "":
+                continue
+            fields = line.split()
+            if len(fields) != 4:
+                raise ValueError("Manifest line must have 4 file names: " + line)
+            jobs.append(fields)
+    return jobs
+
+def load_program(MIPS_filename, filename):
+    key = (MIPS_filename, filename)
+    if key not in worker_programs:
+        with open(MIPS_filename, 'r') as MIPS_file:
+            asm_text = MIPS_file.read()
+        with open(filename, 'rb') as binary_file:
+            machine_code = binary_file.read()
+        worker_programs[key] = (asm_text, machine_code)
+    return worker_programs[key]
+
+def run_job(job, max_steps=None, timeout=None):
+    # Simulates one job in this worker, and returns a dictionary of its results
+    global worker_simulator
+    MIPS_filename, filename, In_filename, Out_filename = job
+    result = {'MIPS': MIPS_filename, 'binary': filename, 'in': In_filename, 'out': Out_filename}
+    start = time.monotonic()
+    output = io.StringIO()
+    simulator = None
+    try:
+        asm_text, machine_code = load_program(MIPS_filename, filename)
+        if worker_simulator is None:
+            worker_simulator = Simulator(echo=False)
+        simulator = worker_simulator
+        simulator.discard_output()      # Left by an earlier job of this worker
+        simulator.out_file = output
+        simulator.load_program(asm_text, machine_code)
+        simulator.set_inputs(read_inputs(In_filename))
+
+        status = None
+        result['result'] = 'exited'
+        while status is None:
+            steps = TIMEOUT_CHECK_STEPS
+            if max_steps is not None:
+                steps = min(steps, max_steps - simulator.current_loop_count)
+                if steps <= 0:
+                    result['result'] = 'budget'
+                    break
+            if timeout is not None and time.monotonic() - start > timeout:
+                result['result'] = 'timeout'
+                break
+            status = simulator.run(steps)
+        # The status the program would end the simulator process with, as for a single run
+        result['exit_status'] = process_exit_status(status) if status is not None else None
+        result['instructions'] = simulator.current_loop_count
+    except Exception as error:
+        result['result'] = 'error'
+        result['error'] = type(error).__name__ + ": " + str(error)
+        result['exit_status'] = None
+        result['instructions'] = simulator.current_loop_count if simulator else 0
+    finally:
+        if simulator is not None:
+            simulator.flush_output()
+    result['seconds'] = round(time.monotonic() - start, 6)
+    result['output'] = output.getvalue()
+    if Out_filename != "-":
+        with open(Out_filename, 'w') as out_file:
+            out_file.write(result['output'])
+    return result
+
+def run_batch(jobs, workers=None, max_steps=None, timeout=None):
+    # Returns the results of all jobs, in the same order as jobs
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, job, max_steps, timeout) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate every job of a manifest in parallel')
+    parser.add_argument(dest='Manifest_filename', type=str)
+    parser.add_argument(dest='Results_filename', type=str, help='JSON file receiving the results of all jobs')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--max-steps', type=int, default=None, help='instruction budget of each job')
+    parser.add_argument('--timeout', type=float, default=None, help='wall-clock seconds allowed for each job')
+    args = parser.parse_args()
+
+    jobs = read_manifest(args.Manifest_filename)
+    results = run_batch(jobs, args.jobs, args.max_steps, args.timeout)
+    with open(args.Results_filename, 'w') as results_file:
+        json.dump(results, results_file, indent=1)
+    failed = [result for result in results if result['result'] != 'exited']
+    print(len(results), "jobs,", len(failed), "did not exit")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
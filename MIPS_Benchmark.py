@@ -0,0 +1,250 @@
+import io
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from MIPS_Simulator import Simulator, read_inputs
+from MIPS_Assembler import assemble
+from MIPS_Profile import Profiler
+from MIPS_Cache import CacheHierarchy, DEFAULT_L2
+
+# Measures the simulator and the assembler on the programs of the benchmarks directory
+# Each program NAME.asm runs with the fixed input NAME.in, and its output is checked against NAME.out
+# The simulator is measured in instructions per second, translating blocks, translating blocks under the profiler
+# or the cache model (default caches with an L2) and interpreting, and the assembler in lines per second on a
+# generated source. Every measurement runs in a fresh process, so that its peak resident memory is its own
+# The results are written to JSON and compared with a baseline from an earlier run. Speeds and memory only compare
+# on the host the baseline was recorded on: on another, they are shown without failing the run, and a baseline for
+# this host is written with --save-baseline
+
+BENCHMARK_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+BASELINE_FILENAME = os.path.join(BENCHMARK_DIRECTORY, 'baseline.json')
+MODES = ('translated', 'profiled', 'cached', 'interpreted')
+ASSEMBLER_LINES = 100000
+# Fields of the results describing the host, which must match the baseline for its speeds and memory to compare
+HOST_FIELDS = ('python', 'implementation', 'platform', 'machine', 'processor', 'cpu_count')
+
+
+def peak_rss_kb():
+    # Peak resident memory of this process (kilobytes on Linux, bytes on macOS)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        usage //= 1024
+    return usage
+
+def processor_name():
+    # Model of the processor, from /proc/cpuinfo on Linux, where platform.processor() is often empty
+    try:
+        with open('/proc/cpuinfo', 'r') as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+def isolated(function, *args):
+    # Runs function in a new process and returns its result
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(function, *args).result()
+
+def find_benchmarks(directory):
+    return sorted(name[:-len('.asm')] for name in os.listdir(directory) if name.endswith('.asm'))
+
+def measure_simulator(directory, name, mode):
+    # Simulates one program and returns the instructions executed, the time taken and the output
+    with open(os.path.join(directory, name + '.asm'), 'r') as MIPS_file:
+        asm_text = MIPS_file.read()
+    machine_code = assemble(asm_text).to_object()
+    simulator = Simulator(list(read_inputs(os.path.join(directory, name + '.in'))), io.StringIO(), echo=False,
+                          translate=mode != 'interpreted')
+    simulator.load_program(asm_text, machine_code)
+    if mode == 'profiled':
+        Profiler(simulator)
+    elif mode == 'cached':
+        CacheHierarchy(simulator, l2=DEFAULT_L2)
+    begin = time.perf_counter()
+    status = simulator.run()
+    seconds = time.perf_counter() - begin
+    simulator.flush_output()
+    return {'instructions': simulator.current_loop_count, 'seconds': seconds, 'exit_status': status,
+            'output': simulator.out_file.getvalue(), 'peak_rss_kb': peak_rss_kb()}
+
+def assembler_source(lines):
+    # Generated MIPS source of about lines instructions, the same at every run
+    # Mixes the instruction formats, with branches and jumps to labels placed every 16 instructions
+    registers = ['$t0', '$t1', '$t2', '$t3', '$s0', '$s1', '$a0', '$v0']
+    number_of_labels = lines // 16 + 1
+    source = [".data", "value: .word 1", ".text"]
+    state = 1
+    for n in range(lines):
+        state = (state * 1103515245 + 12345) & 0x7FFFFFFF       # Fixed pseudo-random sequence
+        a, b, c = registers[state % 8], registers[(state >> 3) % 8], registers[(state >> 6) % 8]
+        label = "L" + str(min(number_of_labels - 1, max(0, n // 16 + (state >> 9) % 64 - 32)))
+        if n % 16 == 0:
+            source.append("L" + str(n // 16) + ":")
+        kind = (state >> 16) % 8
+        if kind == 0:
+            source.append("\taddu " + a + ", " + b + ", " + c)
+        elif kind == 1:
+            source.append("\taddi " + a + ", " + b + ", " + str((state >> 12) % 2000 - 1000) + "   # immediate")
+        elif kind == 2:
+            source.append("\tlw " + a + ", " + str((state >> 12) % 64 * 4) + "(" + b + ")")
+        elif kind == 3:
+            source.append("\tsw " + a + ", " + str((state >> 12) % 64 * 4) + "(" + b + ")")
+        elif kind == 4:
+            source.append("\tbeq " + a + ", " + b + ", " + label)
+        elif kind == 5:
+            source.append("\tsll " + a + ", " + b + ", " + str((state >> 12) % 32))
+        elif kind == 6:
+            source.append("\tj " + label)
+        else:
+            source.append("\tslt " + a + ", " + b + ", " + c)
+    source.append("L" + str(number_of_labels - 1) + ":")
+    source.append("\tsyscall")
+    return "\n".join(source) + "\n"
+
+def measure_assembler(lines):
+    source = assembler_source(lines)
+    begin = time.perf_counter()
+    program = assemble(source)
+    seconds = time.perf_counter() - begin
+    return {'lines': len(source.splitlines()), 'instructions': len(program.machine_code), 'seconds': seconds,
+            'peak_rss_kb': peak_rss_kb()}
+
+def run_benchmarks(names, directory=BENCHMARK_DIRECTORY, modes=MODES, repeat=3, assembler_lines=ASSEMBLER_LINES):
+    # Returns the results of every benchmark, keeping the fastest of repeat runs and the largest peak memory
+    results = {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+               'platform': platform.platform(), 'machine': platform.machine(), 'processor': processor_name(),
+               'cpu_count': os.cpu_count(),
+               'repeat': repeat, 'simulator': {}, 'assembler': {}}
+    for name in names:
+        expected = None
+        if os.path.isfile(os.path.join(directory, name + '.out')):
+            with open(os.path.join(directory, name + '.out'), 'r') as out_file:
+                expected = out_file.read()
+        entry = {}
+        for mode in modes:
+            runs = [isolated(measure_simulator, directory, name, mode) for n in range(repeat)]
+            seconds = min(run['seconds'] for run in runs)
+            entry[mode] = {'instructions': runs[0]['instructions'], 'seconds': round(seconds, 6),
+                           'instructions_per_second': round(runs[0]['instructions'] / seconds),
+                           'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+                           'exit_status': runs[0]['exit_status'],
+                           'output_matches': expected is None or all(run['output'] == expected for run in runs)}
+        results['simulator'][name] = entry
+    if assembler_lines:
+        runs = [isolated(measure_assembler, assembler_lines) for n in range(repeat)]
+        seconds = min(run['seconds'] for run in runs)
+        results['assembler'] = {'lines': runs[0]['lines'], 'instructions': runs[0]['instructions'],
+                                'seconds': round(seconds, 6), 'lines_per_second': round(runs[0]['lines'] / seconds),
+                                'peak_rss_kb': max(run['peak_rss_kb'] for run in runs)}
+    return results
+
+def metrics(results):
+    # Yields (name, value, True when higher is better) for each figure compared with the baseline
+    for name, entry in results['simulator'].items():
+        for mode, result in entry.items():
+            yield name + '/' + mode + '/instructions_per_second', result['instructions_per_second'], True
+            yield name + '/' + mode + '/peak_rss_kb', result['peak_rss_kb'], False
+    if results['assembler']:
+        yield 'assembler/lines_per_second', results['assembler']['lines_per_second'], True
+        yield 'assembler/peak_rss_kb', results['assembler']['peak_rss_kb'], False
+
+def host_differences(results, baseline):
+    # Returns the host fields of the results that differ from the baseline, or that the baseline does not record
+    return [field for field in HOST_FIELDS if baseline.get(field) != results.get(field)]
+
+def compare(results, baseline, tolerance, same_host=True):
+    # Returns the lines of the comparison report, and the names of the figures worse than the baseline by more
+    # than tolerance (a fraction), or whose instruction count or assembler source size changed
+    # The assembler figures are not compared when the source assembled is not the size of the baseline one. When
+    # the baseline comes from another host, the figures are reported but only the instruction counts and source
+    # size are checked
+    old = {name: value for name, value, higher in metrics(baseline)}
+    report = []
+    regressions = []
+    lines_changed = results['assembler'] and baseline['assembler'] and \
+        results['assembler']['lines'] != baseline['assembler']['lines']
+    for name, value, higher in metrics(results):
+        if lines_changed and name.startswith('assembler/'):
+            continue
+        if name not in old:
+            report.append(name.ljust(50) + str(value).rjust(12) + "  (not in baseline)")
+            continue
+        ratio = value / old[name] if old[name] else 1.0
+        worse = same_host and (ratio < 1 - tolerance if higher else ratio > 1 + tolerance)
+        if worse:
+            regressions.append(name)
+        report.append(name.ljust(50) + str(value).rjust(12) + str(old[name]).rjust(12) +
+                      ("%+.1f%%" % ((ratio - 1) * 100)).rjust(9) + ("  REGRESSION" if worse else ""))
+    for name, entry in results['simulator'].items():
+        for mode, result in entry.items():
+            previous = baseline['simulator'].get(name, {}).get(mode)
+            if previous is not None and previous['instructions'] != result['instructions']:
+                regressions.append(name + '/' + mode + '/instructions')
+                report.append(name + '/' + mode + ": executed " + str(result['instructions']) +
+                              " instructions instead of " + str(previous['instructions']))
+    if lines_changed:
+        regressions.append('assembler/lines')
+        report.append("assembler: assembled " + str(results['assembler']['lines']) + " lines instead of " +
+                      str(baseline['assembler']['lines']))
+    return report, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the simulator and the assembler on the benchmark programs')
+    parser.add_argument(dest='names', nargs='*', help='benchmarks to run (default: every NAME.asm in --dir)')
+    parser.add_argument('--dir', default=BENCHMARK_DIRECTORY, help='directory holding NAME.asm, NAME.in, NAME.out')
+    parser.add_argument('--out', default='benchmark_results.json', help='JSON file receiving the results')
+    parser.add_argument('--baseline', default=BASELINE_FILENAME, help='JSON results of an earlier run to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline as well')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each measurement, the fastest is kept')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='fraction by which a figure may be worse than the baseline')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help='simulator modes to measure')
+    parser.add_argument('--assembler-lines', type=int, default=ASSEMBLER_LINES,
+                        help='lines of the generated source given to the assembler (0 to skip)')
+    args = parser.parse_args()
+
+    names = args.names or find_benchmarks(args.dir)
+    results = run_benchmarks(names, args.dir, args.modes, args.repeat, args.assembler_lines)
+    with open(args.out, 'w') as results_file:
+        json.dump(results, results_file, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=1)
+
+    failed = [name + '/' + mode for name, entry in results['simulator'].items() for mode, result in entry.items()
+              if not result['output_matches']]
+    for name in failed:
+        print(name + ": output differs from the expected output")
+    regressions = []
+    if not args.save_baseline and os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        differences = host_differences(results, baseline)
+        for field in differences:
+            print("warning: baseline " + field + " is " + repr(baseline.get(field)) + ", this host has " +
+                  repr(results[field]))
+        if differences:
+            print("warning: the baseline was recorded on another host, its speeds and memory are shown but not "
+                  "checked; run with --save-baseline to record one for this host")
+        report, regressions = compare(results, baseline, args.tolerance, not differences)
+        print("figure".ljust(50) + "now".rjust(12) + "baseline".rjust(12) + "change".rjust(9))
+        for line in report:
+            print(line)
+    else:
+        for name, value, higher in metrics(results):
+            print(name.ljust(50) + str(value).rjust(12))
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+import io
+import sys
+import json
+import random
+import argparse
+from array import array
+
+from MIPS_Simulator import Simulator, read_inputs, process_exit_status, memory_instructions, MASK
+
+# Model of the caches of the processor, fed with the instructions fetched and the memory accessed by a simulation
+# An L1 instruction cache and an L1 data cache sit over an optional unified L2 and the memory. Each cache has its
+# size, associativity, line size, replacement policy (lru, fifo or random), write policy and hit latency:
+#   write back: writes allocate a line and mark it dirty, dirty lines are written to the next level when evicted
+#   write through: writes go to the next level, and only update a line already in the cache
+# Writes to the next level go through a write buffer and do not stall. The estimated cycles are one per
+# instruction, plus the latency of every access beyond the L1 hit latency
+# Tags, replacement stamps and dirty bits are kept in flat arrays, one entry per way of each set
+# A translated block checks itself whether an access falls in the line used last in its set, the most common
+# case, which changes nothing in the cache but the dirty bit of a store, and only calls the model for the other
+# ones. The I-cache is accessed once per instruction
+
+POLICIES = ('lru', 'fifo', 'random')
+WRITE_POLICIES = ('back', 'through')
+DEFAULT_L1I = "16K:2:32:lru:back:1"
+DEFAULT_L1D = "16K:4:32:lru:back:1"
+DEFAULT_L2 = "256K:8:64:lru:back:10"
+MEMORY_LATENCY = 100
+
+
+def parse_size(text):
+    units = {'K': 1 << 10, 'M': 1 << 20}
+    if text[-1].upper() in units:
+        return int(text[:-1]) * units[text[-1].upper()]
+    return int(text)
+
+def parse_cache(text):
+    # Returns the settings of a cache written as SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]], as in 16K:4:32:lru:back:1
+    fields = text.split(':')
+    if not 3 <= len(fields) <= 6:
+        raise ValueError("Cache settings are SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]], not " + text)
+    settings = {'size': parse_size(fields[0]), 'associativity': int(fields[1]), 'line_size': int(fields[2])}
+    if len(fields) > 3:
+        settings['policy'] = fields[3]
+    if len(fields) > 4:
+        settings['write_policy'] = fields[4]
+    if len(fields) > 5:
+        settings['latency'] = int(fields[5])
+    return settings
+
+class Memory:
+    # Bottom of the hierarchy, every access takes latency cycles
+
+    def __init__(self, latency=MEMORY_LATENCY):
+        self.name = "memory"
+        self.latency = latency
+        self.reads = 0
+        self.writes = 0
+
+    def access(self, address, write=False):
+        if write:
+            self.writes += 1
+        else:
+            self.reads += 1
+        return self.latency
+
+    def statistics(self):
+        return {'reads': self.reads, 'writes': self.writes}
+
+class Cache:
+
+    def __init__(self, name, size, associativity, line_size, next_level, policy='lru', write_policy='back',
+                 latency=1, seed=0):
+        if line_size < 4 or line_size & (line_size - 1):
+            raise ValueError(name + ": line size must be a power of 2, of 4 bytes or more")
+        if associativity <= 0 or size % (associativity * line_size):
+            raise ValueError(name + ": size must be a multiple of associativity * line size")
+        sets = size // (associativity * line_size)
+        if sets == 0 or sets & (sets - 1):
+            raise ValueError(name + ": number of sets (size / (associativity * line size)) must be a power of 2")
+        if policy not in POLICIES:
+            raise ValueError(name + ": replacement policy must be one of " + ", ".join(POLICIES))
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(name + ": write policy must be one of " + ", ".join(WRITE_POLICIES))
+        self.name = name
+        self.size = size
+        self.ways = associativity
+        self.line_size = line_size
+        self.line_bits = line_size.bit_length() - 1
+        self.sets = sets
+        self.set_mask = self.sets - 1
+        self.next_level = next_level
+        self.policy = policy
+        self.lru = policy == 'lru'
+        self.write_back = write_policy == 'back'
+        self.latency = latency
+        self.random = random.Random(seed)
+
+        self.tags = array('q', [-1]) * (self.sets * self.ways)     # Line number held by each way, -1 when empty
+        self.stamps = array('Q', [0]) * (self.sets * self.ways)    # Time of the last use (lru) or of the fill
+        self.dirty = bytearray(self.sets * self.ways)
+        self.clock = 0
+        self.recent = array('q', [-1]) * self.sets      # Line used last in each set, and its way
+        self.recent_ways = array('L', [0]) * self.sets
+
+        self.accesses = 0
+        self.misses = 0
+        self.writebacks = 0
+
+    def access(self, address, write=False):
+        # Returns the cycles taken by the access
+        self.accesses += 1
+        return self.lookup(address, write)
+
+    def lookup(self, address, write):
+        # Access not counted in accesses, for callers counting them themselves
+        line = address >> self.line_bits
+        index = line & self.set_mask
+        if self.recent[index] == line:
+            way = self.recent_ways[index]
+        else:
+            base = index * self.ways
+            try:
+                way = self.tags.index(line, base, base + self.ways)
+            except ValueError:
+                return self.miss(line, index, address, write)
+            self.recent[index] = line
+            self.recent_ways[index] = way
+            if self.lru:
+                self.clock += 1
+                self.stamps[way] = self.clock
+        if write:
+            if self.write_back:
+                self.dirty[way] = 1
+            else:
+                self.next_level.access(address, True)
+        return self.latency
+
+    def miss(self, line, index, address, write):
+        self.misses += 1
+        if write and not self.write_back:
+            self.next_level.access(address, True)
+            return self.latency
+        tags = self.tags
+        stamps = self.stamps
+        base = index * self.ways
+        way = base
+        for candidate in range(base, base + self.ways):
+            if tags[candidate] == -1:
+                way = candidate
+                break
+            if stamps[candidate] < stamps[way]:
+                way = candidate
+        else:
+            if self.policy == 'random':
+                way = base + self.random.randrange(self.ways)
+        if self.dirty[way]:
+            self.writebacks += 1
+            self.next_level.access(tags[way] << self.line_bits, True)
+            self.dirty[way] = 0
+        cycles = self.latency + self.next_level.access(address, False)
+        tags[way] = line
+        self.clock += 1
+        stamps[way] = self.clock
+        if write:
+            self.dirty[way] = 1
+        self.recent[index] = line
+        self.recent_ways[index] = way
+        return cycles
+
+    def statistics(self, accesses=None):
+        # accesses replaces the count kept by the cache, for the I-cache
+        if accesses is None:
+            accesses = self.accesses
+        hits = accesses - self.misses
+        return {'size': self.size, 'associativity': self.ways, 'line_size': self.line_size, 'policy': self.policy,
+                'write_policy': 'back' if self.write_back else 'through', 'latency': self.latency,
+                'accesses': accesses, 'hits': hits, 'misses': self.misses,
+                'hit_rate': round(hits / accesses, 6) if accesses else 0.0, 'writebacks': self.writebacks}
+
+class CacheHierarchy:
+    # Attached to a simulator, which gives it the instructions it fetches and the memory its loads and stores access
+
+    def __init__(self, simulator, l1i=DEFAULT_L1I, l1d=DEFAULT_L1D, l2=None, memory_latency=MEMORY_LATENCY):
+        # l1i, l1d and l2 are settings for parse_cache(), or dictionaries of Cache arguments
+        self.simulator = simulator
+        self.memory = Memory(memory_latency)
+        next_level = self.memory
+        self.l2 = None
+        if l2 is not None:
+            self.l2 = next_level = Cache("L2", next_level=next_level, **self.settings(l2))
+        self.icache = Cache("L1I", next_level=next_level, **self.settings(l1i))
+        self.dcache = Cache("L1D", next_level=next_level, **self.settings(l1d))
+        self.stall_cycles = 0
+        self.start = simulator.current_loop_count
+        simulator.caches = self
+        simulator.blocks = {}       # Translated again with the calls to the caches
+
+    def settings(self, settings):
+        return parse_cache(settings) if isinstance(settings, str) else dict(settings)
+
+    def fetch(self, address):
+        # Fetch from a line other than the one used last in its set
+        self.stall_cycles += self.icache.lookup(address, False) - self.icache.latency
+
+    def data(self, address, write):
+        # Memory access already counted in the accesses of the D-cache
+        self.stall_cycles += self.dcache.lookup(address, write) - self.dcache.latency
+
+    def step(self, pc, content):
+        # Called before the instruction of content, fetched at pc, is simulated
+        line = pc >> self.icache.line_bits
+        if self.icache.recent[line & self.icache.set_mask] != line:
+            self.fetch(pc)
+        write = memory_instructions.get(content['index'])
+        if write is not None:
+            self.stall_cycles += self.dcache.access((self.simulator.General_Purpose[content['rs']] + content['imm'])
+                                                    & MASK, write) - self.dcache.latency
+
+    def detach(self):
+        if self.simulator.caches is self:
+            self.simulator.caches = None
+            self.simulator.blocks = {}
+
+    def statistics(self):
+        instructions = self.simulator.current_loop_count - self.start
+        cycles = instructions + self.stall_cycles
+        levels = [self.icache, self.dcache] + ([self.l2] if self.l2 is not None else [])
+        results = {'instructions': instructions, 'cycles': cycles,
+                   'cpi': round(cycles / instructions, 6) if instructions else 0.0,
+                   'stall_cycles': self.stall_cycles}
+        for level in levels:
+            results[level.name] = level.statistics(instructions if level is self.icache else None)
+        results['memory'] = dict(self.memory.statistics(), latency=self.memory.latency)
+        return results
+
+    def report(self):
+        results = self.statistics()
+        out = ["Instructions: " + str(results['instructions']),
+               "Estimated cycles: " + str(results['cycles']) + " (CPI " + str(results['cpi']) + ")", ""]
+        out.append("level".ljust(8) + "accesses".rjust(14) + "hits".rjust(14) + "misses".rjust(14) +
+                   "hit rate".rjust(10) + "writebacks".rjust(12))
+        for name in ("L1I", "L1D", "L2"):
+            if name in results:
+                level = results[name]
+                out.append(name.ljust(8) + str(level['accesses']).rjust(14) + str(level['hits']).rjust(14) +
+                           str(level['misses']).rjust(14) + ("%.2f%%" % (100 * level['hit_rate'])).rjust(10) +
+                           str(level['writebacks']).rjust(12))
+        out.append("memory".ljust(8) + ("reads " + str(results['memory']['reads']) + ", writes " +
+                                       str(results['memory']['writes'])).rjust(42))
+        return "\n".join(out) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a MIPS program through a model of its caches')
+    parser.add_argument(dest='MIPS_filename', type=str)
+    parser.add_argument(dest='filename', type=str)
+    parser.add_argument(dest='In_filename', type=str)
+    parser.add_argument(dest='Out_filename', type=str)
+    parser.add_argument('--l1i', default=DEFAULT_L1I, metavar='SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]]',
+                        help='L1 instruction cache (default ' + DEFAULT_L1I + ')')
+    parser.add_argument('--l1d', default=DEFAULT_L1D, metavar='SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]]',
+                        help='L1 data cache (default ' + DEFAULT_L1D + ')')
+    parser.add_argument('--l2', default=None, nargs='?', const=DEFAULT_L2,
+                        metavar='SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]]',
+                        help='unified L2 cache (default none, ' + DEFAULT_L2 + ' when given without settings)')
+    parser.add_argument('--memory-latency', type=int, default=MEMORY_LATENCY, help='cycles of a memory access')
+    parser.add_argument('--json', default=None, help='JSON file receiving the statistics')
+    parser.add_argument('--interpret', action='store_true',
+                        help='simulate one instruction at a time instead of translating basic blocks')
+    parser.add_argument('--max-steps', type=int, default=None, help='instruction budget of the run')
+    args = parser.parse_args()
+    with open(args.MIPS_filename, 'r') as MIPS_file:
+        asm_text = MIPS_file.read()
+    with open(args.filename, 'rb') as binary_file:
+        machine_code = binary_file.read()
+
+    simulator = Simulator(read_inputs(args.In_filename), io.StringIO(), echo=False, translate=not args.interpret)
+    simulator.load_program(asm_text, machine_code)
+    try:
+        caches = CacheHierarchy(simulator, args.l1i, args.l1d, args.l2, args.memory_latency)
+    except ValueError as error:
+        parser.error(str(error))
+    status = simulator.run(args.max_steps)
+    with open(args.Out_filename, 'w') as out_file:
+        out_file.write(simulator.out_file.getvalue())
+    sys.stdout.write(caches.report())
+    if args.json is not None:
+        with open(args.json, 'w') as json_file:
+            json.dump(caches.statistics(), json_file, indent=1)
+    sys.exit(process_exit_status(status or 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import os
+import re
+import argparse
+
+from MIPS_Simulator import total_memory_size, DELTA_MAGIC, DELTA_HEADER, DELTA_PAGE, REGISTER_FILE
+
+# Rebuilds the memory_N.bin and register_N.bin files of the simulator from the delta_N.bin checkpoints
+# written with --delta. Each delta only holds the pages written since the previous checkpoint, so checkpoint N
+# is rebuilt by applying every delta of the chain ending at N to a zeroed memory image (or to the full
+# checkpoint a resumed run started from)
+
+
+def read_delta(filename):
+    # Returns (instruction count, previous instruction count, register bytes, [(page number, page bytes)])
+    with open(filename, 'rb') as f:
+        data = f.read()
+    magic, page_size, count, previous, number_of_pages = DELTA_HEADER.unpack_from(data, 0)
+    if magic != DELTA_MAGIC:
+        raise ValueError(filename + " is not a delta checkpoint")
+    offset = DELTA_HEADER.size
+    registers = data[offset:offset + REGISTER_FILE.size]
+    offset += REGISTER_FILE.size
+    pages = []
+    for n in range(number_of_pages):
+        page = DELTA_PAGE.unpack_from(data, offset)[0]
+        offset += DELTA_PAGE.size
+        pages.append((page * page_size, data[offset:offset + page_size]))
+        offset += page_size
+    return count, previous, registers, pages
+
+def delta_filename(directory, count):
+    return os.path.join(directory, 'delta_' + str(count) + '.bin')
+
+def find_checkpoints(directory):
+    # Instruction counts of all delta checkpoints in directory, in increasing order
+    counts = []
+    for name in os.listdir(directory):
+        match = re.fullmatch(r'delta_(\d+)\.bin', name)
+        if match:
+            counts.append(int(match.group(1)))
+    return sorted(counts)
+
+def rebuild(count, directory='.'):
+    # Returns the memory image and register bytes of checkpoint count
+    # The chain ends at zeroed memory, or at a full checkpoint when the run was resumed from one
+    chain = []
+    image = bytearray(total_memory_size)
+    registers = None
+    while count != -1:
+        if not os.path.isfile(delta_filename(directory, count)):
+            with open(os.path.join(directory, 'memory_' + str(count) + '.bin'), 'rb') as f:
+                image = bytearray(f.read())
+            with open(os.path.join(directory, 'register_' + str(count) + '.bin'), 'rb') as f:
+                registers = f.read()
+            break
+        delta = read_delta(delta_filename(directory, count))
+        chain.append(delta)
+        count = delta[1]
+    for delta in reversed(chain):
+        for offset, page in delta[3]:
+            image[offset:offset + len(page)] = page
+    if chain:
+        registers = chain[0][2]
+    return image, registers
+
+def rebuild_all(counts, directory='.'):
+    # Yields (count, memory image, register bytes) for each checkpoint of counts, applying each delta once
+    # when the checkpoints follow each other
+    image = None
+    last = -1
+    for count in sorted(counts):
+        delta = read_delta(delta_filename(directory, count))
+        if image is None or delta[1] != last:
+            image, registers = rebuild(count, directory)
+        else:
+            for offset, page in delta[3]:
+                image[offset:offset + len(page)] = page
+            registers = delta[2]
+        last = count
+        yield count, image, registers
+
+def write_legacy(count, image, registers, directory='.'):
+    with open(os.path.join(directory, 'memory_' + str(count) + '.bin'), 'wb') as f:
+        f.write(image)
+    with open(os.path.join(directory, 'register_' + str(count) + '.bin'), 'wb') as f:
+        f.write(registers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild memory_N.bin and register_N.bin from delta checkpoints')
+    parser.add_argument(dest='counts', type=int, nargs='*', help='instruction counts of the checkpoints to rebuild')
+    parser.add_argument('--all', action='store_true', help='rebuild every delta checkpoint found')
+    parser.add_argument('--dir', default='.', help='directory holding the delta_N.bin files')
+    parser.add_argument('--out', default=None, help='directory receiving the rebuilt files (default: --dir)')
+    args = parser.parse_args()
+
+    counts = find_checkpoints(args.dir) if args.all else args.counts
+    out_directory = args.out if args.out is not None else args.dir
+    os.makedirs(out_directory, exist_ok=True)
+    for count, image, registers in rebuild_all(counts, args.dir):
+        write_legacy(count, image, registers, out_directory)
+
+
+if __name__ == '__main__':
+    main()
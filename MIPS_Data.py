@@ -0,0 +1,54 @@
+import re
+import struct
+
+# Static data segment of a MIPS source, built once by the assembler (or by the simulator for text machine code)
+# Directives are laid out as the simulator always placed them: .asciiz and .ascii strings padded to a multiple of
+# 4 bytes, .byte lists padded to a multiple of 4 bytes, .half lists padded by 2 bytes when their length is
+# 1 more than a multiple of 4, and .word lists not padded
+
+DATA_BASE = 0x500000
+
+
+def directive_values(line, directive):
+    # Returns the comma separated values following directive in line
+    temp = line.split()
+    if directive not in temp:
+        return []
+    start = len(temp) - temp[::-1].index(directive)       # After the last occurrence
+    return "".join(temp[start:]).split(',')
+
+def string_value(line):
+    return re.findall('"([^"]*)"', line)[0].replace("\\n", "\n").replace("\\t", "\t").replace("\\r", "\r")
+
+def assemble_data(asm_text, data_base=DATA_BASE):
+    # Returns the image of the static data to copy at data_base, and the address of each data label
+    image = bytearray()
+    labels = {}
+    for line in asm_text.splitlines():
+        line = line.split('#')[0]  # Removes comments
+        if line == "":
+            continue
+        if '.text' in line:
+            break
+        if ':' in line:
+            label = line.split(':')[0].strip()
+            if label != "" and '"' not in label and len(label.split()) == 1:
+                labels[label] = data_base + len(image)
+        if "asciiz" in line:
+            content = (string_value(line) + "\0").encode('latin-1')
+            image += content + bytes(-len(content) % 4)       # Pads to a multiple of 4 bytes
+        elif "ascii" in line:
+            content = string_value(line).encode('latin-1')
+            image += content + bytes(-len(content) % 4)
+        elif "word" in line:
+            con = directive_values(line, ".word")
+            image += struct.pack('<' + str(len(con)) + 'I', *[int(value) & 0xFFFFFFFF for value in con])
+        elif "byte" in line:
+            con = directive_values(line, ".byte")
+            image += bytes([int(value) & 0xFF for value in con]) + bytes(-len(con) % 4)
+        elif "half" in line:
+            con = directive_values(line, ".half")
+            image += struct.pack('<' + str(len(con)) + 'H', *[int(value) & 0xFFFF for value in con])
+            if len(con) % 4 == 1:
+                image += bytes(2)
+    return image, labels
@@ -0,0 +1,272 @@
+import io
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from MIPS_Simulator import Simulator, read_inputs, instructions, TEXT_BASE, REGISTER_FILE, STATE_FILE
+from MIPS_Checkpoint import rebuild
+from MIPS_Replay import SyscallRecorder, SyscallReplayer, read_syscall_log
+from MIPS_Profile import Profiler
+from MIPS_Trace import TraceRecorder, TRACE_HEADER, TRACE_RECORD, TRACE_MAGIC, TRACE_VERSION
+from MIPS_Cache import Cache, CacheHierarchy, parse_cache, DEFAULT_L1I, DEFAULT_L1D, DEFAULT_L2, MEMORY_LATENCY
+
+# Splits one long run into intervals of instructions. A fast pass with translated blocks writes a delta checkpoint
+# at the start of every interval and at the end of the run. Worker processes then simulate the intervals
+# concurrently, one instruction at a time with instrumentation, and check that each interval ends in the state
+# saved by the next checkpoint. The results of all intervals are merged into one report
+# The fast pass also records a syscall log. Each worker replays the part of it for its interval, so the input lines
+# and the host files of syscalls 13 to 16 are only read and written once, by the fast pass
+# The workers can also run the profiler, the trace recorder and the cache model. Their counts are summed over the
+# intervals like the instruction counts, and the traces of the intervals are joined into one. Each interval starts
+# with an empty call stack and empty caches, so the merged call stacks and misses differ a little from one run
+
+SYSCALL_LOG_NAME = 'syscalls.log'       # In the checkpoint directory
+
+# State kept by each worker process
+worker_program = None      # (asm_text, machine_code, input lines read by the program, checkpoint directory, hooks)
+
+
+def functional_pass(asm_text, machine_code, inputs, interval, directory, max_steps=None):
+    # Returns the instruction counts of the checkpoints written, the output and the exit status of the program
+    # The syscall log is written to SYSCALL_LOG_NAME in directory
+    os.makedirs(directory, exist_ok=True)
+    simulator = Simulator(inputs, io.StringIO(), echo=False, delta_checkpoints=True, checkpoint_directory=directory)
+    simulator.load_program(asm_text, machine_code)
+    recorder = SyscallRecorder(simulator, os.path.join(directory, SYSCALL_LOG_NAME))
+    boundaries = []
+    status = None
+    try:
+        while True:
+            simulator.write_checkpoint()
+            boundaries.append(simulator.current_loop_count)
+            if status is not None:
+                break
+            steps = interval
+            if max_steps is not None:
+                steps = min(steps, max_steps - simulator.current_loop_count)
+                if steps <= 0:
+                    break
+            status = simulator.run(steps)
+            if simulator.current_loop_count == boundaries[-1]:      # Exited without executing an instruction
+                break
+    finally:
+        recorder.close()
+    return boundaries, simulator.out_file.getvalue(), status
+
+def start_worker(asm_text, machine_code, inputs, directory, hooks):
+    global worker_program
+    worker_program = (asm_text, machine_code, inputs, directory, hooks)
+
+def instrument(simulator, content, counters):
+    # Called after each instruction of an interval, with its decoded content
+    # Counts the instructions executed by mnemonic
+    name = instructions[content['index']]
+    counters[name] = counters.get(name, 0) + 1
+
+def simulate_interval(start, end, events):
+    # Simulates the instructions between the checkpoints start and end, and returns a dictionary of its results
+    # events are the file operations of the syscall log run in the interval
+    asm_text, machine_code, inputs, directory, hooks = worker_program
+    begin = time.monotonic()
+    simulator = Simulator([], io.StringIO(), echo=False, translate=False, checkpoint_directory=directory)
+    simulator.load_program(asm_text, machine_code)
+    SyscallReplayer(simulator, (inputs, events))
+    simulator.load_checkpoint(start)
+    output_start = simulator.output_position
+    # The hooks start from the state of the checkpoint
+    profiler = Profiler(simulator) if hooks['profile'] else None
+    caches = CacheHierarchy(simulator, **hooks['caches']) if hooks['caches'] is not None else None
+    tracer = TraceRecorder(simulator, trace_path(directory, start)) if hooks['trace'] else None
+    counters = {}
+    mismatches = []
+    try:
+        while simulator.current_loop_count < end and simulator.exit_status is None:
+            pc = simulator.PC
+            simulator.step()
+            content = simulator.decoded.get(pc)
+            if content is not None:     # Not dropped by a store into its own instruction
+                instrument(simulator, content, counters)
+    except ValueError:      # A file operation other than the logged one
+        mismatches.append('syscalls')
+    finally:
+        if tracer is not None:
+            tracer.close()
+
+    # Compares the state at the end of the interval with the next checkpoint
+    image, registers = rebuild(end, directory)
+    with open(simulator.checkpoint_path('state', end), 'rb') as f:
+        state = f.read()
+    if simulator.current_loop_count != end:
+        mismatches.append('instructions')
+    if simulator.memory[TEXT_BASE:] != image:
+        mismatches.append('memory')
+    if REGISTER_FILE.pack(*simulator.General_Purpose, simulator.PC, simulator.Hi, simulator.Lo) != registers:
+        mismatches.append('registers')
+    if STATE_FILE.pack(simulator.current_input_index, simulator.output_position, simulator.end_of_heap) != state:
+        mismatches.append('state')
+
+    result = {'start': start, 'end': end, 'seconds': round(time.monotonic() - begin, 6),
+              'verified': not mismatches, 'mismatches': mismatches, 'counters': counters,
+              'output_start': output_start, 'output': simulator.out_file.getvalue()}
+    if profiler is not None:
+        # Keyed by hexadecimal PCs, and by "call site target" for the calls, to be written as JSON
+        result['profile'] = {'pcs': {hex(pc): count for pc, count in profiler.pc_counts().items()},
+                             'calls': {hex(site) + " " + hex(target): count
+                                       for (site, target), count in profiler.call_counts().items()}}
+    if caches is not None:
+        result['caches'] = caches.statistics()
+    if tracer is not None:
+        result['trace'] = {'filename': tracer.filename, 'records': tracer.recorded}
+    return result
+
+def trace_path(directory, start):
+    return os.path.join(directory, 'trace_' + str(start) + '.bin')
+
+def add_counts(total, counts):
+    for key, count in counts.items():
+        total[key] = total.get(key, 0) + count
+
+def merge_cache_statistics(intervals):
+    # Sums the statistics of CacheHierarchy over the intervals, and works out the rates again
+    merged = None
+    for statistics in intervals:
+        if merged is None:
+            merged = json.loads(json.dumps(statistics))     # Copy of the nested dictionaries
+            continue
+        for key in ('instructions', 'cycles', 'stall_cycles'):
+            merged[key] += statistics[key]
+        for name in ('L1I', 'L1D', 'L2'):
+            if name in statistics:
+                for key in ('accesses', 'hits', 'misses', 'writebacks'):
+                    merged[name][key] += statistics[name][key]
+        for key in ('reads', 'writes'):
+            merged['memory'][key] += statistics['memory'][key]
+    merged['cpi'] = round(merged['cycles'] / merged['instructions'], 6) if merged['instructions'] else 0.0
+    for name in ('L1I', 'L1D', 'L2'):
+        if name in merged:
+            level = merged[name]
+            level['hit_rate'] = round(level['hits'] / level['accesses'], 6) if level['accesses'] else 0.0
+    return merged
+
+def merge_traces(filenames, trace_filename):
+    # Joins the traces of the intervals, which follow each other, into one trace file
+    parts = []
+    first_step = None
+    for filename in filenames:
+        with open(filename, 'rb') as trace_file:
+            data = trace_file.read()
+        header = TRACE_HEADER.unpack_from(data)
+        if first_step is None:
+            first_step = header[4]
+        parts.append(data[TRACE_HEADER.size:TRACE_HEADER.size + header[5] * TRACE_RECORD.size])
+    with open(trace_filename, 'wb') as trace_file:
+        trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, TRACE_RECORD.size, first_step or 0,
+                                           sum(len(part) for part in parts) // TRACE_RECORD.size))
+        for part in parts:
+            trace_file.write(part)
+
+def simulate_intervals(asm_text, machine_code, inputs, interval, directory, workers=None, max_steps=None,
+                       profile=False, caches=None, trace_filename=None):
+    # Returns the merged results of the intervals
+    # With profile, the workers run a Profiler. With caches, a dictionary of CacheHierarchy arguments, they run the
+    # cache model. With trace_filename, they record traces joined into that file
+    begin = time.monotonic()
+    boundaries, output, status = functional_pass(asm_text, machine_code, inputs, interval, directory, max_steps)
+    functional_seconds = time.monotonic() - begin
+    lines, events = read_syscall_log(os.path.join(directory, SYSCALL_LOG_NAME))
+    counts = [event[0] for event in events]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker,
+                             initargs=(asm_text, machine_code, lines, directory,
+                                       {'profile': profile, 'caches': caches,
+                                        'trace': trace_filename is not None})) as executor:
+        futures = [executor.submit(simulate_interval, start, end,
+                                   events[bisect.bisect_left(counts, start):bisect.bisect_left(counts, end)])
+                   for start, end in zip(boundaries, boundaries[1:])]
+        intervals = [future.result() for future in futures]
+
+    counters = {}
+    for result in intervals:
+        add_counts(counters, result['counters'])
+    merged_output = "".join(result['output'] for result in intervals)
+    results = {'exit_status': status, 'instructions': boundaries[-1], 'interval': interval,
+               'functional_seconds': round(functional_seconds, 6),
+               'verified': all(result['verified'] for result in intervals) and merged_output == output,
+               'counters': dict(sorted(counters.items(), key=lambda item: -item[1])),
+               'output': merged_output, 'intervals': intervals}
+    if profile:
+        pcs = {}
+        calls = {}
+        for result in intervals:
+            add_counts(pcs, result['profile']['pcs'])
+            add_counts(calls, result['profile']['calls'])
+        results['profile'] = {'pcs': dict(sorted(pcs.items(), key=lambda item: -item[1])),
+                              'calls': dict(sorted(calls.items(), key=lambda item: -item[1]))}
+    if caches is not None and intervals:
+        results['caches'] = merge_cache_statistics(result['caches'] for result in intervals)
+    if trace_filename is not None:
+        merge_traces([result['trace']['filename'] for result in intervals], trace_filename)
+        results['trace'] = {'filename': trace_filename,
+                            'records': sum(result['trace']['records'] for result in intervals)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the intervals of one run in parallel from checkpoints')
+    parser.add_argument(dest='MIPS_filename', type=str)
+    parser.add_argument(dest='filename', type=str)
+    parser.add_argument(dest='In_filename', type=str)
+    parser.add_argument(dest='Out_filename', type=str)
+    parser.add_argument(dest='Results_filename', type=str, help='JSON file receiving the merged results')
+    parser.add_argument('--interval', type=int, default=1000000, help='number of instructions in each interval')
+    parser.add_argument('--dir', default='intervals', help='directory receiving the checkpoints of the intervals')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--max-steps', type=int, default=None, help='instruction budget of the run')
+    parser.add_argument('--profile', action='store_true', help='profile the intervals, merged in the results')
+    parser.add_argument('--trace', default=None, metavar='TRACE_FILENAME',
+                        help='record the instructions run by the intervals into one trace file')
+    parser.add_argument('--caches', action='store_true',
+                        help='simulate the intervals through the cache model, merged in the results')
+    parser.add_argument('--l1i', default=DEFAULT_L1I, metavar='SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]]',
+                        help='L1 instruction cache of --caches (default ' + DEFAULT_L1I + ')')
+    parser.add_argument('--l1d', default=DEFAULT_L1D, metavar='SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]]',
+                        help='L1 data cache of --caches (default ' + DEFAULT_L1D + ')')
+    parser.add_argument('--l2', default=None, nargs='?', const=DEFAULT_L2,
+                        metavar='SIZE:WAYS:LINE[:POLICY[:WRITE[:LATENCY]]]',
+                        help='unified L2 cache of --caches, none by default (' + DEFAULT_L2 + ' without a value)')
+    parser.add_argument('--memory-latency', type=int, default=MEMORY_LATENCY,
+                        help='cycles of a memory access with --caches')
+    args = parser.parse_args()
+    caches = None
+    if args.caches:
+        # Checked here, the workers only get settings known to be valid
+        caches = {'l1i': args.l1i, 'l1d': args.l1d, 'l2': args.l2, 'memory_latency': args.memory_latency}
+        try:
+            for name in ('l1i', 'l1d', 'l2'):
+                if caches[name] is not None:
+                    Cache(name.upper(), next_level=None, **parse_cache(caches[name]))
+        except ValueError as error:
+            parser.error(str(error))
+    with open(args.MIPS_filename, 'r') as MIPS_file:
+        asm_text = MIPS_file.read()
+    with open(args.filename, 'rb') as binary_file:
+        machine_code = binary_file.read()
+    inputs = read_inputs(args.In_filename)
+
+    results = simulate_intervals(asm_text, machine_code, inputs, args.interval, args.dir, args.jobs, args.max_steps,
+                                 args.profile, caches, args.trace)
+    with open(args.Out_filename, 'w') as out_file:
+        out_file.write(results['output'])
+    with open(args.Results_filename, 'w') as results_file:
+        json.dump(results, results_file, indent=1)
+    failed = [result for result in results['intervals'] if not result['verified']]
+    print(len(results['intervals']), "intervals,", len(failed), "did not match the next checkpoint")
+    sys.exit(0 if results['verified'] else 1)
+
+
+if __name__ == '__main__':
+    main()
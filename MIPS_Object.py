@@ -0,0 +1,63 @@
+import struct
+
+# Binary object file written by the assembler and loaded by the simulator, in place of the text file with one
+# line of 32 '0'/'1' characters per instruction
+# Layout (little-endian):
+#   header: magic, version, flags, text base, number of text words, data base, data size, number of symbols
+#   text section: one 32-bit word per instruction
+#   data section: image of the static data, copied as is to the data base. Only used when flags has
+#   OBJECT_HAS_DATA, otherwise the static data comes from the MIPS source
+#   symbol table: for each label, its address, the length of its name and its name in utf-8. A data label and a
+#   text label may have the same name, the address tells them apart
+
+OBJECT_MAGIC = b'MOBJ'
+OBJECT_VERSION = 1
+OBJECT_HEADER = struct.Struct('<4sHHIIIII')
+SYMBOL_ENTRY = struct.Struct('<IH')
+OBJECT_EXTENSION = '.mobj'
+OBJECT_HAS_DATA = 1     # Flag set when the data section holds the static data
+
+
+def is_object(data):
+    return bytes(data[:len(OBJECT_MAGIC)]) == OBJECT_MAGIC
+
+def pack_object(text_words, data=None, symbols=None, text_base=0x400000, data_base=0x500000):
+    # Returns the bytes of an object file, symbols is a list of (label name, address) pairs
+    symbols = symbols or []
+    flags = 0
+    if data is not None:
+        flags |= OBJECT_HAS_DATA
+    else:
+        data = b''
+    parts = [OBJECT_HEADER.pack(OBJECT_MAGIC, OBJECT_VERSION, flags, text_base, len(text_words), data_base,
+                                len(data), len(symbols)),
+             struct.pack('<' + str(len(text_words)) + 'I', *text_words),
+             bytes(data)]
+    for name, address in symbols:
+        encoded = name.encode('utf-8')
+        parts.append(SYMBOL_ENTRY.pack(address, len(encoded)))
+        parts.append(encoded)
+    return b''.join(parts)
+
+def read_object(data):
+    # Returns a dictionary with the sections of an object file
+    # The text and data sections are views of data, so they can be copied to memory without unpacking
+    data = memoryview(data)
+    magic, version, flags, text_base, text_count, data_base, data_size, symbol_count = OBJECT_HEADER.unpack_from(data)
+    if magic != OBJECT_MAGIC:
+        raise ValueError("Not a MIPS object file")
+    if version != OBJECT_VERSION:
+        raise ValueError("Unsupported MIPS object version " + str(version))
+    offset = OBJECT_HEADER.size
+    text = data[offset:offset + 4 * text_count]
+    offset += 4 * text_count
+    static_data = data[offset:offset + data_size]
+    offset += data_size
+    symbols = []
+    for n in range(symbol_count):
+        address, length = SYMBOL_ENTRY.unpack_from(data, offset)
+        offset += SYMBOL_ENTRY.size
+        symbols.append((bytes(data[offset:offset + length]).decode('utf-8'), address))
+        offset += length
+    return {'flags': flags, 'text_base': text_base, 'text': text, 'data_base': data_base, 'data': static_data,
+            'symbols': symbols}
@@ -0,0 +1,351 @@
+import io
+import sys
+import time
+import bisect
+import argparse
+
+from MIPS_Simulator import (Simulator, read_inputs, process_exit_status, instructions, TEXT_BASE, WORD,
+                            MAX_BLOCK_LENGTH)
+from MIPS_Assembler import assemble, scan_text
+
+# Profiles a guest program: how many times each PC, each instruction of the instructions table and each call site
+# (jal/jalr and its target) is executed, and, when asked for, which call stacks the instructions run under
+# Counts are kept per block, in an entry found by the PC and the instruction words of the block, and holding the
+# kind of its last instruction. A translated block keeps its entry, an instruction run alone finds its own by PC and
+# instruction word, and the simulator hands the instructions run to count_block or count_single, which only call
+# further for the blocks ending in a call or a return, through the function kept in the entry for that kind. A
+# store into the text segment drops the translated blocks it overwrites, so their entries are found again from the
+# code as it now is, without the profiler checking the stores, and the instructions are counted as the words that
+# ran. Only jalr counts its calls by target, those of jal being the runs of its block, so without the call
+# stacks a block ending in jal or jr has no function and costs no call. With them, the instructions run under each
+# call stack are counted between the calls and returns, from the instruction count of the simulator. A block
+# runs its instructions in order, so the count of each PC is rebuilt from the blocks when the report is written
+# PCs are named after the labels of the assembler, and the report shows the source line of each hot PC. The call
+# stacks are written as collapsed stacks ("main;fib;fib 1234" per line), the input of flame graph tools
+
+CALL = 1      # jal, whose calls are the runs of its block
+CALL_REGISTER = 2       # jalr, whose calls are counted by target
+RETURN = 3
+MAX_STACK_DEPTH = 256     # Calls nested deeper are counted in the deepest frame
+LENGTH_BITS = MAX_BLOCK_LENGTH.bit_length()     # A block is counted under (entry PC << LENGTH_BITS) | length
+
+# Fields of an entry, a list for speed: instructions run, kind of the last instruction, its PC, {target: number of
+# calls}, the function following a call or a return after the block or None, and the instruction words of the block
+COUNT, KIND, LAST_PC, CALLS, FOLLOW, WORDS = range(6)
+
+
+def source_lines(text_lines):
+    # Returns the source line of each instruction address, from the lines under .text kept by the assembler,
+    # scanned again as the .text section of a source
+    sources = scan_text(".text\n" + "\n".join(text_lines), TEXT_BASE)[3]
+    return {TEXT_BASE + 4 * position: line.strip() for position, line in enumerate(sources)}
+
+class Profiler:
+    # Attached to a simulator, which hands each translated block it runs to count_block with the entry it got from
+    # entry() when translating it, and each instruction it runs alone to count_single
+
+    def __init__(self, simulator, stacks=False):
+        self.simulator = simulator
+        self.stacks = stacks        # Follows the calls and returns to count the instructions run under each stack
+        self.frames = [(None, simulator.PC, 0)]     # Each stack as (parent stack, function entry, depth)
+        self.parents = [None]       # Parent of each stack
+        self.children = {}      # (stack << 32) | function entry -> stack
+        self.stack_instructions = [0]       # Instructions run under each stack, up to the last call or return
+        # (block key, instruction words) -> entry, see COUNT... The target of jal is kept in CALLS with no count, its
+        # calls being the runs of the block
+        self.variants = {}
+        self.kinds = {}     # Instruction word -> (kind, target of jal or None)
+        self.singles = {}       # (PC << 32) | instruction word -> entry of the instruction run alone
+        self.count_block, self.count_single, self.settle, self.transitions = self.counter()
+        self.seconds = 0.0
+        simulator.profiler = self
+        simulator.blocks = {}       # Translated again to keep their entries
+
+    def kind(self, word):
+        # Returns (kind, target of jal or None) of an instruction word
+        kind = self.kinds.get(word)
+        if kind is None:
+            content = self.simulator.decode(word)
+            name = instructions[content['index']] if content['index'] is not None else None
+            if name == "jal":
+                kind = (CALL, content['target'])
+            elif name == "jalr":
+                kind = (CALL_REGISTER, None)
+            elif name == "jr" and content['rs'] == 31:
+                kind = (RETURN, None)
+            else:
+                kind = (0, None)
+            self.kinds[word] = kind
+        return kind
+
+    def entry(self, pc, length, words=None):
+        # Returns the entry of the block of length instructions from pc, made of the instruction words in the bytes
+        # words (read from memory when not given)
+        if words is None:
+            words = bytes(self.simulator.memory[pc:pc + 4 * length])
+        key = (pc << LENGTH_BITS | length, words)
+        entry = self.variants.get(key)
+        if entry is None:
+            kind, target = self.kind(WORD.unpack_from(words, 4 * (length - 1))[0])
+            entry = self.variants[key] = [0, kind, pc + 4 * (length - 1), {target: 0} if kind == CALL else {},
+                                          self.transitions.get(kind), words]
+        return entry
+
+    def push(self, stack, target):
+        # Returns the stack called by a call to target from stack, or None when it would be too deep
+        if self.frames[stack][2] >= MAX_STACK_DEPTH:
+            return None
+        child = self.children[stack << 32 | target] = len(self.frames)
+        self.frames.append((stack, target, self.frames[stack][2] + 1))
+        self.parents.append(stack)
+        self.stack_instructions.append(0)
+        return child
+
+    def counter(self):
+        # Returns the functions counting the blocks run, following the calls and returns, and adding the
+        # instructions run since the last call or return to the current stack
+        # The current stack is kept in closure variables, faster to reach than attributes
+        simulator = self.simulator
+        parents = self.parents
+        children = self.children
+        stack_instructions = self.stack_instructions
+        singles = self.singles
+        entry_of = self.entry
+        push = self.push
+        stack = 0
+        mark = simulator.current_loop_count     # Instruction count of the last call or return
+        hidden = 0      # Calls not pushed because the stack was too deep
+
+        # Each is called after a block ending in a call or a return, the next PC being next_pc
+        def call(entry, next_pc):
+            nonlocal stack, mark, hidden
+            child = children.get(stack << 32 | next_pc)
+            if child is None:
+                child = push(stack, next_pc)
+                if child is None:
+                    hidden += 1
+                    return
+            now = simulator.current_loop_count
+            stack_instructions[stack] += now - mark
+            mark = now
+            stack = child
+
+        def count_target(entry, next_pc):
+            calls = entry[3]
+            calls[next_pc] = calls.get(next_pc, 0) + 1
+
+        def call_register(entry, next_pc):
+            count_target(entry, next_pc)
+            call(entry, next_pc)
+
+        def return_(entry, next_pc):
+            nonlocal stack, mark, hidden
+            if hidden:
+                hidden -= 1
+            elif stack:     # Not a return from the stack the profiler started in
+                now = simulator.current_loop_count
+                stack_instructions[stack] += now - mark
+                mark = now
+                stack = parents[stack]
+
+        def count_block(entry, length, executed, next_pc):
+            # The translated block of entry, of length instructions, ran executed instructions, and the next PC is
+            # next_pc
+            partial = executed % length
+            if partial:
+                # Stopped by a store into the text, the last pass being counted as a shorter block of the words it
+                # ran. Only a looping block, which ends in a branch, runs full passes before
+                entry[0] += executed - partial
+                entry = entry_of(entry[2] - 4 * (length - 1), partial, entry[5][:4 * partial])
+                executed = partial
+            entry[0] += executed
+            if entry[4] is not None:
+                entry[4](entry, next_pc)
+
+        def count_single(pc, word, next_pc):
+            # The instruction word at pc ran alone, and the next PC is next_pc
+            entry = singles.get(pc << 32 | word)
+            if entry is None:
+                entry = singles[pc << 32 | word] = entry_of(pc, 1, WORD.pack(word))
+            entry[0] += 1
+            if entry[4] is not None:        # A call or a return
+                entry[4](entry, next_pc)
+
+        def settle():
+            # Adds the instructions run since the last call or return to the current stack
+            nonlocal mark
+            now = simulator.current_loop_count
+            stack_instructions[stack] += now - mark
+            mark = now
+
+        if not self.stacks:
+            return count_block, count_single, settle, {CALL_REGISTER: count_target}
+        return count_block, count_single, settle, {CALL: call, CALL_REGISTER: call_register, RETURN: return_}
+
+    def run(self, max_steps=None):
+        # Runs the simulator with this profiler, and returns its exit status
+        begin = time.perf_counter()
+        status = self.simulator.run(max_steps)
+        self.seconds += time.perf_counter() - begin
+        return status
+
+    # Results ------------------------------------------------------------------------------------
+
+    def entries(self):
+        # Yields (entry PC, length, entry) for each block counted
+        mask = (1 << LENGTH_BITS) - 1
+        for (key, words), entry in self.variants.items():
+            yield key >> LENGTH_BITS, key & mask, entry
+
+    def pc_counts(self):
+        counts = {}
+        for pc, length, entry in self.entries():
+            times = entry[COUNT] // length
+            for address in range(pc, pc + 4 * length, 4):
+                counts[address] = counts.get(address, 0) + times
+        return counts
+
+    def opcode_counts(self):
+        # Executions of each index of the instructions table, reserved instructions last
+        # Counted from the words each block ran, which a self-modifying program may have overwritten since
+        counts = [0] * (len(instructions) + 1)
+        indexes = {}        # Instruction word -> its index
+        for pc, length, entry in self.entries():
+            times = entry[COUNT] // length
+            for (word,) in WORD.iter_unpack(entry[WORDS]):
+                index = indexes.get(word, -1)
+                if index == -1:
+                    index = indexes[word] = self.simulator.decode(word)['index']
+                counts[len(instructions) if index is None else index] += times
+        return counts
+
+    def block_counts(self):
+        # Instructions run in each block, keyed by (entry PC, length)
+        counts = {}
+        for pc, length, entry in self.entries():
+            counts[(pc, length)] = counts.get((pc, length), 0) + entry[COUNT]
+        return counts
+
+    def stack_counts(self):
+        # Instructions run under each stack, empty unless the profiler follows the call stacks
+        if not self.stacks:
+            return {}
+        self.settle()
+        return {stack: count for stack, count in enumerate(self.stack_instructions) if count}
+
+    def call_counts(self):
+        # Number of calls keyed by (PC of the call, target)
+        counts = {}
+        for pc, length, entry in self.entries():
+            for target, calls in entry[CALLS].items():
+                if entry[KIND] == CALL:
+                    calls = entry[COUNT] // length
+                if calls:
+                    counts[(entry[LAST_PC], target)] = counts.get((entry[LAST_PC], target), 0) + calls
+        return counts
+
+    def namer(self, labels):
+        # Returns a function naming an address after the label at or before it
+        names = {}
+        for label, address in labels.items():
+            names.setdefault(address, label)
+        addresses = sorted(names)
+
+        def name(address):
+            position = bisect.bisect_right(addresses, address) - 1
+            if position < 0:
+                return hex(address)
+            offset = address - addresses[position]
+            return names[addresses[position]] + ("+" + hex(offset) if offset else "")
+        return name
+
+    def collapsed_stacks(self, labels=None):
+        # Lines of the collapsed stacks, with the number of instructions run under each stack
+        name = self.namer(labels or {})
+        lines = []
+        for stack, count in self.stack_counts().items():
+            frames = []
+            while stack is not None:
+                frames.append(name(self.frames[stack][1]))
+                stack = self.frames[stack][0]
+            lines.append(";".join(reversed(frames)) + " " + str(count))
+        return sorted(lines)
+
+    def report(self, labels=None, text_lines=None, top=30):
+        # Text report of the hottest PCs, blocks, instructions and call sites
+        name = self.namer(labels or {})
+        lines = source_lines(text_lines or [])
+        total = self.simulator.current_loop_count
+        executed = sum(entry[COUNT] for pc, length, entry in self.entries())
+        out = ["Instructions: " + str(executed) + " profiled of " + str(total) + " run",
+               "Seconds: " + str(round(self.seconds, 6)), ""]
+
+        def percent(count):
+            return ("%.2f%%" % (100.0 * count / executed if executed else 0)).rjust(8)
+
+        out.append("Instructions by opcode")
+        opcodes = self.opcode_counts()
+        for index in sorted(range(len(opcodes)), key=lambda index: -opcodes[index]):
+            if opcodes[index]:
+                mnemonic = instructions[index] if index < len(instructions) else "(reserved)"
+                out.append("  " + mnemonic.ljust(10) + str(opcodes[index]).rjust(14) + percent(opcodes[index]))
+
+        out.append("")
+        out.append("Hottest PCs")
+        pcs = sorted(self.pc_counts().items(), key=lambda item: (-item[1], item[0]))
+        for pc, count in pcs[:top]:
+            out.append("  " + hex(pc) + "  " + name(pc).ljust(24) + str(count).rjust(14) + percent(count) +
+                       "  " + lines.get(pc, ""))
+
+        out.append("")
+        out.append("Hottest blocks")
+        blocks = sorted(self.block_counts().items(), key=lambda item: (-item[1], item[0]))
+        for (pc, length), count in blocks[:top]:
+            out.append("  " + hex(pc) + "  " + name(pc).ljust(24) + (str(length) + " instructions").rjust(18) +
+                       str(count).rjust(14) + percent(count))
+
+        out.append("")
+        out.append("Call sites")
+        for (site, target), count in sorted(self.call_counts().items(), key=lambda item: (-item[1], item[0]))[:top]:
+            out.append("  " + hex(site) + "  " + name(site).ljust(24) + " -> " + name(target).ljust(24) +
+                       str(count).rjust(14))
+        return "\n".join(out) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile a MIPS program while simulating it')
+    parser.add_argument(dest='MIPS_filename', type=str)
+    parser.add_argument(dest='filename', type=str)
+    parser.add_argument(dest='In_filename', type=str)
+    parser.add_argument(dest='Out_filename', type=str)
+    parser.add_argument(dest='Report_filename', type=str, help='text file receiving the report')
+    parser.add_argument('--folded', default=None,
+                        help='file receiving the collapsed stacks for flame graphs (follows the call stacks, which '
+                             'costs a call at every jal and jr)')
+    parser.add_argument('--top', type=int, default=30, help='number of PCs, blocks and call sites reported')
+    parser.add_argument('--interpret', action='store_true',
+                        help='simulate one instruction at a time instead of translating basic blocks')
+    parser.add_argument('--max-steps', type=int, default=None, help='instruction budget of the run')
+    args = parser.parse_args()
+    with open(args.MIPS_filename, 'r') as MIPS_file:
+        asm_text = MIPS_file.read()
+    with open(args.filename, 'rb') as binary_file:
+        machine_code = binary_file.read()
+    program = assemble(asm_text)       # Labels and source lines of the program
+
+    simulator = Simulator(read_inputs(args.In_filename), io.StringIO(), echo=False, translate=not args.interpret)
+    simulator.load_program(asm_text, machine_code)
+    profiler = Profiler(simulator, stacks=args.folded is not None)
+    status = profiler.run(args.max_steps)
+    with open(args.Out_filename, 'w') as out_file:
+        out_file.write(simulator.out_file.getvalue())
+    with open(args.Report_filename, 'w') as report_file:
+        report_file.write(profiler.report(program.labels, program.text_lines, args.top))
+    if args.folded is not None:
+        with open(args.folded, 'w') as folded_file:
+            folded_file.write("".join(line + "\n" for line in profiler.collapsed_stacks(program.labels)))
+    sys.exit(process_exit_status(status or 0))
+
+
+if __name__ == '__main__':
+    main()
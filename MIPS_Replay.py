@@ -0,0 +1,137 @@
+import bisect
+import struct
+import hashlib
+
+# Record and replay of what a guest program gets from the host: the lines of the .in file read by syscalls 5, 8
+# and 12, and the files opened, read, written and closed by syscalls 13 to 16
+# Recording runs the program as usual and logs each line read and each file operation with its result. Replaying
+# feeds the logged lines and results back instead, without reading the .in file or touching any host file, so the
+# run is the same on any machine. sbrk needs nothing logged, its addresses only depend on the program
+# Each file operation is logged with the number of instructions run before its syscall, so a replay resumed from a
+# checkpoint goes on from the operations after it, and a program taking another path is detected: another
+# operation, file, file name or bytes written than the logged ones at that instruction
+# Layout of a syscall log (little-endian):
+#   header: magic, version
+#   events: kind, instruction count, file descriptor, length of the data following, data
+#   (the line read, the name of the file opened, the bytes read, the SHA-256 digest of the bytes written;
+#   nothing for closes)
+
+SYSCALL_LOG_MAGIC = b'MSYS'
+SYSCALL_LOG_VERSION = 2
+SYSCALL_LOG_HEADER = struct.Struct('<4sH')
+SYSCALL_EVENT = struct.Struct('<BQiI')
+
+LOG_INPUT = 1
+LOG_OPEN = 2
+LOG_READ = 3
+LOG_WRITE = 4
+LOG_CLOSE = 5
+event_names = {LOG_INPUT: "input", LOG_OPEN: "open", LOG_READ: "read", LOG_WRITE: "write", LOG_CLOSE: "close"}
+
+
+def read_syscall_log(filename):
+    # Returns the lines read, and the file operations as (instruction count, kind, file descriptor, data)
+    with open(filename, 'rb') as log_file:
+        data = log_file.read()
+    magic, version = SYSCALL_LOG_HEADER.unpack_from(data)
+    if magic != SYSCALL_LOG_MAGIC:
+        raise ValueError(filename + " is not a syscall log")
+    if version != SYSCALL_LOG_VERSION:
+        raise ValueError("Unsupported syscall log version " + str(version))
+    inputs = []
+    events = []
+    offset = SYSCALL_LOG_HEADER.size
+    while offset < len(data):
+        kind, count, fd, length = SYSCALL_EVENT.unpack_from(data, offset)
+        offset += SYSCALL_EVENT.size
+        content = data[offset:offset + length]
+        offset += length
+        if kind == LOG_INPUT:
+            inputs.append(content.decode('utf-8'))
+        else:
+            events.append((count, kind, fd, content))
+    return inputs, events
+
+class SyscallRecorder:
+    # Attached to a simulator after its program is loaded: logs the lines it reads and its file operations
+
+    def __init__(self, simulator, filename):
+        self.simulator = simulator
+        self.log_file = open(filename, 'wb')
+        self.log_file.write(SYSCALL_LOG_HEADER.pack(SYSCALL_LOG_MAGIC, SYSCALL_LOG_VERSION))
+        simulator.set_inputs(self.recorded_inputs(simulator.input_source))
+        simulator.syscall_log = self
+
+    def log(self, kind, fd=0, data=b''):
+        self.log_file.write(SYSCALL_EVENT.pack(kind, self.simulator.current_loop_count, fd, len(data)))
+        self.log_file.write(data)
+
+    def recorded_inputs(self, inputs):
+        # Yields the lines of inputs, logging each one when the simulator reads it
+        for line in inputs:
+            self.log(LOG_INPUT, 0, line.encode('utf-8'))
+            yield line
+
+    def open_file(self, name):
+        fd = self.simulator.open_file(name)
+        self.log(LOG_OPEN, fd, name.encode('utf-8'))
+        return fd
+
+    def read_file(self, fd, length):
+        content = self.simulator.read_file(fd, length)
+        self.log(LOG_READ, fd, content)
+        return content
+
+    def write_file(self, fd, data):
+        self.simulator.write_file(fd, data)
+        self.log(LOG_WRITE, fd, hashlib.sha256(data).digest())
+
+    def close_file(self, fd):
+        self.simulator.close_file(fd)
+        self.log(LOG_CLOSE, fd)
+
+    def close(self):
+        self.log_file.close()
+        if self.simulator.syscall_log is self:
+            self.simulator.syscall_log = None
+
+class SyscallReplayer:
+    # Attached to a simulator after its program is loaded: gives it the lines and file results of a log
+    # Raises ValueError when the program does a file operation the log does not have at that instruction
+
+    def __init__(self, simulator, log):
+        # log is the name of a syscall log, or (lines read, file operations) as returned by read_syscall_log, the
+        # file operations being possibly those of a part of the run only
+        self.simulator = simulator
+        self.inputs, self.events = read_syscall_log(log) if isinstance(log, str) else log
+        self.counts = [event[0] for event in self.events]
+        simulator.set_inputs(self.inputs)
+        simulator.syscall_log = self
+
+    def replay(self, kind, fd=None, data=None):
+        # Returns the operation logged for the syscall being run, which must have the same file descriptor and
+        # data as the one run when they are given
+        count = self.simulator.current_loop_count
+        position = bisect.bisect_left(self.counts, count)
+        if position == len(self.events) or self.events[position][:2] != (count, kind) or \
+                (fd is not None and self.events[position][2] != fd) or \
+                (data is not None and self.events[position][3] != data):
+            raise ValueError("Replay left the syscall log at instruction " + str(count) + " (" + event_names[kind] +
+                             (" of file " + str(fd) if fd is not None else "") + ")")
+        return self.events[position]
+
+    def open_file(self, name):
+        return self.replay(LOG_OPEN, None, name.encode('utf-8'))[2]
+
+    def read_file(self, fd, length):
+        return self.replay(LOG_READ, fd)[3]
+
+    def write_file(self, fd, data):
+        self.replay(LOG_WRITE, fd, hashlib.sha256(data).digest())
+
+    def close_file(self, fd):
+        self.replay(LOG_CLOSE, fd)
+
+    def close(self):
+        if self.simulator.syscall_log is self:
+            self.simulator.syscall_log = None
@@ -1,7 +1,13 @@
-import random
-import re
 import os
+import sys
 import argparse
+import bisect
+import struct
+from array import array
+
+from MIPS_Object import is_object, read_object, OBJECT_HAS_DATA
+from MIPS_Data import assemble_data
+from MIPS_Replay import SyscallRecorder, SyscallReplayer
 
 # List of instructions in assembly language
 # Index: R = 0 to 26, I = 27 to 52, J = 53 to 54
@@ -51,989 +57,1189 @@ translations = [
 
 # General functions -------------------------------------------------------------------------------
 
-def bitstring_to_bytes(s):
-    v = int(s, 2)
-    b = bytearray()
-    while v:
-        b.append(v & 0xff)
-        v >>= 8
-    return bytes(b[::-1])
-
-def ascii_to_bin(a):
-    m = add_bin_length(str(int(bin(ord(a))[2:])), 8)
-    return m
-
-def bin_to_int(binary):
-    sum = 0
-    for i in range(len(binary)):
-        if i == 0:
-            sum -= 2 ** (len(binary) - i - 1) * int(binary[i])
-        else:
-            sum += 2 ** (len(binary) - i - 1) * int(binary[i])
-    return sum
+MASK = 0xFFFFFFFF        # Registers hold unsigned 32-bit values
+SIGN_BIT = 0x80000000
 
-def int_to_bin(number, length):
-    try:
-        decimal = int(number)
-    except:
-        decimal = number
-    if "-" in str(decimal):
-        binary = str(bin(decimal))[3:]
-    else:
-        binary = str(bin(decimal))[2:]
-    real_length = len(binary)
-    if real_length <= length:
-        difference = length - real_length
-        i = 0
-        while i < difference:
-            binary = "0" + binary
-            i += 1
-    else:
-        print("Overflow")
-    if "-" in str(decimal):
-        res = find_comp(binary)
-        return res
-    else:
-        return binary
-
-def find_comp(binary):
-    bin_len = len(binary)
-    res_st = ""
-    for i in range(bin_len):
-        if binary[i] == "0":
-            res_st += "1"
-        elif binary[i] == "1":
-            res_st += "0"
-    for j in range(bin_len - 1, -1, -1):
-        if res_st[j] == "1":
-            res_st = res_st[:j] + "0" + res_st[j + 1:]
-        elif res_st[j] == "0":
-            res_st = res_st[:j] + "1" + res_st[j + 1:]
-            break
-    return res_st
-
-def add_bin_length(binary_string, length, signed=0):
-    if len(binary_string) < length:
-        if signed == 0:
-            while len(binary_string) < length:
-                binary_string = "0" + binary_string
-        else:
-            binary_string = int_to_bin(bin_to_int(binary_string), length)
-    return binary_string
+def to_signed(value):
+    if value & SIGN_BIT:
+        return value - (1 << 32)
+    return value
 
-def binary_add(val1, val2, overflow_check, signed=1):
-    if len(val1) <= len(val2):
-        val1 = add_bin_length(val1, len(val2), signed)
-    else:
-        val2 = add_bin_length(val2, len(val1), signed)
-    res = ""
-    carry = "0"
-    for i in range(len(val1) - 1, -1, -1):
-        temp = [val1[i], val2[i], carry].count("1")
-        if temp == 0 or temp == 1:
-            carry = "0"
-        else:
-            carry = "1"
-        if temp == 0 or temp == 2:
-            res = "0" + res
-        else:
-            res = "1" + res
-    if overflow_check == 1 and val1[0] == val2[0] and res[0] != val1[0]:
-        print("Overflow")
-    else:
-        return res
+def sign_extend(value, bits):
+    if value & (1 << (bits - 1)):
+        value -= 1 << bits
+    return value
 
+# Little-endian views used to load and store words, halfwords and bytes in memory
+WORD = struct.Struct('<I')
+HALF = struct.Struct('<H')
+HALF_SIGNED = struct.Struct('<h')
+BYTE_SIGNED = struct.Struct('<b')
+# Layout of register_N.bin: the 32 general purpose registers, then PC, Hi and Lo
+REGISTER_FILE = struct.Struct('<35I')
+# Layout of state_N.bin: index of the next line of the .in file, number of characters output and end of the heap
+STATE_FILE = struct.Struct('<QQI')
 
-# Register and memory simulation preparation --------------------------------------------------------------
 
-# Simulates registers
-PC = int(hex(0x400000), 16)  # start of text segment
-Lo = "0" * 32
-Hi = "0" * 32
-General_Purpose = []
-for i in range(28):
-    General_Purpose.append("0" * 32)
-General_Purpose.append(int_to_bin(int(hex(0x508000), 16), 32))      # gp
-General_Purpose.append(int_to_bin(int(hex(0xA00000), 16), 32))      # sp
-General_Purpose.append(int_to_bin(int(hex(0xA00000), 16), 32))      # fp
-General_Purpose.append(int_to_bin(int(hex(0x000000), 16), 32))      # ra
+# Memory layout ----------------------------------------------------------------------------------------
 
 # Simulates memory with size 6MB, 1MB for text segments (2^20 bytes)
+# One byte per address, words are stored little-endian
 total_memory_size = 6 * (2 ** 20)
 text_memory_size = 2 ** 20  # 1MB for text segments (2^20 bytes)
 empty = 4 * (2 ** 20)
-memory = []
-for i in range(empty + total_memory_size):
-    memory.append("")
+TEXT_BASE = 0x400000
+DATA_BASE = 0x500000
+GLOBAL_POINTER = 0x508000       # Initial $gp, reaching the static data from DATA_BASE to 0x50FFFF with 16-bit offsets
+
+# Memory is split into pages, and the pages written since the last checkpoint are tracked
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT     # 4KB
+
+# Delta checkpoint delta_N.bin: header, register_N.bin block, then each page written since the previous
+# checkpoint as its page number (counted from TEXT_BASE) followed by its bytes
+# Header: magic, page size, instruction count, instruction count of the previous checkpoint (-1 if none)
+# and number of pages
+DELTA_MAGIC = b'MDLT'
+DELTA_HEADER = struct.Struct('<4sIqqI')
+DELTA_PAGE = struct.Struct('<I')
+
+# Number of characters of output buffered before they are written
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+
+# Decode and translation tables -----------------------------------------------------------------------
+
+# Index of the instruction for each opcode, function code (R-type) and rt field (opcode 1), None if reserved
+opcode_table = [None] * 64
+function_table = [None] * 64
+regimm_table = [None] * 32
+for i in range(len(translations)):
+    trans_list = translations[i].split(" ")
+    if i <= 26:
+        function_table[int(trans_list[-1], 16)] = i
+    elif trans_list[0] == '1':      # bgez and bltz share an opcode, rt tells them apart
+        regimm_table[int(trans_list[2], 16)] = i
+    else:
+        opcode_table[int(trans_list[0], 16)] = i
+
+# Python source simulating each instruction inside a translated block, at the same index as the instructions list
+# {rs}, {rt}, {rd} and {ra} are local copies of registers, {pc} is the address of the following instruction
+# None means the instruction calls its function instead. A store into the text segment or an overflow reaches @exit,
+# which translate_block replaces with a return of the following PC and the number of instructions run so far
+block_templates = [
+    "t = ({rs} + {rt}) & 0xFFFFFFFF\nif ~({rs} ^ {rt}) & ({rs} ^ t) & 0x80000000:\n    self.message(\"Overflow\")\n    self.exit_status = 1\n    @exit\n{rd} = t",
+    "{rd} = ({rs} + {rt}) & 0xFFFFFFFF",
+    "{rd} = {rs} & {rt}",
+    "if {rt} == 0:\n    self.message(\"Zero divisor\")\nelse:\n    a = ({rs} ^ 0x80000000) - 0x80000000\n"
+    "    b = ({rt} ^ 0x80000000) - 0x80000000\n    q = abs(a) // abs(b)\n    if (a < 0) != (b < 0):\n"
+    "        q = -q\n    self.Lo = q & 0xFFFFFFFF\n    self.Hi = (a - b * q) & 0xFFFFFFFF",
+    "if {rt} == 0:\n    self.message(\"Zero divisor\")\nelse:\n    self.Lo = {rs} // {rt}\n    self.Hi = {rs} % {rt}",
+    "next_pc = {rs}\n{rd} = {pc}",
+    "next_pc = {rs}",
+    "{rd} = self.Hi",
+    "{rd} = self.Lo",
+    "self.Hi = {rs}",
+    "self.Lo = {rs}",
+    "p = (({rs} ^ 0x80000000) - 0x80000000) * (({rt} ^ 0x80000000) - 0x80000000)\n"
+    "self.Hi = (p >> 32) & 0xFFFFFFFF\nself.Lo = p & 0xFFFFFFFF",
+    "p = {rs} * {rt}\nself.Hi = p >> 32\nself.Lo = p & 0xFFFFFFFF",
+    "{rd} = ~({rs} | {rt}) & 0xFFFFFFFF",
+    "{rd} = {rs} | {rt}",
+    "{rd} = ({rt} << {shamt}) & 0xFFFFFFFF",
+    "{rd} = ({rt} << ({rs} & 0x1F)) & 0xFFFFFFFF",
+    "{rd} = int(({rs} ^ 0x80000000) < ({rt} ^ 0x80000000))",
+    "{rd} = int({rs} < {rt})",
+    "{rd} = ((({rt} ^ 0x80000000) - 0x80000000) >> {shamt}) & 0xFFFFFFFF",
+    "{rd} = ((({rt} ^ 0x80000000) - 0x80000000) >> ({rs} & 0x1F)) & 0xFFFFFFFF",
+    "{rd} = {rt} >> {shamt}",
+    "{rd} = {rt} >> ({rs} & 0x1F)",
+    "t = ({rs} - {rt}) & 0xFFFFFFFF\nif ({rs} ^ {rt}) & ({rs} ^ t) & 0x80000000:\n    self.message(\"Overflow\")\n    self.exit_status = 1\n    @exit\n{rd} = t",
+    "{rd} = ({rs} - {rt}) & 0xFFFFFFFF",
+    None,
+    "{rd} = {rs} ^ {rt}",
+
+    "t = ({rs} + {imm}) & 0xFFFFFFFF\nif ~({rs} ^ {imm32}) & ({rs} ^ t) & 0x80000000:\n    self.message(\"Overflow\")\n    self.exit_status = 1\n    @exit\n{rt} = t",
+    "{rt} = ({rs} + {imm}) & 0xFFFFFFFF",
+    "{rt} = {rs} & {uimm}",
+    "next_pc = {branch} if {rs} == {rt} else {pc}",
+    "next_pc = {branch} if {rs} < 0x80000000 else {pc}",
+    "next_pc = {branch} if 0 < {rs} < 0x80000000 else {pc}",
+    "next_pc = {branch} if {rs} == 0 or {rs} >= 0x80000000 else {pc}",
+    "next_pc = {branch} if {rs} >= 0x80000000 else {pc}",
+    "next_pc = {branch} if {rs} != {rt} else {pc}",
+    "{rt} = unpack_byte_signed(memory, ({rs} + {imm}) & 0xFFFFFFFF)[0] & 0xFFFFFFFF",
+    "{rt} = memory[({rs} + {imm}) & 0xFFFFFFFF]",
+    "{rt} = unpack_half_signed(memory, ({rs} + {imm}) & 0xFFFFFFFF)[0] & 0xFFFFFFFF",
+    "{rt} = unpack_half(memory, ({rs} + {imm}) & 0xFFFFFFFF)[0]",
+    "{rt} = {uimm} << 16",
+    "{rt} = unpack_word(memory, ({rs} + {imm}) & 0xFFFFFFFF)[0]",
+    "{rt} = {rs} | {uimm}",
+    "a = ({rs} + {imm}) & 0xFFFFFFFF\nmemory[a] = {rt} & 0xFF\ndirty[a >> 12] = 1\nif a < 0x500000:\n    self.invalidate_text(a, 1)\n    @exit",
+    "{rt} = int(({rs} ^ 0x80000000) - 0x80000000 < {imm})",
+    "{rt} = int({rs} < {imm32})",
+    "a = ({rs} + {imm}) & 0xFFFFFFFF\npack_half(memory, a, {rt} & 0xFFFF)\ndirty[a >> 12] = dirty[(a + 1) >> 12] = 1\n"
+    "if a < 0x500000:\n    self.invalidate_text(a, 2)\n"
+    "    @exit",
+    "a = ({rs} + {imm}) & 0xFFFFFFFF\npack_word(memory, a, {rt})\ndirty[a >> 12] = dirty[(a + 3) >> 12] = 1\n"
+    "if a < 0x500000:\n    self.invalidate_text(a, 4)\n"
+    "    @exit",
+    "{rt} = {rs} ^ {uimm}",
+    None, None, None, None,
+
+    "next_pc = {target}",
+    "{ra} = {pc}\nnext_pc = {target}",
+]
 
-# Contains line in .in file
-inputs = []
-current_input_index = 0
+# Instructions that end a basic block
+block_ends = {"jalr", "jr", "syscall", "beq", "bgez", "bgtz", "blez", "bltz", "bne", "j", "jal"}
+MAX_BLOCK_LENGTH = 256
+# Code of the blocks compiled so far, keyed by their source, for blocks translated again after a store into the text
+# segment puts back instructions seen before
+compiled_blocks = {}
+MAX_COMPILED_BLOCKS = 4096
+MAX_REWRITES = 16       # Overwrites of a block after which its entry PC is simulated one instruction at a time
+
+# Index of each instruction reading or writing memory, with True for the stores
+memory_instructions = {instructions.index(name): name[0] == "s" for name in
+                       ("lb", "lbu", "lh", "lhu", "lw", "lwl", "lwr", "sb", "sh", "sw", "swl", "swr")}
+
+
+# Simulator ---------------------------------------------------------------------------------------------
+
+class Simulator:
+    # Holds the registers and memory of one simulated MIPS program. Strings printed by syscalls go to out_file,
+    # and to the console when echo is set. Checkpoint files are written into checkpoint_directory when the number
+    # of executed instructions reaches one of checkpoints
+
+    def __init__(self, inputs=(), out_file=None, checkpoints=(), echo=True, translate=True, delta_checkpoints=False,
+                 checkpoint_directory='.'):
+        self.set_inputs(inputs)
+        self.out_file = out_file
+        self.checkpoints = sorted(set(checkpoints))
+        self.echo = echo
+        self.translate = translate
+        self.delta_checkpoints = delta_checkpoints      # Writes delta_N.bin instead of memory_N.bin and register_N.bin
+        self.checkpoint_directory = checkpoint_directory
+        self.output_buffer = []     # Strings output since the last flush
+        self.buffered_length = 0
+        self.profiler = None        # Counts each block or instruction run, see MIPS_Profile.py
+        self.tracer = None          # Runs and records each instruction, one at a time, see MIPS_Trace.py
+        self.syscall_log = None     # Records or replays the host files used by syscalls, see MIPS_Replay.py
+        self.caches = None          # Cache model given every fetch and memory access, see MIPS_Cache.py
+        self.reset()
+
+    def reset(self):
+        # Simulates registers
+        self.PC = TEXT_BASE  # start of text segment
+        self.Lo = 0
+        self.Hi = 0
+        self.General_Purpose = array('I', [0] * 32)
+        self.General_Purpose[28] = GLOBAL_POINTER      # gp
+        self.General_Purpose[29] = 0xA00000      # sp
+        self.General_Purpose[30] = 0xA00000      # fp
+        self.General_Purpose[31] = 0x000000      # ra
+
+        self.memory = bytearray(empty + total_memory_size)
+        self.dirty_pages = bytearray(len(self.memory) >> PAGE_SHIFT)     # 1 for each page written since the last checkpoint
+        self.last_checkpoint = -1       # Instruction count of the last checkpoint written
+        self.end_of_text = TEXT_BASE     # Address after the last loaded instruction
+        self.decoded = {}       # Predecoded instructions, keyed by PC
+        self.blocks = {}        # Translated blocks keyed by entry PC, as (function, number of instructions), and
+                                # the entry of the profiler counting the block when profiling
+        self.rewrites = {}      # Number of times the block at each entry PC was overwritten
+        self.stepping = 0       # Instructions left to simulate one at a time before the end of the current block
+
+        self.inputs = iter(self.input_source)      # A list starts again from its first line, a stream goes on
+        self.current_input_index = 0
+        self.current_loop_count = 0     # Number of instructions executed
+        self.output_position = 0        # Number of characters output
+        self.exit_status = None
+
+        # For sbrk, the heap starts on the first page after the static data and the $gp window, and grows up towards
+        # $sp. There is no static data until a program is loaded
+        self.load_data_image(b'')
+
+    # Loading programs ---------------------------------------------------------------------------
+
+    def load_program(self, asm_text, machine_code):
+        # Starts a new simulation with the static data of the MIPS source and the machine code from the assembler
+        # machine_code is the text output of the assembler, or the bytes of a text or object file
+        # An object file holding the static data does not need the MIPS source
+        self.flush_output()
+        self.reset()
+        if isinstance(machine_code, (bytes, bytearray, memoryview)) and is_object(machine_code):
+            program = read_object(machine_code)
+            if not program['flags'] & OBJECT_HAS_DATA:
+                self.load_data(asm_text)
+            self.load_object(program)
+        else:
+            self.load_data(asm_text)
+            if isinstance(machine_code, (bytes, bytearray, memoryview)):
+                machine_code = bytes(machine_code).decode('utf-8')
+            self.load_text(machine_code)
+        # Memory starts zeroed, so only the pages filled by the program differ from it
+        for page in range(len(self.dirty_pages)):
+            if self.memory.count(0, page << PAGE_SHIFT, (page + 1) << PAGE_SHIFT) != PAGE_SIZE:
+                self.dirty_pages[page] = 1
+
+    def load_data(self, asm_text):
+        # Append static data segment
+        self.load_data_image(assemble_data(asm_text, DATA_BASE)[0])
+
+    def load_data_image(self, image):
+        self.memory[DATA_BASE:DATA_BASE + len(image)] = image
+        # Blocks from sbrk never overlap data that the program reaches through $gp
+        end_of_data = max(DATA_BASE + len(image), GLOBAL_POINTER + 0x8000)
+        self.heap_base = (end_of_data + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+        self.end_of_heap = self.heap_base
+
+    def load_text(self, machine_code):
+        # Append text data segment
+        location = TEXT_BASE
+        for line in machine_code.splitlines():
+            line = line.replace("\t", "").replace(" ", "")
+            if line == "":
+                continue
+            elif len(line) != 32:
+                print('Line is not binary of length 32')
+                break
+            else:
+                WORD.pack_into(self.memory, location, int(line, 2))
+            location += 4
+        self.end_of_text = location
+
+    def load_object(self, program):
+        # Copies the sections of an object file read by read_object to memory
+        text_base = program['text_base']
+        self.memory[text_base:text_base + len(program['text'])] = program['text']     # Already little-endian words
+        self.end_of_text = text_base + len(program['text'])
+        if program['flags'] & OBJECT_HAS_DATA:
+            self.load_data_image(program['data'])
+
+    # Registers and memory -----------------------------------------------------------------------
+
+    def get_register(self, number):
+        return self.General_Purpose[number]
+
+    def set_register(self, number, value):
+        self.General_Purpose[number] = value & MASK
+
+    def read_memory(self, address, length):
+        return bytes(self.memory[address:address + length])
+
+    def write_memory(self, address, data):
+        self.memory[address:address + len(data)] = data
+        self.mark_dirty(address, len(data))
+        self.invalidate_text(address, len(data))
+
+    def mark_dirty(self, address, length):
+        if length > 0:
+            first = address >> PAGE_SHIFT
+            last = (address + length - 1) >> PAGE_SHIFT
+            self.dirty_pages[first:last + 1] = b'\x01' * (last + 1 - first)
+
+    def invalidate_text(self, address, length):
+        # Drops predecoded instructions and translated blocks overwritten by a store into the text segment
+        if address < DATA_BASE and address + length > TEXT_BASE:
+            for pc in range(address & ~3, address + length, 4):
+                self.decoded.pop(pc, None)
+            for entry in [entry for entry in self.blocks
+                          if entry < address + length and address < entry + 4 * self.blocks[entry][1]]:
+                self.rewrites[entry] = self.rewrites.get(entry, 0) + 1
+                if self.rewrites[entry] >= MAX_REWRITES:
+                    self.blocks[entry] = (None, 0)      # Code rewritten that often is not worth translating
+                else:
+                    del self.blocks[entry]
+
+    def read_string(self, address):
+        end = self.memory.index(0, address)      # Strings are terminated by a null byte
+        return self.memory[address:end].decode('latin-1')
+
+    # Input --------------------------------------------------------------------------------------
+
+    def set_inputs(self, inputs):
+        # Lines read by syscalls 5, 8 and 12. inputs can be a list, an open file, a pipe or a generator of lines,
+        # and is only read when a syscall needs its next line
+        self.input_source = inputs
+        self.inputs = iter(inputs)
+        self.current_input_index = 0
+
+    def read_input(self):
+        line = next(self.inputs, None)
+        if line is None:
+            raise EOFError("No input line left for instruction " + str(self.current_loop_count))
+        self.current_input_index += 1
+        return line.replace("\n", "")
 
-# For sbrk
-end_of_heap = int(hex(0x400000), 16)
+    # Host files ---------------------------------------------------------------------------------
+    # Syscalls 13 to 16 reach the files of the host through these methods, or through the same methods of
+    # syscall_log when it is set
 
+    def host(self):
+        return self.syscall_log if self.syscall_log is not None else self
 
-# MIPS functions --------------------------------------------------------------------------------------
+    def open_file(self, name):
+        if not os.path.isfile(name):
+            os.close(os.open(name, os.O_CREAT))
+        return os.open(name, os.O_RDWR)
 
-def add_function(content):
-    General_Purpose[int(content['rd'], 2)] = binary_add(General_Purpose[int(content['rs'], 2)],
-                                                        General_Purpose[int(content['rt'], 2)], 1)
+    def read_file(self, fd, length):
+        return os.read(fd, length)
 
-def addu_function(content):
-    General_Purpose[int(content['rd'], 2)] = binary_add(General_Purpose[int(content['rs'], 2)],
-                                                        General_Purpose[int(content['rt'], 2)], 0)
+    def write_file(self, fd, data):
+        os.write(fd, data)
 
-def and_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_reg3 = General_Purpose[int(content['rt'], 2)]
-    for i in range(len(binary_reg3)):
-        if binary_reg2[i] == "1" and binary_reg3[i] == "1":
-            binary_reg1 += "1"
+    def close_file(self, fd):
+        os.close(fd)
+
+    # Output is buffered, and flushed when the program stops or exits, before it reads input or writes a file,
+    # at checkpoints, and when OUTPUT_BUFFER_SIZE characters are waiting
+
+    def output(self, string):
+        self.output_position += len(string)
+        self.output_buffer.append(string)
+        self.buffered_length += len(string)
+        if self.buffered_length >= OUTPUT_BUFFER_SIZE:
+            self.flush_output()
+
+    def flush_output(self):
+        if self.output_buffer:
+            text = "".join(self.output_buffer)
+            self.output_buffer.clear()
+            self.buffered_length = 0
+            if self.echo:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            if self.out_file is not None:
+                self.out_file.write(text)
+                self.out_file.flush()
+
+    def discard_output(self):
+        # Drops the output not flushed yet, left by a program that failed
+        self.output_buffer.clear()
+        self.buffered_length = 0
+
+    def message(self, *text):
+        # Prints a message of the simulator after the output of the program so far
+        self.flush_output()
+        print(*text)
+
+    # Running programs ---------------------------------------------------------------------------
+
+    def run(self, max_steps=None):
+        # Simulates until the program exits, or until max_steps more instructions are executed
+        # Returns the exit status, or None if the program has not exited
+        return self.simulate(max_steps, self.translate)
+
+    def step(self, n=1):
+        # Simulates the next n instructions one at a time
+        return self.simulate(n, False)
+
+    def simulate(self, max_steps, translate):
+        if max_steps is None:
+            stop_count = None
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rd'], 2)] = binary_reg1
-
-def div_function(content):
-    global Hi, Lo
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    divisor = bin_to_int(General_Purpose[int(content['rt'], 2)])
-    if divisor == 0:
-        print("Zero divisor")
-    if (temp1 >= 0 and divisor > 0) or (temp1 <= 0 and divisor < 0):
-        quotient = temp1 // divisor
-    elif temp1 > 0 and divisor < 0:
-        quotient = -(temp1 // (-divisor))
-    elif temp1 < 0 and divisor > 0:
-        quotient = -((-temp1) // divisor)
-    remainder = temp1 - divisor * quotient
-    Lo = int_to_bin(quotient, 32)
-    Hi = int_to_bin(remainder, 32)
-
-def divu_function(content):
-    global Hi, Lo
-    temp1 = int(General_Purpose[int(content['rs'], 2)], 2)
-    divisor = int(General_Purpose[int(content['rt'], 2)], 2)
-    if divisor == 0:
-        print("Zero divisor")
-    quotient = temp1 // divisor
-    remainder = temp1 % divisor
-    Lo = int_to_bin(quotient, 32)
-    Hi = int_to_bin(remainder, 32)
-
-def jalr_function(content):
-    global PC
-    General_Purpose[int(content['rd'], 2)] = int_to_bin(PC, 32)
-    PC = int(General_Purpose[int(content['rs'], 2)], 2)
-
-def jr_function(content):
-    global PC
-    PC = int(General_Purpose[int(content['rs'], 2)], 2)
-
-def mult_function(content):
-    global Hi, Lo
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    prod = temp1 * temp2
-    Hi = int_to_bin(prod, 64)[0:32]
-    Lo = int_to_bin(prod, 64)[32:64]
-
-def multu_function(content):
-    global Hi, Lo
-    temp1 = int(General_Purpose[int(content['rs'], 2)], 2)
-    temp2 = int(General_Purpose[int(content['rt'], 2)], 2)
-    prod = temp1 * temp2
-    Hi = int_to_bin(prod, 64)[0:32]
-    Lo = int_to_bin(prod, 64)[32:64]
-
-def mfhi_function(content):
-    General_Purpose[int(content['rd'], 2)] = Hi
-
-def mflo_function(content):
-    General_Purpose[int(content['rd'], 2)] = Lo
-
-def mthi_function(content):
-    global Hi
-    Hi = General_Purpose[int(content['rs'], 2)]
-
-def mtlo_function(content):
-    global Lo
-    Lo = General_Purpose[int(content['rs'], 2)]
-
-def nor_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_reg3 = General_Purpose[int(content['rt'], 2)]
-    for i in range(len(binary_reg3)):
-        if binary_reg2[i] == "0" and binary_reg3[i] == "0":
-            binary_reg1 += "1"
+            stop_count = self.current_loop_count + max_steps
+        # Only the next checkpoint is compared against the instruction count
+        checkpoints = self.checkpoints
+        checkpoint_index = bisect.bisect_left(checkpoints, self.current_loop_count)
+        if checkpoint_index < len(checkpoints) and checkpoints[checkpoint_index] == self.last_checkpoint:
+            checkpoint_index += 1
+        if checkpoint_index < len(checkpoints):
+            next_checkpoint = checkpoints[checkpoint_index]
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rd'], 2)] = binary_reg1
-
-def or_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_reg3 = General_Purpose[int(content['rt'], 2)]
-    for i in range(len(binary_reg3)):
-        if binary_reg2[i] == "1" or binary_reg3[i] == "1":
-            binary_reg1 += "1"
+            next_checkpoint = None
+        profile = self.profiler.count_block if self.profiler is not None else None
+        profile_single = self.profiler.count_single if self.profiler is not None else None
+        trace = self.tracer.step if self.tracer is not None else None
+        translate = translate and trace is None
+        caches = self.caches
+        stepping = self.stepping
+        # The output is also flushed when the program fails, before the error is shown
+        try:
+            while self.exit_status is None:
+                if self.current_loop_count == stop_count:
+                    return None
+                if self.current_loop_count == next_checkpoint:
+                    self.write_checkpoint()
+                    checkpoint_index += 1
+                    if checkpoint_index < len(checkpoints):
+                        next_checkpoint = checkpoints[checkpoint_index]
+                    else:
+                        next_checkpoint = None
+
+                if translate and not stepping:
+                    block = self.blocks.get(self.PC)
+                    if block is None:
+                        if self.PC < TEXT_BASE or self.PC >= self.end_of_text:      # No instruction loaded at PC
+                            self.exit_status = 0
+                            break
+                        block = self.translate_block(self.PC)
+                        if profile is not None and block[1]:
+                            block += (self.profiler.entry(self.PC, block[1]),)     # Counted without a call
+                        self.blocks[self.PC] = block
+                    # Runs the whole block unless it starts with a reserved instruction, or a checkpoint or the
+                    # end of the run falls inside it
+                    if next_checkpoint is not None:
+                        limit = next_checkpoint - self.current_loop_count
+                    else:
+                        limit = MASK
+                    if stop_count is not None:
+                        limit = min(limit, stop_count - self.current_loop_count)
+                    if 0 < block[1] <= limit:
+                        self.PC, executed = block[0](limit)
+                        self.current_loop_count += executed
+                        if profile is not None:
+                            profile(block[2], block[1], executed, self.PC)
+                        continue
+                    # The rest of the block up to its last instruction is simulated one instruction at a time, so
+                    # that no block is translated from the middle of this one
+                    stepping = block[1]
+
+                content = self.decoded.get(self.PC)
+                if content is None:
+                    if self.PC < TEXT_BASE or self.PC >= self.end_of_text:      # No instruction loaded at PC
+                        self.exit_status = 0
+                        break
+                    content = self.decode(WORD.unpack_from(self.memory, self.PC)[0])
+                    self.decoded[self.PC] = content
+                pc = self.PC
+                self.PC = pc + 4
+                if caches is not None:
+                    caches.step(pc, content)
+                if trace is None:
+                    content['handler'](self, content)
+                else:
+                    trace(pc, content)
+
+                self.current_loop_count += 1
+                if stepping:
+                    stepping -= 1
+                if profile_single is not None:
+                    profile_single(pc, content['word'], self.PC)
+        finally:
+            self.stepping = stepping
+            self.flush_output()
+        return self.exit_status
+
+    def checkpoint_path(self, name, count):
+        return os.path.join(self.checkpoint_directory, name + '_' + str(count) + '.bin')
+
+    def write_checkpoint(self):
+        self.flush_output()
+        if self.delta_checkpoints:
+            self.write_delta_checkpoint()
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rd'], 2)] = binary_reg1
-
-def sll_function(content):
-    pos = int(content['shamt'], 2)
-    binary_reg = General_Purpose[int(content['rt'], 2)]
-    i = 0
-    while i < pos:
-        binary_reg = binary_reg[1:] + "0"
-        i += 1
-    General_Purpose[int(content['rd'], 2)] = binary_reg
-
-def sllv_function(content):
-    temp = General_Purpose[int(content['rs'], 2)]
-    pos = int(temp, 2)
-    binary_reg = General_Purpose[int(content['rt'], 2)]
-    i = 0
-    while i < pos:
-        binary_reg = binary_reg[1:] + "0"
-        i += 1
-    General_Purpose[int(content['rd'], 2)] = binary_reg
-
-def slt_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(General_Purpose[int(content['rt'], 2)])
-    if temp1 < temp2:
-        General_Purpose[int(content['rd'], 2)] = int_to_bin(1, 32)
-    else:
-        General_Purpose[int(content['rd'], 2)] = int_to_bin(0, 32)
-
-def sltu_function(content):
-    temp1 = int(General_Purpose[int(content['rs'], 2)], 2)
-    temp2 = int(General_Purpose[int(content['rt'], 2)], 2)
-    if temp1 < temp2:
-        General_Purpose[int(content['rd'], 2)] = int_to_bin(1, 32)
-    else:
-        General_Purpose[int(content['rd'], 2)] = int_to_bin(0, 32)
-
-def sra_function(content):
-    pos = int(content['shamt'], 2)
-    binary_reg = General_Purpose[int(content['rt'], 2)]
-    i = 0
-    while i < pos:
-        binary_reg = binary_reg[0] + binary_reg[:-1]
-        i += 1
-    General_Purpose[int(content['rd'], 2)] = binary_reg
-
-def srav_function(content):
-    temp = General_Purpose[int(content['rs'], 2)]
-    pos = int(temp, 2)
-    binary_reg = General_Purpose[int(content['rt'], 2)]
-    i = 0
-    while i < pos:
-        binary_reg = binary_reg[0] + binary_reg[:-1]
-        i += 1
-    General_Purpose[int(content['rd'], 2)] = binary_reg
-
-def srl_function(content):
-    pos = int(content['shamt'], 2)
-    binary_reg = General_Purpose[int(content['rt'], 2)]
-    i = 0
-    while i < pos:
-        binary_reg = "0" + binary_reg[:-1]
-        i += 1
-    General_Purpose[int(content['rd'], 2)] = binary_reg
-
-def srlv_function(content):
-    temp = General_Purpose[int(content['rs'], 2)]
-    pos = int(temp, 2)
-    binary_reg = General_Purpose[int(content['rt'], 2)]
-    i = 0
-    while i < pos:
-        binary_reg = "0" + binary_reg[:-1]
-        i += 1
-    General_Purpose[int(content['rd'], 2)] = binary_reg
-
-def sub_function(content):
-    General_Purpose[int(content['rd'], 2)] = binary_add(General_Purpose[int(content['rs'], 2)],
-                                                        find_comp(General_Purpose[int(content['rt'], 2)]), 1)
-
-def subu_function(content):
-    General_Purpose[int(content['rd'], 2)] = binary_add(General_Purpose[int(content['rs'], 2)],
-                                                        find_comp(General_Purpose[int(content['rt'], 2)]), 0)
-
-def xor_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_reg3 = General_Purpose[int(content['rt'], 2)]
-    for i in range(len(binary_reg3)):
-        if binary_reg2[i] != binary_reg3[i]:
-            binary_reg1 += "1"
+            self.write_full_checkpoint()
+        with open(self.checkpoint_path('state', self.current_loop_count), 'wb') as f:
+            f.write(STATE_FILE.pack(self.current_input_index, self.output_position, self.end_of_heap))
+        self.dirty_pages[:] = bytes(len(self.dirty_pages))
+        self.last_checkpoint = self.current_loop_count
+
+    def load_checkpoint(self, count):
+        # Continues the loaded program from the checkpoint written after count instructions, from either
+        # memory_N.bin and register_N.bin or the delta_N.bin checkpoints
+        if os.path.isfile(self.checkpoint_path('memory', count)):
+            with open(self.checkpoint_path('memory', count), 'rb') as f:
+                image = f.read()
+            with open(self.checkpoint_path('register', count), 'rb') as f:
+                registers = f.read()
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rd'], 2)] = binary_reg1
-
-def addi_function(content):
-    General_Purpose[int(content['rt'], 2)] = binary_add(General_Purpose[int(content['rs'], 2)],
-                                                        add_bin_length(content['imm'], 32, 1), 1)
-
-def addiu_function(content):
-    General_Purpose[int(content['rt'], 2)] = binary_add(General_Purpose[int(content['rs'], 2)],
-                                                        add_bin_length(content['imm'], 32, 1), 0)
-
-def andi_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_imm = add_bin_length(content['imm'], 32)
-    for i in range(len(binary_imm)):
-        if binary_imm[i] == "1" and binary_reg2[i] == "1":
-            binary_reg1 += "1"
+            from MIPS_Checkpoint import rebuild
+            image, registers = rebuild(count, self.checkpoint_directory)
+        with open(self.checkpoint_path('state', count), 'rb') as f:
+            state = STATE_FILE.unpack(f.read())
+        if len(image) != len(self.memory) - TEXT_BASE:     # Assigning the slice would resize memory
+            raise ValueError("Checkpoint " + str(count) + " holds " + str(len(image)) + " bytes of memory, not " +
+                             str(len(self.memory) - TEXT_BASE))
+
+        # The lines read before the checkpoint are skipped by reading them. A list of lines starts again from its
+        # first line, but a stream (a file, a pipe or standard input) only goes forward, so it must not have read
+        # past them already
+        if state[0] < self.current_input_index:
+            if iter(self.input_source) is self.input_source:
+                raise ValueError("Checkpoint " + str(count) + " was written after " + str(state[0]) +
+                                 " input lines, but the input stream has already read " +
+                                 str(self.current_input_index) + " and cannot go back")
+            self.set_inputs(self.input_source)
+        try:
+            while self.current_input_index < state[0]:
+                self.read_input()
+        except EOFError:
+            raise ValueError("Checkpoint " + str(count) + " was written after " + str(state[0]) +
+                             " input lines, but the input holds only " + str(self.current_input_index)) from None
+
+        self.memory[TEXT_BASE:] = image
+        values = REGISTER_FILE.unpack(registers)
+        self.General_Purpose[:] = array('I', values[:32])
+        self.PC, self.Hi, self.Lo = values[32:]
+        self.output_position, self.end_of_heap = state[1:]
+        self.current_loop_count = count
+        self.decoded.clear()
+        self.blocks.clear()
+        self.stepping = 0
+        # The checkpoint itself is not written again, and later delta checkpoints start from it
+        self.dirty_pages[:] = bytes(len(self.dirty_pages))
+        self.last_checkpoint = count
+
+    def write_full_checkpoint(self):
+        # Memory is already stored little-endian, so the image is written straight from it without a copy
+        with open(self.checkpoint_path('memory', self.current_loop_count), 'wb') as f:
+            with memoryview(self.memory) as view:
+                f.write(view[TEXT_BASE:])
+
+        with open(self.checkpoint_path('register', self.current_loop_count), 'wb') as reg_checkpt:
+            reg_checkpt.write(REGISTER_FILE.pack(*self.General_Purpose, self.PC, self.Hi, self.Lo))
+
+    def write_delta_checkpoint(self):
+        # Only the pages written since the last checkpoint are saved, MIPS_Checkpoint.py rebuilds the full files
+        first = TEXT_BASE >> PAGE_SHIFT
+        pages = [page for page in range(first, len(self.dirty_pages)) if self.dirty_pages[page]]
+        with open(self.checkpoint_path('delta', self.current_loop_count), 'wb') as f:
+            f.write(DELTA_HEADER.pack(DELTA_MAGIC, PAGE_SIZE, self.current_loop_count, self.last_checkpoint,
+                                      len(pages)))
+            f.write(REGISTER_FILE.pack(*self.General_Purpose, self.PC, self.Hi, self.Lo))
+            with memoryview(self.memory) as view:
+                for page in pages:
+                    f.write(DELTA_PAGE.pack(page - first))
+                    f.write(view[page << PAGE_SHIFT:(page + 1) << PAGE_SHIFT])
+
+    # MIPS functions -----------------------------------------------------------------------------
+
+    def add_function(self, content):
+        temp1 = self.General_Purpose[content['rs']]
+        temp2 = self.General_Purpose[content['rt']]
+        result = (temp1 + temp2) & MASK
+        if ~(temp1 ^ temp2) & (temp1 ^ result) & SIGN_BIT:     # Operands agree in sign but the result does not
+            self.message("Overflow")
+            self.exit_status = 1  # terminate the program
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rt'], 2)] = binary_reg1
-
-def beq_function(content):
-    global PC
-    if General_Purpose[int(content['rs'], 2)] == General_Purpose[int(content['rt'], 2)]:
-        PC += bin_to_int(content['labl']) * 4
-
-def bgez_function(content):
-    global PC
-    if bin_to_int(General_Purpose[int(content['rs'], 2)]) >= 0:
-        PC += bin_to_int(content['labl']) * 4
-
-def bgtz_function(content):
-    global PC
-    if bin_to_int(General_Purpose[int(content['rs'], 2)]) > 0:
-        PC += bin_to_int(content['labl']) * 4
-
-def blez_function(content):
-    global PC
-    if bin_to_int(General_Purpose[int(content['rs'], 2)]) <= 0:
-        PC += bin_to_int(content['labl']) * 4
-
-def bltz_function(content):
-    global PC
-    if bin_to_int(General_Purpose[int(content['rs'], 2)]) < 0:
-        PC += bin_to_int(content['labl']) * 4
-
-def bne_function(content):
-    global PC
-    if General_Purpose[int(content['rs'], 2)] != General_Purpose[int(content['rt'], 2)]:
-        PC += bin_to_int(content['labl']) * 4
-
-def lb_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    General_Purpose[int(content['rt'], 2)] = add_bin_length(memory[address], 32, 1)
-
-def lbu_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    General_Purpose[int(content['rt'], 2)] = add_bin_length(memory[address], 32, 0)
-
-def lh_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    General_Purpose[int(content['rt'], 2)] = add_bin_length((memory[address + 1] + memory[address]), 32, 1)
-
-def lhu_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    General_Purpose[int(content['rt'], 2)] = add_bin_length((memory[address + 1] + memory[address]), 32, 0)
-
-def lui_function(content):
-    General_Purpose[int(content['rt'], 2)] = content['imm'] + "0" * 16
-
-def lw_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    General_Purpose[int(content['rt'], 2)] = memory[address + 3] + memory[address + 2] + memory[
-        address + 1] + memory[address]
-
-def lwl_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    res_string = ""
-    res_string += (General_Purpose[int(content['rt'], 2)][0:8 * ((4 - temp2) - 1)])
-    for n in range(temp2 + 1):
-        res_string += (memory[temp1 + n])
-    General_Purpose[int(content['rt'], 2)] = res_string
-
-def lwr_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    res_string = ""
-    added = 0
-    for n in range((temp2 // 4) * 4, temp2 + 1):
-        res_string += (memory[temp1 + n])
-        added += 1
-    res_string += (General_Purpose[int(content['rt'], 2)][(8 * added):])
-    General_Purpose[int(content['rt'], 2)] = res_string
-
-def swl_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    i = 4 - temp2 - 1
-    for j in range(temp2, ((temp2 // 4) + 1) * 4):
-        memory[temp1 + i] = General_Purpose[int(content['rt'], 2)][8 * j:8 * (j + 1)]
-        i += 1
-
-def swr_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    i = temp2
-    for j in range(0, temp2 + 1):
-        memory[temp1 + i] = General_Purpose[int(content['rt'], 2)][8 * j:8 * (j + 1)]
-        i -= 1
-
-def ori_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_imm = add_bin_length(content['imm'], 32)
-    for i in range(len(binary_imm)):
-        if binary_imm[i] == "1" or binary_reg2[i] == "1":
-            binary_reg1 += "1"
+            self.General_Purpose[content['rd']] = result
+
+    def addu_function(self, content):
+        self.General_Purpose[content['rd']] = (self.General_Purpose[content['rs']] +
+                                                  self.General_Purpose[content['rt']]) & MASK
+
+    def and_function(self, content):
+        self.General_Purpose[content['rd']] = self.General_Purpose[content['rs']] & \
+                                                 self.General_Purpose[content['rt']]
+
+    def div_function(self, content):
+        temp1 = to_signed(self.General_Purpose[content['rs']])
+        divisor = to_signed(self.General_Purpose[content['rt']])
+        if divisor == 0:
+            self.message("Zero divisor")
+            return
+        quotient = abs(temp1) // abs(divisor)      # Quotient is truncated towards zero
+        if (temp1 < 0) != (divisor < 0):
+            quotient = -quotient
+        remainder = temp1 - divisor * quotient
+        self.Lo = quotient & MASK
+        self.Hi = remainder & MASK
+
+    def divu_function(self, content):
+        temp1 = self.General_Purpose[content['rs']]
+        divisor = self.General_Purpose[content['rt']]
+        if divisor == 0:
+            self.message("Zero divisor")
+            return
+        self.Lo = temp1 // divisor
+        self.Hi = temp1 % divisor
+
+    def jalr_function(self, content):
+        target = self.General_Purpose[content['rs']]
+        self.General_Purpose[content['rd']] = self.PC
+        self.PC = target
+
+    def jr_function(self, content):
+        self.PC = self.General_Purpose[content['rs']]
+
+    def mult_function(self, content):
+        temp1 = to_signed(self.General_Purpose[content['rs']])
+        temp2 = to_signed(self.General_Purpose[content['rt']])
+        prod = temp1 * temp2
+        self.Hi = (prod >> 32) & MASK
+        self.Lo = prod & MASK
+
+    def multu_function(self, content):
+        prod = self.General_Purpose[content['rs']] * self.General_Purpose[content['rt']]
+        self.Hi = prod >> 32
+        self.Lo = prod & MASK
+
+    def mfhi_function(self, content):
+        self.General_Purpose[content['rd']] = self.Hi
+
+    def mflo_function(self, content):
+        self.General_Purpose[content['rd']] = self.Lo
+
+    def mthi_function(self, content):
+        self.Hi = self.General_Purpose[content['rs']]
+
+    def mtlo_function(self, content):
+        self.Lo = self.General_Purpose[content['rs']]
+
+    def nor_function(self, content):
+        self.General_Purpose[content['rd']] = ~(self.General_Purpose[content['rs']] |
+                                                   self.General_Purpose[content['rt']]) & MASK
+
+    def or_function(self, content):
+        self.General_Purpose[content['rd']] = self.General_Purpose[content['rs']] | \
+                                                 self.General_Purpose[content['rt']]
+
+    def sll_function(self, content):
+        pos = content['shamt']
+        self.General_Purpose[content['rd']] = (self.General_Purpose[content['rt']] << pos) & MASK
+
+    def sllv_function(self, content):
+        pos = self.General_Purpose[content['rs']] & 0x1F      # Only the low 5 bits are used as shift amount
+        self.General_Purpose[content['rd']] = (self.General_Purpose[content['rt']] << pos) & MASK
+
+    def slt_function(self, content):
+        temp1 = to_signed(self.General_Purpose[content['rs']])
+        temp2 = to_signed(self.General_Purpose[content['rt']])
+        self.General_Purpose[content['rd']] = int(temp1 < temp2)
+
+    def sltu_function(self, content):
+        self.General_Purpose[content['rd']] = int(self.General_Purpose[content['rs']] <
+                                                     self.General_Purpose[content['rt']])
+
+    def sra_function(self, content):
+        pos = content['shamt']
+        self.General_Purpose[content['rd']] = (to_signed(self.General_Purpose[content['rt']]) >> pos) & MASK
+
+    def srav_function(self, content):
+        pos = self.General_Purpose[content['rs']] & 0x1F
+        self.General_Purpose[content['rd']] = (to_signed(self.General_Purpose[content['rt']]) >> pos) & MASK
+
+    def srl_function(self, content):
+        pos = content['shamt']
+        self.General_Purpose[content['rd']] = self.General_Purpose[content['rt']] >> pos
+
+    def srlv_function(self, content):
+        pos = self.General_Purpose[content['rs']] & 0x1F
+        self.General_Purpose[content['rd']] = self.General_Purpose[content['rt']] >> pos
+
+    def sub_function(self, content):
+        temp1 = self.General_Purpose[content['rs']]
+        temp2 = self.General_Purpose[content['rt']]
+        result = (temp1 - temp2) & MASK
+        if (temp1 ^ temp2) & (temp1 ^ result) & SIGN_BIT:      # Operands differ in sign and the result flips
+            self.message("Overflow")
+            self.exit_status = 1  # terminate the program
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rt'], 2)] = binary_reg1
-
-def sb_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    memory[address] = General_Purpose[int(content['rt'], 2)][24:32]
-
-def slti_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    if temp1 < temp2:
-        General_Purpose[int(content['rt'], 2)] = int_to_bin(1, 32)
-    else:
-        General_Purpose[int(content['rt'], 2)] = int_to_bin(0, 32)
-
-def sltiu_function(content):
-    temp1 = int(General_Purpose[int(content['rs'], 2)], 2)
-    temp2 = int(content['imm'], 2)
-    if temp1 < temp2:
-        General_Purpose[int(content['rt'], 2)] = int_to_bin(1, 32)
-    else:
-        General_Purpose[int(content['rt'], 2)] = int_to_bin(0, 32)
-
-def sh_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    memory[address + 1] = General_Purpose[int(content['rt'], 2)][16:24]
-    memory[address] = General_Purpose[int(content['rt'], 2)][24:32]
-
-def sw_function(content):
-    temp1 = bin_to_int(General_Purpose[int(content['rs'], 2)])
-    temp2 = bin_to_int(content['imm'])
-    address = temp1 + temp2
-    memory[address + 3] = General_Purpose[int(content['rt'], 2)][0:8]
-    memory[address + 2] = General_Purpose[int(content['rt'], 2)][8:16]
-    memory[address + 1] = General_Purpose[int(content['rt'], 2)][16:24]
-    memory[address] = General_Purpose[int(content['rt'], 2)][24:32]
-
-def xori_function(content):
-    binary_reg1 = ""
-    binary_reg2 = General_Purpose[int(content['rs'], 2)]
-    binary_imm = add_bin_length(content['imm'], 32)
-    for i in range(len(binary_imm)):
-        if binary_imm[i] != binary_reg2[i]:
-            binary_reg1 += "1"
+            self.General_Purpose[content['rd']] = result
+
+    def subu_function(self, content):
+        self.General_Purpose[content['rd']] = (self.General_Purpose[content['rs']] -
+                                                  self.General_Purpose[content['rt']]) & MASK
+
+    def xor_function(self, content):
+        self.General_Purpose[content['rd']] = self.General_Purpose[content['rs']] ^ \
+                                                 self.General_Purpose[content['rt']]
+
+    def addi_function(self, content):
+        temp1 = self.General_Purpose[content['rs']]
+        temp2 = content['imm'] & MASK
+        result = (temp1 + temp2) & MASK
+        if ~(temp1 ^ temp2) & (temp1 ^ result) & SIGN_BIT:
+            self.message("Overflow")
+            self.exit_status = 1  # terminate the program
         else:
-            binary_reg1 += "0"
-    General_Purpose[int(content['rt'], 2)] = binary_reg1
-
-def j_function(content):
-    global PC
-    PC = int(content['targ'], 2) * 4
-
-def jal_function(content):
-    global PC
-    General_Purpose[31] = int_to_bin(PC, 32)
-    PC = int(content['targ'], 2) * 4
-
-def syscall_function():
-    global PC
-    global inputs, current_input_index
-    global out_file
-    v0 = int(General_Purpose[2], 2)
-    if v0 == 1:
-        print(bin_to_int(General_Purpose[4]), end='', flush=True)  # print integer stored in a0 register
-        print(bin_to_int(General_Purpose[4]), file=out_file, end='', flush=True)
-    elif v0 == 4:
-        address = int(General_Purpose[4], 2)
-        while memory[address] != "" and memory[address] != "00000000":
-            binary_int = int(memory[address], 2)
-            print(chr(binary_int), end='', flush=True)
-            print(chr(binary_int), file=out_file, end='', flush=True)
-            address += 1
-    elif v0 == 5:
-        integer = inputs[current_input_index]  # input integer from .in file
-        current_input_index += 1
-        General_Purpose[2] = int_to_bin(integer, 32)  # store in v0 register
-    elif v0 == 8:
-        string = inputs[current_input_index]  # input string from .in file
-        current_input_index += 1
-        length = int(General_Purpose[5], 2)
-        address = int(General_Purpose[4], 2)
-        for i in range(length):
-            if i < length - 1:
-                if i < len(string):
-                    memory[address + i] = int_to_bin(ord(string[i]), 8)  # store the characters to memory
-                else:
-                    memory[address + i] = ascii_to_bin('\0')
-            elif i == length - 1:
-                memory[address + i] = ascii_to_bin('\0')
-    elif v0 == 9:
-        size = int(General_Purpose[4], 2)
-        allocate = [1]
-        check = [0]
-        while check != allocate:
-            allocate = []
-            check = []
-            address = random.randint(9 * (2 ** 20), len(memory) - size)
-            for i in range(size):
-                check.append("")
-                allocate.append(memory[address + i])
-        General_Purpose[2] = int_to_bin(address, 32)
-    elif v0 == 10:
-        out_file.close()
-        os._exit(0)  # terminate the program
-    elif v0 == 11:
-        asc = bin_to_int(General_Purpose[4])
-        character = chr(asc)
-        print(character, end='', flush=True)  # print character stored in a0 register
-        print(character, file=out_file, end='', flush=True)
-    elif v0 == 12:
-        character = inputs[current_input_index]  # character from .in file
-        current_input_index += 1
-        asc = ord(character)
-        General_Purpose[2] = int_to_bin(asc, 32)
-    elif v0 == 13:
-        address = int(General_Purpose[4], 2)
-        f_name = ""
-        while memory[address] != "" and memory[address] != "00000000":
-            binary_int = int(memory[address], 2)
-            f_name += chr(binary_int)
-            address += 1
-        if os.path.isfile(f_name[1:]):
-            a = 1
+            self.General_Purpose[content['rt']] = result
+
+    def addiu_function(self, content):
+        self.General_Purpose[content['rt']] = (self.General_Purpose[content['rs']] +
+                                                  content['imm']) & MASK
+
+    def andi_function(self, content):
+        self.General_Purpose[content['rt']] = self.General_Purpose[content['rs']] & (content['imm'] & 0xFFFF)
+
+    def beq_function(self, content):
+        if self.General_Purpose[content['rs']] == self.General_Purpose[content['rt']]:
+            self.PC += content['imm'] * 4
+
+    def bgez_function(self, content):
+        if to_signed(self.General_Purpose[content['rs']]) >= 0:
+            self.PC += content['imm'] * 4
+
+    def bgtz_function(self, content):
+        if to_signed(self.General_Purpose[content['rs']]) > 0:
+            self.PC += content['imm'] * 4
+
+    def blez_function(self, content):
+        if to_signed(self.General_Purpose[content['rs']]) <= 0:
+            self.PC += content['imm'] * 4
+
+    def bltz_function(self, content):
+        if to_signed(self.General_Purpose[content['rs']]) < 0:
+            self.PC += content['imm'] * 4
+
+    def bne_function(self, content):
+        if self.General_Purpose[content['rs']] != self.General_Purpose[content['rt']]:
+            self.PC += content['imm'] * 4
+
+    def lb_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        self.General_Purpose[content['rt']] = BYTE_SIGNED.unpack_from(self.memory, address)[0] & MASK
+
+    def lbu_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        self.General_Purpose[content['rt']] = self.memory[address]
+
+    def lh_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        self.General_Purpose[content['rt']] = HALF_SIGNED.unpack_from(self.memory, address)[0] & MASK
+
+    def lhu_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        self.General_Purpose[content['rt']] = HALF.unpack_from(self.memory, address)[0]
+
+    def lui_function(self, content):
+        self.General_Purpose[content['rt']] = (content['imm'] & 0xFFFF) << 16
+
+    def lw_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        self.General_Purpose[content['rt']] = WORD.unpack_from(self.memory, address)[0]
+
+    def lwl_function(self, content):
+        base = self.General_Purpose[content['rs']]
+        offset = content['imm']
+        kept = 8 * (offset + 1)
+        value = self.General_Purpose[content['rt']] >> kept << kept     # Keeps the upper 3 - offset bytes of rt
+        for n in range(offset + 1):
+            value |= self.memory[base + n] << (8 * (offset - n))
+        self.General_Purpose[content['rt']] = value & MASK
+
+    def lwr_function(self, content):
+        base = self.General_Purpose[content['rs']]
+        offset = content['imm']
+        first = (offset // 4) * 4
+        added = offset + 1 - first
+        value = self.General_Purpose[content['rt']] & (MASK >> (8 * added))    # Keeps the lower 4 - added bytes
+        for n in range(added):
+            value |= self.memory[base + first + n] << (8 * (3 - n))
+        self.General_Purpose[content['rt']] = value & MASK
+
+    def swl_function(self, content):
+        base = self.General_Purpose[content['rs']]
+        offset = content['imm']
+        reg = self.General_Purpose[content['rt']]
+        i = 4 - offset - 1
+        for j in range(offset, ((offset // 4) + 1) * 4):
+            self.memory[base + i] = (reg >> (8 * (3 - j))) & 0xFF      # Byte j of rt, counted from the most significant
+            self.dirty_pages[(base + i) >> PAGE_SHIFT] = 1
+            i += 1
+        self.invalidate_text(base, 8)
+
+    def swr_function(self, content):
+        base = self.General_Purpose[content['rs']]
+        offset = content['imm']
+        reg = self.General_Purpose[content['rt']]
+        i = offset
+        for j in range(0, offset + 1):
+            self.memory[base + i] = (reg >> (8 * (3 - j))) & 0xFF
+            self.dirty_pages[(base + i) >> PAGE_SHIFT] = 1
+            i -= 1
+        self.invalidate_text(base, 8)
+
+    def ori_function(self, content):
+        self.General_Purpose[content['rt']] = self.General_Purpose[content['rs']] | (content['imm'] & 0xFFFF)
+
+    def sb_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        self.memory[address] = self.General_Purpose[content['rt']] & 0xFF
+        self.dirty_pages[address >> PAGE_SHIFT] = 1
+        if address < DATA_BASE:
+            self.invalidate_text(address, 1)
+
+    def slti_function(self, content):
+        temp1 = to_signed(self.General_Purpose[content['rs']])
+        temp2 = content['imm']
+        self.General_Purpose[content['rt']] = int(temp1 < temp2)
+
+    def sltiu_function(self, content):
+        temp1 = self.General_Purpose[content['rs']]
+        temp2 = content['imm'] & MASK     # Sign-extended, then compared as unsigned
+        self.General_Purpose[content['rt']] = int(temp1 < temp2)
+
+    def sh_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        HALF.pack_into(self.memory, address, self.General_Purpose[content['rt']] & 0xFFFF)
+        self.mark_dirty(address, 2)
+        if address < DATA_BASE:
+            self.invalidate_text(address, 2)
+
+    def sw_function(self, content):
+        address = (self.General_Purpose[content['rs']] + content['imm']) & MASK
+        WORD.pack_into(self.memory, address, self.General_Purpose[content['rt']])
+        self.mark_dirty(address, 4)
+        if address < DATA_BASE:
+            self.invalidate_text(address, 4)
+
+    def xori_function(self, content):
+        self.General_Purpose[content['rt']] = self.General_Purpose[content['rs']] ^ (content['imm'] & 0xFFFF)
+
+    def j_function(self, content):
+        self.PC = content['target']
+
+    def jal_function(self, content):
+        self.General_Purpose[31] = self.PC
+        self.PC = content['target']
+
+    def syscall_function(self, content):
+        v0 = self.General_Purpose[2]
+        if v0 in (5, 8, 12, 14, 15):
+            self.flush_output()     # Output so far comes before reading input or writing a file
+        if v0 == 1:
+            self.output(str(to_signed(self.General_Purpose[4])))  # print integer stored in a0 register
+        elif v0 == 4:
+            self.output(self.read_string(self.General_Purpose[4]))
+        elif v0 == 5:
+            integer = self.read_input()  # input integer from .in file
+            self.General_Purpose[2] = int(integer) & MASK  # store in v0 register
+        elif v0 == 8:
+            string = self.read_input()  # input string from .in file
+            length = self.General_Purpose[5]
+            address = self.General_Purpose[4]
+            if length > 0:
+                data = string[:length - 1].encode('latin-1')     # store the characters to self.memory
+                self.memory[address:address + length] = data + bytes(length - len(data))   # null padded
+                self.mark_dirty(address, length)
+                self.invalidate_text(address, length)
+        elif v0 == 9:
+            size = (to_signed(self.General_Purpose[4]) + 3) // 4 * 4      # Keeps the heap word aligned
+            end = self.end_of_heap + size
+            if end < self.heap_base or end > self.General_Purpose[29]:     # Must stay between the data and $sp
+                self.message("sbrk of", to_signed(self.General_Purpose[4]), "bytes exceeds the heap")
+                self.exit_status = 1
+            else:
+                self.General_Purpose[2] = self.end_of_heap     # Address of the allocated block
+                self.end_of_heap = end
+        elif v0 == 10:
+            self.exit_status = 0  # terminate the program
+        elif v0 == 11:
+            self.output(chr(self.General_Purpose[4]))  # print character stored in a0 register
+        elif v0 == 12:
+            character = self.read_input()  # character from .in file
+            self.General_Purpose[2] = ord(character)
+        elif v0 == 13:
+            f_name = self.read_string(self.General_Purpose[4])
+            fd = self.host().open_file(f_name[1:])
+            self.General_Purpose[4] = fd
+        elif v0 == 14:
+            fd = self.General_Purpose[4]
+            buffer = self.General_Purpose[5]
+            length = self.General_Purpose[6]
+            cont = self.host().read_file(fd, length)
+            self.memory[buffer:buffer + len(cont)] = cont
+            self.mark_dirty(buffer, len(cont))
+            self.invalidate_text(buffer, len(cont))
+            self.General_Purpose[4] = length
+        elif v0 == 15:
+            fd = self.General_Purpose[4]
+            buffer = self.General_Purpose[5]
+            length = self.General_Purpose[6]
+            self.host().write_file(fd, self.memory[buffer:buffer + length])
+            self.General_Purpose[4] = length
+        elif v0 == 16:
+            fd = self.General_Purpose[4]
+            self.host().close_file(fd)
+        elif v0 == 17:
+            self.exit_status = self.General_Purpose[4]  # terminate the program with the status in a0
+
+    def reserved_function(self, content):
+        self.message("Reserved instruction", hex(content['word']), "at", hex(self.PC - 4))
+        self.exit_status = 1  # terminate the program
+
+    # Decode and translate instructions ----------------------------------------------------------
+
+    def decode(self, word):
+        # Splits a machine code word into integer fields, and finds the function simulating it
+        content = {
+            'word': word,
+            'rs': (word >> 21) & 0x1F,
+            'rt': (word >> 16) & 0x1F,
+            'rd': (word >> 11) & 0x1F,
+            'shamt': (word >> 6) & 0x1F,
+            'imm': sign_extend(word & 0xFFFF, 16),      # Also the branch offset
+            'target': (word & 0x3FFFFFF) * 4,
+        }
+        opcode = word >> 26
+        if opcode == 0:
+            index = function_table[word & 0x3F]
+        elif opcode == 1:
+            index = regimm_table[content['rt']]
+        else:
+            index = opcode_table[opcode]
+        content['index'] = index
+        if index is None:
+            content['handler'] = Simulator.reserved_function
         else:
-            temp = os.open(f_name[1:], os.O_CREAT)
-            os.close(temp)
-        fd = os.open(f_name[1:], os.O_RDWR)
-        General_Purpose[4] = int_to_bin(fd, 32)
-    elif v0 == 14:
-        fd = int(General_Purpose[4], 2)
-        buffer = int(General_Purpose[5], 2)
-        length = int(General_Purpose[6], 2)
-        cont = os.read(fd, length)
-        for de in cont:
-            memory[buffer] = int_to_bin(de, 8)
-            buffer += 1
-        General_Purpose[4] = int_to_bin(length, 32)
-    elif v0 == 15:
-        fd = int(General_Purpose[4], 2)
-        buffer = int(General_Purpose[5], 2)
-        length = int(General_Purpose[6], 2)
-        char_count = 0
-        for i in range(buffer, buffer + length):
-            part = memory[i]
-            if part == "" or part == "00000000":
-                val = (bytes('\0', 'utf-8'))
-                os.write(fd, val)
-                char_count += 1
+            content['handler'] = functions[index]
+        return content
+
+    def translate_block(self, start):
+        # Compiles the instructions from start up to the next branch, jump or syscall into one Python function,
+        # with the registers it uses held in locals. The function is called with the number of instructions it may
+        # run, and returns the following PC and the number of instructions run. A block whose last instruction
+        # jumps back to its start keeps looping inside the function
+        # A store into the text segment ends the block after it, since it may overwrite the instructions following
+        # it: the following PC is returned and its instructions are decoded again
+        # With a cache model, the block also gives it the lines of instructions it fetches and its memory accesses,
+        # when they are not in the line used last in their set
+        caches = self.caches
+        contents = []
+        body = []
+        used = set()
+        accesses = 0
+        pc = start
+        ended = False
+        looping = False
+        while not ended and pc < self.end_of_text and len(contents) < MAX_BLOCK_LENGTH:
+            content = self.decoded.get(pc)
+            if content is None:
+                content = self.decode(WORD.unpack_from(self.memory, pc)[0])
+                self.decoded[pc] = content
+            if content['index'] is None:     # Leaves reserved instructions to the step by step simulation
+                break
+            name = instructions[content['index']]
+            ended = name in block_ends
+            template = block_templates[content['index']]
+            first = len(body)
+            if caches is not None:
+                body.append("@fetch " + str(pc))
+                if content['index'] in memory_instructions:
+                    write = memory_instructions[content['index']]
+                    accesses += 1
+                    used.add(content['rs'])
+                    body.append("a = (r" + str(content['rs']) + " + " + str(content['imm']) + ") & 0xFFFFFFFF")
+                    if write and not caches.dcache.write_back:
+                        body.append("data(a, True)")
+                    else:
+                        body.append("line = a >> " + str(caches.dcache.line_bits))
+                        body.append("if data_recent[line & " + str(caches.dcache.set_mask) + "] != line:")
+                        body.append("    data(a, " + str(write) + ")")
+                        if write:
+                            body.append("else:")
+                            body.append("    written[data_ways[line & " + str(caches.dcache.set_mask) + "]] = 1")
+            pc += 4
+            body.append("# " + hex(pc - 4) + " " + name)
+            if template is None:
+                # Registers go back to the register file around the call, since the function works on it
+                body.append("@writeback")
+                body.append("self.PC = " + str(pc))
+                if name == "syscall":
+                    # The syscall sees the number of instructions run before it, as when simulating one
+                    # instruction at a time
+                    body.append("self.current_loop_count += " + str(len(contents)))
+                body.append("c[" + str(len(contents)) + "]['handler'](self, c[" + str(len(contents)) + "])")
+                if name == "syscall":
+                    body.append("self.current_loop_count -= " + str(len(contents)))
+                body.append("@reload")
+                if name == "syscall":
+                    body.append("next_pc = " + str(pc))
+                elif name in ("swl", "swr"):
+                    used.add(content['rs'])
+                    body.append("if r" + str(content['rs']) + " < 0x500000:")
+                    body.append("    @exit")
             else:
-                val = bitstring_to_bytes(part)
-                os.write(fd, val)
-                char_count += 1
-        General_Purpose[4] = int_to_bin(char_count, 32)
-    elif v0 == 16:
-        fd = int(General_Purpose[4], 2)
-        os.close(fd)
-    elif v0 == 17:
-        out_file.close()
-        os._exit(0)  # terminate the program
+                fields = {'rs': 'r' + str(content['rs']), 'rt': 'r' + str(content['rt']),
+                          'rd': 'r' + str(content['rd']), 'ra': 'r31'}
+                for field in fields:
+                    if '{' + field + '}' in template:
+                        used.add(int(fields[field][1:]))
+                body.extend(template.format(
+                    pc=pc, shamt=content['shamt'], imm='(' + str(content['imm']) + ')',
+                    imm32=content['imm'] & MASK, uimm=content['imm'] & 0xFFFF,
+                    branch=pc + content['imm'] * 4, target=content['target'], **fields).split("\n"))
+                if name in ("beq", "bgez", "bgtz", "blez", "bltz", "bne"):
+                    looping = pc + content['imm'] * 4 == start
+                elif name == "j":
+                    looping = content['target'] == start
+            contents.append(content)
+            for position in range(first, len(body)):
+                if body[position].endswith("@exit"):
+                    # Instructions run and memory accesses counted when the block ends after this instruction
+                    body[position] += " " + str(pc) + " " + str(len(contents)) + " " + str(accesses)
+        if not contents:
+            return None, 0
+        if not ended:
+            body.append("next_pc = " + str(pc))
+        if accesses:
+            body.insert(0, "dcache.accesses += " + str(accesses))
+
+        length = len(contents)
+        load = ["r" + str(reg) + " = R[" + str(reg) + "]" for reg in sorted(used)]
+        store = ["R[" + str(reg) + "] = r" + str(reg) for reg in sorted(used)]
+        indent = "        " if looping else "    "
+        lines = ["def block(limit, self=self, R=self.General_Purpose, memory=self.memory, dirty=self.dirty_pages,",
+                 "          c=contents,",
+                 "          unpack_word=WORD.unpack_from, unpack_half=HALF.unpack_from,",
+                 "          unpack_half_signed=HALF_SIGNED.unpack_from, unpack_byte_signed=BYTE_SIGNED.unpack_from,",
+                 "          pack_word=WORD.pack_into, pack_half=HALF.pack_into):"]
+        if caches is not None:
+            lines[-1] = lines[-1][:-2] + ","
+            lines.append("          fetch=caches.fetch, fetch_recent=caches.icache.recent, dcache=caches.dcache,")
+            lines.append("          data=caches.data, data_recent=caches.dcache.recent, data_ways=caches.dcache.recent_ways,")
+            lines.append("          written=caches.dcache.dirty):")
+        lines.extend("    " + line for line in load)
+        if looping:
+            lines.append("    n = 0")
+            lines.append("    while True:")
+        fetched = None      # Line of instructions checked last
+        for line in body:
+            if line.startswith("@fetch "):
+                # The instructions of the block in the same line are fetched together
+                address = int(line[len("@fetch "):])
+                if address >> caches.icache.line_bits != fetched:
+                    fetched = address >> caches.icache.line_bits
+                    lines.append(indent + "if fetch_recent[" + str(fetched & caches.icache.set_mask) + "] != " +
+                                 str(fetched) + ":")
+                    lines.append(indent + "    fetch(" + str(address) + ")")
+            elif line.lstrip().startswith("@exit "):
+                inner = indent + line[:len(line) - len(line.lstrip())]
+                next_pc, count, done = line.split()[1:]
+                lines.extend(inner + line for line in store)
+                if accesses > int(done):
+                    lines.append(inner + "dcache.accesses -= " + str(accesses - int(done)))
+                lines.append(inner + "return " + next_pc + ", " + ("n + " if looping else "") + count)
+            elif line == "@writeback":
+                lines.extend(indent + line for line in store)
+            elif line == "@reload":
+                lines.extend(indent + line for line in load)
+            else:
+                lines.append(indent + line)
+        if looping:
+            lines.append("        n += " + str(length))
+            lines.append("        if next_pc != " + str(start) + " or n + " + str(length) + " > limit:")
+            lines.append("            break")
+        lines.extend("    " + line for line in store)
+        lines.append("    return next_pc, " + ("n" if looping else str(length)))
+        namespace = {'contents': contents, 'self': self, 'caches': caches}
+        source = "\n".join(lines)
+        code = compiled_blocks.get(source)
+        if code is None:
+            if len(compiled_blocks) >= MAX_COMPILED_BLOCKS:
+                compiled_blocks.clear()
+            code = compiled_blocks[source] = compile(source, "<block " + hex(start) + ">", "exec")
+        exec(code, globals(), namespace)
+        return namespace['block'], length
+
+
+# Function simulating each instruction, at the same index as the instructions list
+functions = [
+    Simulator.add_function, Simulator.addu_function, Simulator.and_function,
+    Simulator.div_function, Simulator.divu_function, Simulator.jalr_function, Simulator.jr_function,
+    Simulator.mfhi_function, Simulator.mflo_function, Simulator.mthi_function, Simulator.mtlo_function,
+    Simulator.mult_function, Simulator.multu_function, Simulator.nor_function, Simulator.or_function,
+    Simulator.sll_function, Simulator.sllv_function, Simulator.slt_function, Simulator.sltu_function,
+    Simulator.sra_function, Simulator.srav_function, Simulator.srl_function, Simulator.srlv_function,
+    Simulator.sub_function, Simulator.subu_function, Simulator.syscall_function,
+    Simulator.xor_function,
+
+    Simulator.addi_function, Simulator.addiu_function, Simulator.andi_function,
+    Simulator.beq_function, Simulator.bgez_function, Simulator.bgtz_function, Simulator.blez_function,
+    Simulator.bltz_function, Simulator.bne_function, Simulator.lb_function, Simulator.lbu_function,
+    Simulator.lh_function, Simulator.lhu_function, Simulator.lui_function, Simulator.lw_function,
+    Simulator.ori_function, Simulator.sb_function, Simulator.slti_function, Simulator.sltiu_function,
+    Simulator.sh_function, Simulator.sw_function, Simulator.xori_function,
+    Simulator.lwl_function, Simulator.lwr_function, Simulator.swl_function, Simulator.swr_function,
+
+    Simulator.j_function, Simulator.jal_function,
+]
 
 
 # Parse command, get inputs from .in file and get checkpoints -----------------------------------------------
 
-parser = argparse.ArgumentParser()
-parser.add_argument(dest='MIPS_filename', type=str)
-parser.add_argument(dest='filename', type=str)
-parser.add_argument(dest='Checkpoint_filename', type=str)
-parser.add_argument(dest='In_filename', type=str)
-parser.add_argument(dest='Out_filename', type=str)
-args = parser.parse_args()
-MIPS_file = open(args.MIPS_filename, 'r')
-binary_file = open(args.filename, 'r')
-checkpoint_file = open(args.Checkpoint_filename, 'r')
-in_file = open(args.In_filename, 'r')
-out_file = open(args.Out_filename, 'w')
-
-for lin in in_file:
-    lin = lin.replace("\n", "")
-    inputs.append(lin)
-
-checkpoints = []
-for line in checkpoint_file:
-    line = line.replace("\n", "").replace("\t", "").replace(" ", "")
-    checkpoints.append(int(line))
-checkpoints.sort()
-
-
-# Append static data segment ------------------------------------------------------------------
-
-loc = int(hex(0x500000), 16)  # location (hex(0x500000), 16) is start of static data
-text_segment = 0
-dump = []
-
-for line in MIPS_file:
-    line = line.split('#')[0]  # Removes comments
-    content = ""
-    if line == "":
-        continue
-    if '.text' in line:
-        text_segment = 1
-    if text_segment == 0:
-        if "asciiz" in line:
-            content = re.findall('"([^"]*)"', line)[0].replace("\\n", "\n").replace("\\t", "\t").replace("\\r", "\r")
-            content += "\0"
-            parts = len(content) // 4
-            remainder = len(content) % 4
-            if remainder != 0:
-                parts += 1
-                content += '\0' * (4 - remainder)
-            for part in range(parts):
-                memory[loc] = ascii_to_bin(content[4 * part])
-                memory[loc + 1] = ascii_to_bin(content[(4 * part) + 1])
-                memory[loc + 2] = ascii_to_bin(content[(4 * part) + 2])
-                memory[loc + 3] = ascii_to_bin(content[(4 * part) + 3])
-                loc += 4
-        elif "ascii" in line:
-            content = re.findall('"([^"]*)"', line)[0].replace("\\n", "\n").replace("\\t", "\t").replace("\\r", "\r")
-            parts = len(content) // 4
-            remainder = len(content) % 4
-            if remainder != 0:
-                parts += 1
-                content += '\0' * (4 - remainder)
-            for part in range(parts):
-                memory[loc] = ascii_to_bin(content[4 * part])
-                memory[loc + 1] = ascii_to_bin(content[(4 * part) + 1])
-                memory[loc + 2] = ascii_to_bin(content[(4 * part) + 2])
-                memory[loc + 3] = ascii_to_bin(content[(4 * part) + 3])
-                loc += 4
-        elif "word" in line:
-            temp = line.split()
-            con = []
-            for i in range(len(temp)):
-                if temp[i] == ".word":
-                    s = ''
-                    i += 1
-                    while i != len(temp):
-                        s += temp[i].replace(" ", "")
-                        i += 1
-                    con = s.split(',')
-            for w in range(len(con)):
-                append_count = 0
-                comp = int_to_bin(con[w], 8)
-                par = (len(comp) // 8) + 1
-                rem = len(comp) % 8
-                for i in range(par):
-                    if i == par - 1:
-                        if rem != 0:
-                            memory[loc] = add_bin_length(comp[:rem], 8)
-                            loc += 1
-                            append_count += 1
-                    else:
-                        memory[loc] = comp[(len(comp)-8*i-8):(len(comp)-8*i)]
-                        loc += 1
-                        append_count += 1
-                while append_count != 4:
-                    memory[loc] = ascii_to_bin('\0')
-                    loc += 1
-                    append_count += 1
-        elif "byte" in line:
-            temp = line.split()
-            con = []
-            for i in range(len(temp)):
-                if temp[i] == ".byte":
-                    s = ''
-                    i += 1
-                    while i != len(temp):
-                        s += temp[i].replace(" ", "")
-                        i += 1
-                    con = s.split(',')
-            for i in range(len(con)):
-                memory[loc] = int_to_bin(con[i], 8)
-                loc += 1
-            rem = len(con) % 4
-            if rem != 0:
-                ap = 4 - rem
-                for i in range(ap):
-                    memory[loc] = ascii_to_bin('\0')
-                    loc += 1
-        elif "half" in line:
-            temp = line.split()
-            con = []
-            for i in range(len(temp)):
-                if temp[i] == ".half":
-                    s = ''
-                    i += 1
-                    while i != len(temp):
-                        s += temp[i].replace(" ", "")
-                        i += 1
-                    con = s.split(',')
-            for i in range(len(con)):
-                b = int_to_bin(con[i], 8)
-                memory[loc] = b[len(b) - 8:len(b)]
-                if len(b) > 8:
-                    memory[loc + 1] = add_bin_length(int_to_bin(con[i], 8)[:len(b) - 8], 8)
-                else:
-                    memory[loc + 1] = ascii_to_bin('\0')
-                loc += 2
-            rem = len(con) % 4
-            if rem == 1:
-                memory[loc] = ascii_to_bin('\0')
-                memory[loc + 1] = ascii_to_bin('\0')
-                loc += 2
-
-
-# Append text data segment ------------------------------------------------------------------
-
-location = int(hex(0x400000), 16)  # Equivalent location to int(hex(0x400000), 16), start of text segment
-for line in binary_file:
-    line = line.replace("\n", "").replace("\t", "").replace(" ", "")
-    if line == "":
-        continue
-    elif len(line) != 32:
-        print('Line is not binary of length 32')
-        break
-    else:
-        for i in range(4):
-            memory[location + i] = line[(8 * i):(8 * (i + 1))]
-    location += 4
-
-
-# Simulate instructions and create checkpoints files -------------------------------------------------------
-
-current_loop_count = 0
-while True:
-    if current_loop_count in checkpoints:
-        f = open('memory_' + str(current_loop_count) + '.bin', 'wb')
-        start = int(hex(0x400000), 16)
-        stop = len(memory)
-        for i in range(start, stop, 4):
-            if i < int(hex(0x500000), 16):
-                temp = [memory[i + 3], memory[i + 2], memory[i + 1], memory[i]]
-            else:
-                temp = [memory[i], memory[i + 1], memory[i + 2], memory[i + 3]]
-            for part in temp:
-                if part == "" or part == "00000000":
-                    f.write(bytes('\0', 'utf-8'))
-                else:
-                    value = bitstring_to_bytes(part)
-                    f.write(value)
-        f.close()
-
-        reg_checkpt = open('register_' + str(current_loop_count) + '.bin', 'wb')
-        for reg in General_Purpose:
-            for j in range(4):
-                i = 3 - j
-                v = reg[8 * i: 8 * (i + 1)]
-                if v == "" or v == "00000000":
-                    reg_checkpt.write(bytes('\0', 'utf-8'))
-                else:
-                    value = bitstring_to_bytes(v)
-                    reg_checkpt.write(value)
-        temp_num = PC
-        temp_PC = int_to_bin(temp_num, 32)
-        for j in range(4):
-            i = 3 - j
-            v = temp_PC[8 * i: 8 * (i + 1)]
-            if v == "" or v == "00000000":
-                reg_checkpt.write(bytes('\0', 'utf-8'))
-            else:
-                value = bitstring_to_bytes(v)
-                reg_checkpt.write(value)
-        for j in range(4):
-            i = 3 - j
-            v = Hi[8 * i: 8 * (i + 1)]
-            if v == "" or v == "00000000":
-                reg_checkpt.write(bytes('\0', 'utf-8'))
-            else:
-                value = bitstring_to_bytes(v)
-                reg_checkpt.write(value)
-        for j in range(4):
-            i = 3 - j
-            v = Lo[8 * i: 8 * (i + 1)]
-            if v == "" or v == "00000000":
-                reg_checkpt.write(bytes('\0', 'utf-8'))
-            else:
-                value = bitstring_to_bytes(v)
-                reg_checkpt.write(value)
-        reg_checkpt.close()
-
-    if memory[PC] == "":
-        break
-    memory_line = memory[PC] + memory[PC + 1] + memory[PC + 2] + memory[PC + 3]
-    content = {}
-    opcode = memory_line[0:6]
-    opcode_hex = hex(int(opcode, 2))[2:]  # convert the opcode to hex
-    if opcode_hex == '0':  # if opcode is 0, instructions is R-type
-        function = memory_line[26:33]
-        function_hex = hex(int(function, 2))[2:]
-        for i in range(0, 27):  # use function (6 last bit) to determine the instruction
-            function_opcode = translations[i].split(" ")[-1]
-            if function_opcode == function_hex:
-                content['instruction'] = instructions[i]  # the corresponding R-type instruction
-                trans_list = translations[i].split(" ")
-                for ind in range(len(trans_list)):
-                    if trans_list[ind] == "rs" or trans_list[ind] == "rt" or \
-                            trans_list[ind] == "rd" or trans_list[ind] == "shamt":
-                        content[trans_list[ind]] = memory_line[(ind * 5) + 1:(ind * 5) + 6]
-    else:
-        for i in range(27, len(translations)):  # use opcode to find the instruction (I or J-type)
-            trans_opcode = translations[i].split(" ")[0]
-            if trans_opcode == opcode_hex:
-                content['instruction'] = instructions[i]  # the corresponding I or J-type instruction
-                trans_list = translations[i].split(" ")
-                if (i >= 27) and (i <= 52):
-                    for ind in range(len(trans_list)):
-                        if trans_list[ind] == "rs" or trans_list[ind] == "rt":
-                            content[trans_list[ind]] = memory_line[(ind * 5) + 1:(ind * 5) + 6]
-                        elif trans_list[ind] == "labl" or trans_list[ind] == "imm":
-                            content[trans_list[ind]] = memory_line[16:32]
-                elif (i >= 53) and (i <= 54):
-                    for ind in range(len(trans_list)):
-                        if trans_list[ind] == "targ":
-                            content[trans_list[ind]] = memory_line[6:32]
-    PC += 4
-
-    if content['instruction'] == 'add':
-        add_function(content)
-    elif content['instruction'] == 'addu':
-        addu_function(content)
-    elif content['instruction'] == 'and':
-        and_function(content)
-    elif content['instruction'] == 'div':
-        div_function(content)
-    elif content['instruction'] == 'divu':
-        divu_function(content)
-    elif content['instruction'] == 'jalr':
-        jalr_function(content)
-    elif content['instruction'] == 'jr':
-        jr_function(content)
-    elif content['instruction'] == 'mfhi':
-        mfhi_function(content)
-    elif content['instruction'] == 'mflo':
-        mflo_function(content)
-    elif content['instruction'] == 'mthi':
-        mthi_function(content)
-    elif content['instruction'] == 'mtlo':
-        mtlo_function(content)
-    elif content['instruction'] == 'mult':
-        mult_function(content)
-    elif content['instruction'] == 'multu':
-        multu_function(content)
-    elif content['instruction'] == 'nor':
-        nor_function(content)
-    elif content['instruction'] == 'or':
-        or_function(content)
-    elif content['instruction'] == 'sll':
-        sll_function(content)
-    elif content['instruction'] == 'sllv':
-        sllv_function(content)
-    elif content['instruction'] == 'slt':
-        slt_function(content)
-    elif content['instruction'] == 'sltu':
-        sltu_function(content)
-    elif content['instruction'] == 'sra':
-        sra_function(content)
-    elif content['instruction'] == 'srav':
-        srav_function(content)
-    elif content['instruction'] == 'srl':
-        srl_function(content)
-    elif content['instruction'] == 'srlv':
-        srlv_function(content)
-    elif content['instruction'] == 'sub':
-        sub_function(content)
-    elif content['instruction'] == 'subu':
-        subu_function(content)
-    elif content['instruction'] == 'syscall':
-        syscall_function()
-    elif content['instruction'] == 'xor':
-        xor_function(content)
-
-    elif content['instruction'] == 'addi':
-        addi_function(content)
-    elif content['instruction'] == 'addiu':
-        addiu_function(content)
-    elif content['instruction'] == 'andi':
-        andi_function(content)
-    elif content['instruction'] == 'beq':
-        beq_function(content)
-    elif content['instruction'] == 'bgez':
-        bgez_function(content)
-    elif content['instruction'] == 'bgtz':
-        bgtz_function(content)
-    elif content['instruction'] == 'blez':
-        blez_function(content)
-    elif content['instruction'] == 'bltz':
-        bltz_function(content)
-    elif content['instruction'] == 'bne':
-        bne_function(content)
-    elif content['instruction'] == 'lb':
-        lb_function(content)
-    elif content['instruction'] == 'lbu':
-        lbu_function(content)
-    elif content['instruction'] == 'lh':
-        lh_function(content)
-    elif content['instruction'] == 'lhu':
-        lhu_function(content)
-    elif content['instruction'] == 'lui':
-        lui_function(content)
-    elif content['instruction'] == 'lw':
-        lw_function(content)
-    elif content['instruction'] == 'ori':
-        ori_function(content)
-    elif content['instruction'] == 'sb':
-        sb_function(content)
-    elif content['instruction'] == 'slti':
-        slti_function(content)
-    elif content['instruction'] == 'sltiu':
-        sltiu_function(content)
-    elif content['instruction'] == 'sh':
-        sh_function(content)
-    elif content['instruction'] == 'sw':
-        sw_function(content)
-    elif content['instruction'] == 'xori':
-        xori_function(content)
-    elif content['instruction'] == 'lwl':
-        lwl_function(content)
-    elif content['instruction'] == 'lwr':
-        lwr_function(content)
-    elif content['instruction'] == 'swl':
-        swl_function(content)
-    elif content['instruction'] == 'swr':
-        swr_function(content)
-
-    elif content['instruction'] == 'j':
-        j_function(content)
-    elif content['instruction'] == 'jal':
-        jal_function(content)
-
-    current_loop_count += 1
+def read_inputs(In_filename):
+    # Returns the lines of the .in file, read as the program reads them, "-" reads from standard input
+    # The file is opened here, so that a missing file is reported before the run starts
+    if In_filename == '-':
+        return stream_lines(sys.stdin)
+    return stream_lines(open(In_filename, 'r'))
+
+def stream_lines(in_file):
+    with in_file:
+        for lin in in_file:
+            yield lin.replace("\n", "")
+
+def process_exit_status(status):
+    # Exit status of the host process for the exit status of the guest program
+    # The host keeps only the low 8 bits, so a status outside 0-255 (syscall 17 with 256, or with a negative $a0
+    # held as an unsigned register) ends the process with 1 instead of a value that may read as success
+    return status if 0 <= status <= 255 else 1
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(dest='MIPS_filename', type=str)
+    parser.add_argument(dest='filename', type=str)
+    parser.add_argument(dest='Checkpoint_filename', type=str)
+    parser.add_argument(dest='In_filename', type=str)
+    parser.add_argument(dest='Out_filename', type=str)
+    parser.add_argument('--interpret', action='store_true',
+                        help='simulate one instruction at a time instead of translating basic blocks')
+    parser.add_argument('--delta', action='store_true',
+                        help='write delta_N.bin checkpoints holding only the pages written since the last checkpoint')
+    parser.add_argument('--quiet', action='store_true', help='do not echo the output of the program to the console')
+    parser.add_argument('--resume-from', type=int, default=None, metavar='N',
+                        help='continue from the checkpoint written after N instructions')
+    parser.add_argument('--record-syscalls', default=None, metavar='LOG_FILENAME',
+                        help='log the input lines and host file operations of the syscalls')
+    parser.add_argument('--replay-syscalls', default=None, metavar='LOG_FILENAME',
+                        help='take the input lines and host file operations from a syscall log (In_filename is '
+                             'not read)')
+    args = parser.parse_args()
+    with open(args.MIPS_filename, 'r') as MIPS_file:
+        asm_text = MIPS_file.read()
+    with open(args.filename, 'rb') as binary_file:
+        machine_code = binary_file.read()
+
+    inputs = read_inputs(args.In_filename) if args.replay_syscalls is None else ()
+
+    checkpoints = []
+    with open(args.Checkpoint_filename, 'r') as checkpoint_file:
+        for line in checkpoint_file:
+            line = line.replace("\n", "").replace("\t", "").replace(" ", "")
+            checkpoints.append(int(line))
+
+    simulator = Simulator(inputs, None, checkpoints, echo=not args.quiet, translate=not args.interpret,
+                          delta_checkpoints=args.delta)
+    simulator.load_program(asm_text, machine_code)
+    syscall_log = None
+    if args.replay_syscalls is not None:
+        syscall_log = SyscallReplayer(simulator, args.replay_syscalls)
+    elif args.record_syscalls is not None:
+        syscall_log = SyscallRecorder(simulator, args.record_syscalls)
+    previous_output = ""
+    if args.resume_from is not None:
+        try:
+            simulator.load_checkpoint(args.resume_from)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        if simulator.output_position:
+            # The output up to the checkpoint is kept, so it must all be in the out file
+            if not os.path.isfile(args.Out_filename):
+                parser.error(args.Out_filename + " is missing, the checkpoint was written after " +
+                             str(simulator.output_position) + " characters of output")
+            with open(args.Out_filename, 'r') as out_file:
+                previous_output = out_file.read(simulator.output_position)
+            if len(previous_output) < simulator.output_position:
+                parser.error(args.Out_filename + " holds " + str(len(previous_output)) + " characters of output, "
+                             "the checkpoint was written after " + str(simulator.output_position))
+    out_file = open(args.Out_filename, 'w')
+    out_file.write(previous_output)
+    simulator.out_file = out_file
+    try:
+        status = simulator.run()
+    finally:
+        if syscall_log is not None:
+            syscall_log.close()
+    out_file.close()
+    sys.exit(process_exit_status(status))
+
+
+if __name__ == '__main__':
+    main()
 
 # End of Assignment 2 (118010502 Agnes Valencia)
\ No newline at end of file
@@ -0,0 +1,269 @@
+import io
+import sys
+import struct
+import signal
+import argparse
+
+from MIPS_Simulator import (Simulator, read_inputs, process_exit_status, instructions, opcode_table, function_table,
+                            regimm_table, sign_extend, WORD, HALF, MASK)
+from MIPS_Assembler import instructions_formats, register_names
+
+# Records a trace of the instructions run by a guest program: for each step its PC, its instruction word, the value
+# of the register it wrote, and the address and value of the memory it read or wrote
+# Records are packed into a buffer allocated once, and written to the trace file in bulk each time the buffer is
+# full. In ring mode the buffer is never written while running: it keeps the last steps only, and is dumped when
+# the run ends, also when the simulator raises an error
+# Layout of a trace file (little-endian):
+#   header: magic, version, flags, record size, number of the first step recorded, number of records
+#   records: PC, word, value of the register written, memory address, memory value, number of the register written
+# The register written follows from the word: rd, rt, $ra for jal, Lo for mult and div... For a syscall it follows
+# from the service in $v0 when it runs: $v0 for the services returning a value there, $a0 for the file services
+# A record of an instruction without memory access has address 0, and one writing no register has register 0
+
+TRACE_MAGIC = b'MTRC'
+TRACE_VERSION = 2
+TRACE_HEADER = struct.Struct('<4sHHIQQ')
+TRACE_RECORD = struct.Struct('<IIIIIB')
+TRACE_RING = 1          # Flag set when the trace holds the last steps of the run only
+BUFFER_RECORDS = 1 << 16
+
+# Registers beyond the 32 general purpose ones, numbered as in register_N.bin
+HI = 33
+LO = 34
+SYSCALL_RESULT = 35     # Not a register: the one written is chosen from $v0 when the syscall runs
+
+destination_fields = {
+    "jalr": 'rd', "mfhi": 'rd', "mflo": 'rd',
+    "addi": 'rt', "addiu": 'rt', "andi": 'rt', "lui": 'rt', "ori": 'rt', "slti": 'rt', "sltiu": 'rt', "xori": 'rt',
+    "lb": 'rt', "lbu": 'rt', "lh": 'rt', "lhu": 'rt', "lw": 'rt', "lwl": 'rt', "lwr": 'rt',
+}
+destination_registers = {"jal": 31, "syscall": SYSCALL_RESULT, "mult": LO, "multu": LO, "div": LO, "divu": LO,
+                         "mthi": HI, "mtlo": LO}
+no_destination = {"jr", "j", "beq", "bgez", "bgtz", "blez", "bltz", "bne", "sb", "sh", "sw", "swl", "swr"}
+# Register written by each syscall service returning a value: read integer, sbrk and read character in $v0, open,
+# read and write of a file in $a0
+syscall_destinations = {5: 2, 9: 2, 12: 2, 13: 4, 14: 4, 15: 4}
+
+# Bytes read or written by each memory instruction. lwl, lwr, swl and swr record the aligned word they touch
+memory_sizes = {"lb": 1, "lbu": 1, "sb": 1, "lh": 2, "lhu": 2, "sh": 2, "lw": 4, "sw": 4}
+unaligned_memory = {"lwl", "lwr", "swl", "swr"}
+
+
+def instruction_index(word):
+    opcode = word >> 26
+    if opcode == 0:
+        return function_table[word & 0x3F]
+    if opcode == 1:
+        return regimm_table[(word >> 16) & 0x1F]
+    return opcode_table[opcode]
+
+def access(word):
+    # Returns (register written or None, or SYSCALL_RESULT, bytes of memory accessed or 0, True for lwl/lwr/swl/swr)
+    index = instruction_index(word)
+    if index is None:
+        return None, 0, False
+    name = instructions[index]
+    if name in destination_fields:
+        destination = (word >> (11 if destination_fields[name] == 'rd' else 16)) & 0x1F
+    elif name in destination_registers:
+        destination = destination_registers[name]
+    elif name in no_destination:
+        destination = None
+    else:
+        destination = (word >> 11) & 0x1F      # R-type arithmetic, logic and shifts
+    if name in unaligned_memory:
+        return destination, 4, True
+    return destination, memory_sizes.get(name, 0), False
+
+def register_name(number):
+    if number == HI:
+        return "$hi"
+    if number == LO:
+        return "$lo"
+    return register_names[number]
+
+def disassemble(word, pc):
+    # Assembly text of the instruction word at pc, in the formats of the assembler
+    index = instruction_index(word)
+    if index is None:
+        return ".word " + hex(word)
+    rs = register_names[(word >> 21) & 0x1F]
+    imm = sign_extend(word & 0xFFFF, 16)
+    name = instructions[index]
+    fields = {'rs': rs, 'rt': register_names[(word >> 16) & 0x1F], 'rd': register_names[(word >> 11) & 0x1F],
+              'shamt': str((word >> 6) & 0x1F),
+              'imm': str(word & 0xFFFF if name in ("andi", "ori", "xori", "lui") else imm),
+              'label': hex((pc + 4 + imm * 4) & MASK), 'target': hex((word & 0x3FFFFFF) * 4),
+              'address': str(imm) + "(" + rs + ")"}
+    operands = instructions_formats[index].split()[1:]
+    return name + (" " + ", ".join(fields[operand] for operand in operands) if operands else "")
+
+class TraceRecorder:
+    # Attached to a simulator, which runs each instruction through step() while tracing
+    # With ring set, keeps the last ring steps and writes them when closed, otherwise writes every step
+
+    def __init__(self, simulator, filename, ring=None):
+        self.simulator = simulator
+        self.filename = filename
+        self.ring = ring
+        capacity = ring if ring else BUFFER_RECORDS
+        self.buffer = bytearray(capacity * TRACE_RECORD.size)
+        self.offset = 0
+        self.wrapped = False
+        self.first_step = simulator.current_loop_count
+        self.recorded = 0
+        self.accesses = {}      # Instruction word -> access(word)
+        self.trace_file = None
+        if not ring:
+            self.trace_file = open(filename, 'wb')
+            self.trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, TRACE_RECORD.size,
+                                                    self.first_step, 0))
+        simulator.tracer = self
+
+    def step(self, pc, content):
+        # Runs the instruction of content, fetched at pc, and records it
+        simulator = self.simulator
+        word = content['word']
+        info = self.accesses.get(word)
+        if info is None:
+            info = self.accesses[word] = access(word)
+        destination, size, unaligned = info
+        address = 0
+        if size:
+            address = (simulator.General_Purpose[content['rs']] + content['imm']) & MASK
+        elif destination == SYSCALL_RESULT:
+            destination = syscall_destinations.get(simulator.General_Purpose[2])
+        content['handler'](simulator, content)
+
+        value = 0
+        if destination is not None:
+            if destination < 32:
+                value = simulator.General_Purpose[destination]
+            else:
+                value = simulator.Hi if destination == HI else simulator.Lo
+        memory_value = 0
+        if size == 1:
+            memory_value = simulator.memory[address]
+        elif size == 2:
+            memory_value = HALF.unpack_from(simulator.memory, address)[0]
+        elif size == 4:
+            memory_value = WORD.unpack_from(simulator.memory, address & ~3 if unaligned else address)[0]
+        TRACE_RECORD.pack_into(self.buffer, self.offset, pc, word, value, address, memory_value, destination or 0)
+        self.offset += TRACE_RECORD.size
+        self.recorded += 1
+        if self.offset == len(self.buffer):
+            if self.ring:
+                self.wrapped = True
+            else:
+                self.trace_file.write(self.buffer)
+            self.offset = 0
+
+    def close(self):
+        # Writes the records still in the buffer, and the final header
+        if self.ring:
+            kept = min(self.recorded, self.ring)
+            with open(self.filename, 'wb') as trace_file:
+                trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RING, TRACE_RECORD.size,
+                                                   self.first_step + self.recorded - kept, kept))
+                if self.wrapped:
+                    trace_file.write(memoryview(self.buffer)[self.offset:])
+                trace_file.write(memoryview(self.buffer)[:self.offset])
+        elif self.trace_file is not None:
+            self.trace_file.write(memoryview(self.buffer)[:self.offset])
+            self.trace_file.seek(0)
+            self.trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, TRACE_RECORD.size,
+                                                    self.first_step, self.recorded))
+            self.trace_file.close()
+            self.trace_file = None
+        self.offset = 0
+        self.wrapped = False
+        if self.simulator.tracer is self:
+            self.simulator.tracer = None
+
+    def run(self, max_steps=None):
+        # Runs the simulator while tracing, and writes the trace when the run ends or fails
+        try:
+            return self.simulator.run(max_steps)
+        finally:
+            self.close()
+
+
+def read_trace(filename):
+    # Returns the header fields and a list of
+    # (step, PC, word, register value, memory address, memory value, register number)
+    with open(filename, 'rb') as trace_file:
+        data = trace_file.read()
+    magic, version, flags, record_size, first_step, count = TRACE_HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC:
+        raise ValueError(filename + " is not a trace file")
+    if version != TRACE_VERSION or record_size != TRACE_RECORD.size:
+        raise ValueError("Unsupported trace version " + str(version))
+    records = data[TRACE_HEADER.size:TRACE_HEADER.size + count * record_size]
+    header = {'flags': flags, 'first_step': first_step, 'count': count}
+    return header, [(first_step + n,) + record for n, record in enumerate(TRACE_RECORD.iter_unpack(records))]
+
+def render(record):
+    # One line of text for a record
+    step, pc, word, value, address, memory_value, destination = record
+    size, unaligned = access(word)[1:]
+    line = str(step).rjust(10) + "  " + hex(pc) + "  " + format(word, '08x') + "  " + disassemble(word, pc).ljust(32)
+    effects = []
+    if destination != 0:
+        effects.append(register_name(destination) + " = " + hex(value))
+    if size:
+        effects.append("[" + hex(address & ~3 if unaligned else address) + "] = " + hex(memory_value))
+    if not effects:
+        return line.rstrip()
+    return line + "  # " + ", ".join(effects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record the instructions run by a MIPS program, or decode a trace')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help='simulate a program and write its trace')
+    record.add_argument(dest='MIPS_filename', type=str)
+    record.add_argument(dest='filename', type=str)
+    record.add_argument(dest='In_filename', type=str)
+    record.add_argument(dest='Out_filename', type=str)
+    record.add_argument(dest='Trace_filename', type=str)
+    record.add_argument('--ring', type=int, default=None, metavar='STEPS',
+                        help='only keep the last STEPS steps, written when the run ends or fails')
+    record.add_argument('--max-steps', type=int, default=None, help='instruction budget of the run')
+    decode = commands.add_parser('decode', help='write a trace as text')
+    decode.add_argument(dest='Trace_filename', type=str)
+    decode.add_argument(dest='Text_filename', type=str, nargs='?', default=None,
+                        help='text file receiving the trace (default: standard output)')
+    decode.add_argument('--last', type=int, default=None, help='only decode the last steps of the trace')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        with open(args.MIPS_filename, 'r') as MIPS_file:
+            asm_text = MIPS_file.read()
+        with open(args.filename, 'rb') as binary_file:
+            machine_code = binary_file.read()
+        simulator = Simulator(read_inputs(args.In_filename), io.StringIO(), echo=False)
+        simulator.load_program(asm_text, machine_code)
+        recorder = TraceRecorder(simulator, args.Trace_filename, args.ring)
+        try:
+            status = recorder.run(args.max_steps)
+        finally:
+            with open(args.Out_filename, 'w') as out_file:
+                out_file.write(simulator.out_file.getvalue())
+        print(recorder.recorded, "steps run,", min(recorder.recorded, args.ring or recorder.recorded), "recorded")
+        sys.exit(process_exit_status(status or 0))
+
+    header, records = read_trace(args.Trace_filename)
+    if args.last is not None:
+        records = records[-args.last:]
+    if args.Text_filename is None and hasattr(signal, 'SIGPIPE'):
+        # Ends quietly when the reader of the output stops early, as head does
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    out_file = open(args.Text_filename, 'w') if args.Text_filename is not None else sys.stdout
+    for record in records:
+        out_file.write(render(record) + "\n")
+    if out_file is not sys.stdout:
+        out_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# Tight loop of integer arithmetic, logic and shifts, with one branch per iteration
+.data
+result: .asciiz "checksum: "
+.text
+main:
+    addi $v0, $zero, 5
+    syscall                     # Number of iterations
+    addu $s0, $v0, $zero
+    addi $t0, $zero, 0
+    addi $t1, $zero, 1
+    addi $t2, $zero, 7
+loop:
+    addu $t1, $t1, $t2
+    xor $t2, $t2, $t1
+    sll $t3, $t1, 3
+    srl $t4, $t2, 5
+    or $t1, $t3, $t4
+    subu $t2, $t2, $t0
+    slt $t5, $t1, $t2
+    addu $t1, $t1, $t5
+    andi $t6, $t2, 255
+    nor $t2, $t2, $t6
+    addi $t0, $t0, 1
+    bne $t0, $s0, loop
+    lui $a0, 80                 # result
+    addi $v0, $zero, 4
+    syscall
+    xor $a0, $t1, $t2
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 10
+    addi $v0, $zero, 11
+    syscall
+    addi $v0, $zero, 10
+    syscall
@@ -0,0 +1,58 @@
+# Streams over an array of words on the heap: fills it, then adds each word into the next for several passes,
+# then sums its bytes and halfwords
+.data
+result: .asciiz "sum: "
+.text
+main:
+    addi $v0, $zero, 5
+    syscall                     # Number of words
+    addu $s0, $v0, $zero
+    addi $v0, $zero, 5
+    syscall                     # Number of passes
+    addu $s1, $v0, $zero
+    sll $a0, $s0, 2
+    addi $v0, $zero, 9
+    syscall
+    addu $s2, $v0, $zero        # Array
+    sll $s3, $s0, 2
+    addu $s3, $s2, $s3          # End of the array
+    addu $t0, $s2, $zero
+    addi $t1, $zero, 3
+fill:
+    sw $t1, 0($t0)
+    addi $t1, $t1, 5
+    addi $t0, $t0, 4
+    bne $t0, $s3, fill
+pass:
+    addu $t0, $s2, $zero
+    addi $t2, $zero, 0
+stream:
+    lw $t3, 0($t0)
+    addu $t2, $t2, $t3
+    sw $t2, 0($t0)
+    addi $t0, $t0, 4
+    bne $t0, $s3, stream
+    addi $s1, $s1, -1
+    bgtz $s1, pass
+    addu $t0, $s2, $zero
+    addi $t4, $zero, 0
+bytes:
+    lbu $t5, 1($t0)
+    addu $t4, $t4, $t5
+    lh $t5, 2($t0)
+    addu $t4, $t4, $t5
+    sh $t4, 0($t0)
+    sb $t5, 3($t0)
+    addi $t0, $t0, 4
+    bne $t0, $s3, bytes
+    lui $a0, 80                 # result
+    addi $v0, $zero, 4
+    syscall
+    addu $a0, $t4, $zero
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 10
+    addi $v0, $zero, 11
+    syscall
+    addi $v0, $zero, 10
+    syscall
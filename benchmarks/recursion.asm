@@ -0,0 +1,43 @@
+# Recursive Fibonacci, with a stack frame pushed and popped around every jal/jr
+.data
+result: .asciiz "fib: "
+.text
+main:
+    addi $v0, $zero, 5
+    syscall
+    addu $a0, $v0, $zero
+    jal fib
+    addu $s0, $v0, $zero
+    lui $a0, 80                 # result
+    addi $v0, $zero, 4
+    syscall
+    addu $a0, $s0, $zero
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 10
+    addi $v0, $zero, 11
+    syscall
+    addi $v0, $zero, 10
+    syscall
+fib:
+    slti $t0, $a0, 2
+    beq $t0, $zero, recurse
+    addu $v0, $a0, $zero
+    jr $ra
+recurse:
+    addi $sp, $sp, -12
+    sw $ra, 8($sp)
+    sw $s0, 4($sp)
+    sw $s1, 0($sp)
+    addu $s0, $a0, $zero
+    addi $a0, $s0, -1
+    jal fib
+    addu $s1, $v0, $zero
+    addi $a0, $s0, -2
+    jal fib
+    addu $v0, $s1, $v0
+    lw $s1, 0($sp)
+    lw $s0, 4($sp)
+    lw $ra, 8($sp)
+    addi $sp, $sp, 12
+    jr $ra
@@ -0,0 +1,47 @@
+# Allocates a linked list with one sbrk per node, then walks it several times summing the values
+.data
+result: .asciiz "total: "
+.text
+main:
+    addi $v0, $zero, 5
+    syscall                     # Number of nodes
+    addu $s0, $v0, $zero
+    addi $v0, $zero, 5
+    syscall                     # Number of walks
+    addu $s1, $v0, $zero
+    addi $s2, $zero, 0          # Head of the list
+    addi $t0, $zero, 0
+allocate:
+    addi $a0, $zero, 10         # Value, next and a halfword, rounded up to 12 bytes
+    addi $v0, $zero, 9
+    syscall
+    sw $t0, 0($v0)
+    sw $s2, 4($v0)
+    sh $t0, 8($v0)
+    addu $s2, $v0, $zero
+    addi $t0, $t0, 1
+    bne $t0, $s0, allocate
+    addi $s3, $zero, 0
+walk:
+    addu $t1, $s2, $zero
+node:
+    lw $t2, 0($t1)
+    addu $s3, $s3, $t2
+    lhu $t2, 8($t1)
+    sll $t2, $t2, 3
+    xor $s3, $s3, $t2
+    lw $t1, 4($t1)
+    bne $t1, $zero, node
+    addi $s1, $s1, -1
+    bgtz $s1, walk
+    lui $a0, 80                 # result
+    addi $v0, $zero, 4
+    syscall
+    addu $a0, $s3, $zero
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 10
+    addi $v0, $zero, 11
+    syscall
+    addi $v0, $zero, 10
+    syscall
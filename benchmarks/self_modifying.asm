@@ -0,0 +1,34 @@
+# Patches an instruction further down its own loop at every pass, alternating between two replacements, so each
+# pass runs the instruction stored by the pass before. The replacements are the words after the last syscall
+.data
+result: .asciiz "sum: "
+.text
+main:
+    addi $v0, $zero, 5
+    syscall                     # Number of passes
+    addu $s0, $v0, $zero
+    lui $t0, 64                 # Start of the text segment
+    lw $t4, 100($t0)            # addi $t1, $t1, 3 below
+    lw $t5, 104($t0)            # addi $t1, $t1, 5 below
+    addi $t1, $zero, 0
+loop:
+    sw $t4, 36($t0)             # Overwrites the second instruction after it
+    addi $s0, $s0, -1
+    addi $t1, $t1, 1
+    or $t6, $t4, $zero
+    or $t4, $t5, $zero
+    or $t5, $t6, $zero
+    bne $s0, $zero, loop
+    lui $a0, 80                 # result
+    addi $v0, $zero, 4
+    syscall
+    addu $a0, $t1, $zero
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 10
+    addi $v0, $zero, 11
+    syscall
+    addi $v0, $zero, 10
+    syscall
+    addi $t1, $t1, 3
+    addi $t1, $t1, 5
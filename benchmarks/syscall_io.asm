@@ -0,0 +1,33 @@
+# Reads integers and prints each of them with its running sum, one syscall for every value and separator
+.data
+label: .asciiz "value "
+.text
+main:
+    addi $v0, $zero, 5
+    syscall                     # Number of integers
+    addu $s0, $v0, $zero
+    addi $s1, $zero, 0
+next:
+    addi $v0, $zero, 5
+    syscall
+    addu $s2, $v0, $zero
+    addu $s1, $s1, $s2
+    lui $a0, 80                 # label
+    addi $v0, $zero, 4
+    syscall
+    addu $a0, $s2, $zero
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 32
+    addi $v0, $zero, 11
+    syscall
+    addu $a0, $s1, $zero
+    addi $v0, $zero, 1
+    syscall
+    addi $a0, $zero, 10
+    addi $v0, $zero, 11
+    syscall
+    addi $s0, $s0, -1
+    bgtz $s0, next
+    addi $v0, $zero, 10
+    syscall
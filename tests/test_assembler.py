@@ -0,0 +1,38 @@
+import pytest
+
+from MIPS_Assembler import assemble
+
+PROGRAM = """.text
+main:
+\tadd $t0, $t1, $t2
+\taddi $t0, $t1, -1
+\tlw $t0, 8($sp)
+\tsll $t0, $t1, 3
+\tlui $t0, 0x50
+\tori $t0, $t0, 0xFFFF
+loop:\tbeq $t0, $zero, loop   # Branch to itself
+\tj loop
+\tjal loop
+\tjr $ra
+\tsyscall
+"""
+
+
+def test_encodings():
+    program = assemble(PROGRAM)
+    assert program.machine_code == [0x012A4020, 0x2128FFFF, 0x8FA80008, 0x000940C0, 0x3C080050, 0x3508FFFF,
+                                    0x1100FFFF, 0x08100006, 0x0C100006, 0x03E00008, 0x0000000C]
+    assert program.labels == {'main': 0x400000, 'loop': 0x400018}
+    assert program.to_text().splitlines()[0] == "00000001001010100100000000100000"
+
+
+@pytest.mark.parametrize("line, message", [
+    ("add $t0, $t1, $x9", "Unknown register $x9"),
+    ("j nowhere", "Undefined label nowhere"),
+    ("addi $t0, $t1", "addi needs operands"),
+])
+def test_errors_quote_the_line(line, message):
+    with pytest.raises(ValueError) as error:
+        assemble(".text\n\t" + line + "\n")
+    assert message in str(error.value)
+    assert str(error.value).endswith("in line: " + line)
@@ -0,0 +1,42 @@
+import os
+import sys
+import subprocess
+
+from MIPS_Assembler import assemble
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOURCE = """.data
+message: .asciiz "hi"
+.text
+main:
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def test_cached_program_is_the_same(tmp_path):
+    program = assemble(SOURCE, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    cached = assemble(SOURCE, str(tmp_path))
+    assert cached.to_object() == program.to_object() == assemble(SOURCE).to_object()
+    assert cached.labels == program.labels and cached.data_labels == program.data_labels
+
+
+def test_cache_is_keyed_by_source(tmp_path):
+    assemble(SOURCE, str(tmp_path))
+    other = assemble(SOURCE.replace("10", "17"), str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 2
+    assert other.machine_code[0] & 0xFFFF == 17
+
+
+def test_cache_with_another_mode_is_rejected(tmp_path):
+    source = tmp_path / "program.asm"
+    source.write_text(SOURCE)
+    for option in (["--incremental", str(tmp_path / "state")], ["--link", str(source)], ["-j", "2"]):
+        assembler = subprocess.run([sys.executable, os.path.join(REPOSITORY, "MIPS_Assembler.py"), str(source),
+                                    str(tmp_path / "out.txt"), "--cache", str(tmp_path / "cache")] + option,
+                                   capture_output=True, text=True)
+        assert assembler.returncode == 2
+        assert "--cache cannot be combined" in assembler.stderr
+    assert not (tmp_path / "out.txt").exists()
@@ -0,0 +1,55 @@
+from MIPS_Assembler import assemble
+from MIPS_Batch import run_batch, run_job, read_manifest
+
+# Reads an integer and exits with it as its status, through syscall 17
+EXIT_WITH_INPUT = """.text
+\taddi $v0, $zero, 5
+\tsyscall
+\taddu $a0, $v0, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 17
+\tsyscall
+"""
+
+FOREVER = """.text
+loop:
+\tj loop
+"""
+
+
+def write_program(directory, name, source):
+    (directory / (name + ".asm")).write_text(source)
+    (directory / (name + ".mobj")).write_bytes(assemble(source).to_object())
+    return [str(directory / (name + ".asm")), str(directory / (name + ".mobj"))]
+
+
+def test_batch_results_in_job_order(tmp_path):
+    program = write_program(tmp_path, "exit", EXIT_WITH_INPUT)
+    forever = write_program(tmp_path, "forever", FOREVER)
+    jobs = []
+    for n, status in enumerate(["3", "0", "300"]):
+        (tmp_path / (str(n) + ".in")).write_text(status + "\n")
+        jobs.append(program + [str(tmp_path / (str(n) + ".in")), str(tmp_path / (str(n) + ".out"))])
+    (tmp_path / "empty.in").write_text("")
+    jobs.append(forever + [str(tmp_path / "empty.in"), "-"])
+    jobs.append(program + [str(tmp_path / "missing.in"), "-"])
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# program binary in out\n" + "\n".join(" ".join(job) for job in jobs) + "\n")
+    assert read_manifest(str(manifest)) == jobs
+
+    results = run_batch(jobs, workers=2, max_steps=1000)
+    assert [result['result'] for result in results] == ['exited', 'exited', 'exited', 'budget', 'error']
+    assert [result['exit_status'] for result in results] == [3, 0, 1, None, None]
+    assert [result['output'] for result in results[:3]] == ["3", "0", "300"]
+    assert (tmp_path / "2.out").read_text() == "300"
+    assert results[3]['instructions'] == 1000
+    assert "missing.in" in results[4]['error']
+
+
+def test_jobs_in_one_worker_do_not_share_state(tmp_path):
+    program = write_program(tmp_path, "exit", EXIT_WITH_INPUT)
+    for n in range(3):
+        (tmp_path / "in.txt").write_text(str(n) + "\n")
+        result = run_job(program + [str(tmp_path / "in.txt"), "-"])
+        assert (result['output'], result['exit_status'], result['instructions']) == (str(n), n, 7)
@@ -0,0 +1,53 @@
+import os
+import json
+
+import pytest
+
+from MIPS_Benchmark import (compare, host_differences, measure_simulator, assembler_source, find_benchmarks,
+                            BENCHMARK_DIRECTORY, BASELINE_FILENAME)
+
+
+def results(speed=1000000, instructions=5000, lines=100, processor="cpu"):
+    return {'python': '3', 'implementation': 'CPython', 'platform': 'Linux', 'machine': 'x86_64',
+            'processor': processor, 'cpu_count': 4,
+            'simulator': {'loop': {'translated': {'instructions': instructions, 'instructions_per_second': speed,
+                                                  'peak_rss_kb': 1000}}},
+            'assembler': {'lines': lines, 'lines_per_second': 50000, 'peak_rss_kb': 2000}}
+
+
+def test_slower_run_is_a_regression():
+    report, regressions = compare(results(speed=800000), results(), 0.1)
+    assert regressions == ['loop/translated/instructions_per_second']
+    assert compare(results(speed=950000), results(), 0.1)[1] == []
+
+
+def test_speeds_of_another_host_are_not_compared():
+    baseline = results(processor="other cpu")
+    assert host_differences(results(speed=500000), baseline) == ['processor']
+    report, regressions = compare(results(speed=500000), baseline, 0.1, same_host=False)
+    assert regressions == []
+    assert any("-50.0%" in line for line in report)
+    assert compare(results(instructions=5001), baseline, 0.1, same_host=False)[1] == \
+        ['loop/translated/instructions']
+
+
+def test_assembler_figures_need_the_same_source_size():
+    report, regressions = compare(results(lines=200), results(), 0.1)
+    assert regressions == ['assembler/lines']
+    assert not any(line.startswith('assembler/lines_per_second') for line in report)
+
+
+def test_generated_source_is_the_same_at_every_run():
+    assert assembler_source(500) == assembler_source(500)
+    assert len(assembler_source(500).splitlines()) > 500
+
+
+@pytest.mark.parametrize('name', find_benchmarks(BENCHMARK_DIRECTORY))
+def test_benchmarks_run_as_in_the_baseline(name):
+    with open(BASELINE_FILENAME, 'r') as baseline_file:
+        baseline = json.load(baseline_file)
+    result = measure_simulator(BENCHMARK_DIRECTORY, name, 'translated')
+    with open(os.path.join(BENCHMARK_DIRECTORY, name + '.out'), 'r') as out_file:
+        assert result['output'] == out_file.read()
+    assert result['exit_status'] == 0
+    assert result['instructions'] == baseline['simulator'][name]['translated']['instructions']
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Cache import Cache, CacheHierarchy, Memory, parse_cache, DEFAULT_L2
+
+# Loads each word of 4KB from 0x510000 twice, in two passes of 1024 loads
+TWO_PASSES = """.text
+main:
+\taddi $s1, $zero, 2
+pass:
+\tlui $t0, 81
+\taddi $s0, $zero, 1024
+loop:
+\tlw $t1, 0($t0)
+\tsw $t1, 0($t0)
+\taddi $t0, $t0, 4
+\taddi $s0, $s0, -1
+\tbne $s0, $zero, loop
+\taddi $s1, $s1, -1
+\tbne $s1, $zero, pass
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def test_parse_cache():
+    assert parse_cache("16K:4:32:fifo:through:2") == {'size': 16384, 'associativity': 4, 'line_size': 32,
+                                                       'policy': 'fifo', 'write_policy': 'through', 'latency': 2}
+    with pytest.raises(ValueError):
+        parse_cache("16K:4")
+    with pytest.raises(ValueError, match="number of sets"):
+        Cache("L1D", next_level=Memory(), **parse_cache("96:1:32"))
+
+
+@pytest.mark.parametrize('policy, misses', [('lru', 4), ('fifo', 5)])
+def test_replacement_policy(policy, misses):
+    # Lines 0, 1, then 0 again, then 2 evicts 1 under lru and 0 under fifo, in a set of 2 ways
+    cache = Cache("L1D", 64, 2, 32, Memory(), policy=policy)
+    for line in (0, 1, 0, 2, 0, 1):
+        cache.access(line * 32)
+    assert cache.misses == misses
+
+
+def test_write_policies():
+    memory = Memory()
+    back = Cache("L1D", 64, 1, 32, memory, write_policy='back')
+    back.access(0, True)
+    back.access(64, False)      # Evicts the dirty line
+    assert back.writebacks == 1 and memory.writes == 1
+    memory = Memory()
+    through = Cache("L1D", 64, 1, 32, memory, write_policy='through')
+    through.access(0, True)
+    through.access(0, True)
+    assert through.misses == 2 and memory.writes == 2 and memory.reads == 0
+
+
+def simulated(translate, l2=None, l1d="1K:2:32:lru:back:1"):
+    simulator = Simulator([], io.StringIO(), echo=False, translate=translate)
+    simulator.load_program(TWO_PASSES, assemble(TWO_PASSES).to_object())
+    caches = CacheHierarchy(simulator, l1d=l1d, l2=l2)
+    assert simulator.run() == 0
+    return caches.statistics()
+
+
+def test_translated_and_interpreted_runs_give_the_same_statistics():
+    assert simulated(True, DEFAULT_L2) == simulated(False, DEFAULT_L2)
+
+
+def test_streaming_misses():
+    statistics = simulated(True)
+    # 4KB do not fit a 1KB cache: every line of 32 bytes misses in both passes
+    assert statistics['L1D']['accesses'] == 2 * 2 * 1024
+    assert statistics['L1D']['misses'] == 2 * 4096 // 32
+    assert statistics['L1I']['misses'] == 2     # The 56 bytes of code span 2 lines
+    bigger = simulated(True, l1d="8K:2:32:lru:back:1")
+    assert bigger['L1D']['misses'] == 4096 // 32
+    assert bigger['cycles'] < statistics['cycles']
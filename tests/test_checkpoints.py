@@ -0,0 +1,71 @@
+import io
+import os
+
+import pytest
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+
+# Sums 1 to 50 in a loop of 4 instructions, calling a function of 3 instructions at each pass, then prints the sum
+LOOP = """.text
+main:
+\taddi $s0, $zero, 50
+\taddi $s1, $zero, 0
+loop:
+\tjal add
+\taddi $s0, $s0, -1
+\tbne $s0, $zero, loop
+\taddu $a0, $s1, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+add:
+\taddu $s1, $s1, $s0
+\taddi $t0, $t0, 1
+\tjr $ra
+"""
+
+
+def simulated(directory, checkpoints, translate=True):
+    os.makedirs(directory, exist_ok=True)
+    simulator = Simulator([], io.StringIO(), checkpoints, echo=False, translate=translate,
+                          checkpoint_directory=str(directory))
+    simulator.load_program(LOOP, assemble(LOOP).to_object())
+    starts = []
+    translate_block = simulator.translate_block
+
+    def recording(start):
+        starts.append(start)
+        return translate_block(start)
+    simulator.translate_block = recording
+    assert simulator.run() == 0
+    assert simulator.out_file.getvalue() == "1275"
+    return simulator, starts
+
+
+def test_checkpoints_inside_blocks_translate_no_other_block(tmp_path):
+    simulator, plain_starts = simulated(tmp_path / "plain", [])
+    checkpoints = range(3, simulator.current_loop_count, 7)
+    simulator, starts = simulated(tmp_path / "translated", checkpoints)
+    assert set(starts) == set(plain_starts)
+    interpreted, unused = simulated(tmp_path / "interpreted", checkpoints, translate=False)
+    for count in checkpoints:
+        for name in ("memory", "register", "state"):
+            filename = name + "_" + str(count) + ".bin"
+            assert (tmp_path / "translated" / filename).read_bytes() == \
+                (tmp_path / "interpreted" / filename).read_bytes()
+
+
+@pytest.mark.parametrize('steps', [1, 5, 9])
+def test_runs_stopped_inside_blocks_translate_no_other_block(tmp_path, steps):
+    simulator, plain_starts = simulated(tmp_path, [])
+    stepped = Simulator([], io.StringIO(), echo=False)
+    stepped.load_program(LOOP, assemble(LOOP).to_object())
+    starts = []
+    translate_block = stepped.translate_block
+    stepped.translate_block = lambda start: starts.append(start) or translate_block(start)
+    while stepped.run(steps) is None:
+        pass
+    assert stepped.out_file.getvalue() == "1275"
+    assert set(starts) == set(plain_starts)
@@ -0,0 +1,42 @@
+import io
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Data import assemble_data, DATA_BASE
+
+
+def test_directive_layout():
+    image, labels = assemble_data('.data\n'
+                                  'a: .asciiz "abc"\n'
+                                  'b: .ascii "xy"\n'
+                                  'c: .word 1, -1\n'
+                                  'd: .byte 1, 2, 3, 4, 5\n'
+                                  'e: .half 7\n'
+                                  'f: .asciiz "line\\n"\n'
+                                  '.text\n'
+                                  'g: .word 9\n')
+    assert labels == {'a': DATA_BASE, 'b': DATA_BASE + 4, 'c': DATA_BASE + 8, 'd': DATA_BASE + 16,
+                      'e': DATA_BASE + 24, 'f': DATA_BASE + 28}
+    assert image == (b'abc\0' + b'xy\0\0' + b'\x01\0\0\0\xff\xff\xff\xff' + b'\x01\x02\x03\x04\x05\0\0\0' +
+                     b'\x07\0\0\0' + b'line\n\0\0\0')
+
+
+def test_data_base_moves_labels():
+    image, labels = assemble_data('.data\nx: .word 5\ny: .word 6\n', DATA_BASE + 12)
+    assert labels == {'x': DATA_BASE + 12, 'y': DATA_BASE + 16}
+    assert image == b'\x05\0\0\0\x06\0\0\0'
+
+
+def test_object_data_matches_text_output():
+    # The simulator builds the same memory from the object's data as from the source with text machine code
+    source = ('.data\nvalues: .word 3, 4\nname: .asciiz "ok"\n.text\nmain:\n'
+              '\tlui $t0, 80\n\tlw $t1, 4($t0)\n\taddi $v0, $zero, 10\n\tsyscall\n')
+    program = assemble(source)
+    simulators = []
+    for machine_code in (program.to_object(), program.to_text()):
+        simulator = Simulator([], io.StringIO(), echo=False)
+        simulator.load_program(source, machine_code)
+        simulator.run(100)
+        simulators.append(simulator)
+    assert simulators[0].get_register(9) == simulators[1].get_register(9) == 4
+    assert simulators[0].memory == simulators[1].memory
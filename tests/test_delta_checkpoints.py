@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+import subprocess
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Checkpoint import read_delta, rebuild, rebuild_all, delta_filename, find_checkpoints
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stores a word every 1KB from 0x510000, 64 times, so a page is written every 4 passes of 4 instructions
+STORES = """.text
+main:
+\tlui $t0, 81
+\taddi $s0, $zero, 64
+loop:
+\tsw $s0, 0($t0)
+\taddi $t0, $t0, 1024
+\taddi $s0, $s0, -1
+\tbne $s0, $zero, loop
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+CHECKPOINTS = [50, 100, 150, 200, 250]
+
+
+def run(directory, delta, checkpoints=CHECKPOINTS, resume_from=None):
+    os.makedirs(directory, exist_ok=True)
+    simulator = Simulator([], io.StringIO(), checkpoints, echo=False, delta_checkpoints=delta,
+                          checkpoint_directory=str(directory))
+    simulator.load_program(STORES, assemble(STORES).to_object())
+    if resume_from is not None:
+        simulator.load_checkpoint(resume_from)
+    assert simulator.run() == 0
+
+
+def full_checkpoint(directory, count):
+    with open(os.path.join(directory, 'memory_' + str(count) + '.bin'), 'rb') as f:
+        image = f.read()
+    with open(os.path.join(directory, 'register_' + str(count) + '.bin'), 'rb') as f:
+        return image, f.read()
+
+
+def test_deltas_rebuild_the_full_checkpoints(tmp_path):
+    run(tmp_path / "full", False)
+    run(tmp_path / "delta", True)
+    assert find_checkpoints(str(tmp_path / "delta")) == CHECKPOINTS
+    for count, image, registers in rebuild_all(CHECKPOINTS, str(tmp_path / "delta")):
+        assert (bytes(image), registers) == full_checkpoint(tmp_path / "full", count)
+    image, registers = rebuild(150, str(tmp_path / "delta"))
+    assert (bytes(image), registers) == full_checkpoint(tmp_path / "full", 150)
+
+
+def test_deltas_hold_the_pages_written_since_the_previous_one(tmp_path):
+    run(tmp_path, True)
+    previous = -1
+    for count in CHECKPOINTS:
+        delta_count, delta_previous, registers, pages = read_delta(delta_filename(str(tmp_path), count))
+        assert (delta_count, delta_previous) == (count, previous)
+        if previous != -1:
+            assert 1 <= len(pages) <= 4     # 12 or 13 passes, writing a page every 4
+        previous = count
+
+
+def test_deltas_after_a_resume_chain_onto_the_full_checkpoint(tmp_path):
+    run(tmp_path / "full", False)
+    run(tmp_path / "resumed", False, [100])
+    run(tmp_path / "resumed", True, resume_from=100)
+    assert not os.path.isfile(delta_filename(str(tmp_path / "resumed"), 100))
+    assert read_delta(delta_filename(str(tmp_path / "resumed"), 150))[1] == 100
+    for count in (150, 250):
+        image, registers = rebuild(count, str(tmp_path / "resumed"))
+        assert (bytes(image), registers) == full_checkpoint(tmp_path / "full", count)
+
+
+def test_command_line_writes_the_full_files(tmp_path):
+    run(tmp_path / "full", False)
+    run(tmp_path / "delta", True)
+    subprocess.run([sys.executable, os.path.join(REPOSITORY, "MIPS_Checkpoint.py"), "--all", "--dir",
+                    str(tmp_path / "delta"), "--out", str(tmp_path / "rebuilt")], check=True)
+    for count in CHECKPOINTS:
+        assert full_checkpoint(tmp_path / "rebuilt", count) == full_checkpoint(tmp_path / "full", count)
@@ -0,0 +1,64 @@
+import io
+
+from MIPS_Simulator import Simulator, GLOBAL_POINTER, PAGE_SIZE
+from MIPS_Assembler import assemble
+
+# Stores 7 at the top of the $gp window, then allocates 8 bytes with sbrk twice, printing the two addresses and
+# the word at the top of the window
+SBRK = """.data
+value: .word 1
+.text
+\taddi $t0, $zero, 7
+\tsw $t0, 32764($gp)
+\taddi $v0, $zero, 9
+\taddi $a0, $zero, 8
+\tsyscall
+\taddu $s0, $v0, $zero
+\taddi $v0, $zero, 9
+\taddi $a0, $zero, 5
+\tsyscall
+\taddu $s1, $v0, $zero
+\taddi $t1, $zero, -1
+\tsw $t1, 0($s0)
+\tsw $t1, 0($s1)
+\taddu $a0, $s0, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $a0, $zero, 32
+\taddi $v0, $zero, 11
+\tsyscall
+\taddu $a0, $s1, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $a0, $zero, 32
+\taddi $v0, $zero, 11
+\tsyscall
+\tlw $a0, 32764($gp)
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def loaded(source):
+    simulator = Simulator([], io.StringIO(), echo=False)
+    simulator.load_program(source, assemble(source).to_object())
+    return simulator
+
+
+def test_heap_starts_past_the_gp_window():
+    simulator = loaded(SBRK)
+    assert simulator.heap_base == GLOBAL_POINTER + 0x8000
+    assert simulator.run() == 0
+    first, second, value = map(int, simulator.out_file.getvalue().split())
+    assert first == GLOBAL_POINTER + 0x8000
+    assert second == first + 8
+    assert value == 7
+
+
+def test_heap_starts_on_the_page_after_large_data():
+    source = ".data\nbig: .word " + ", ".join(["1"] * 18000) + "\n.text\n\taddi $v0, $zero, 10\n\tsyscall\n"
+    simulator = loaded(source)
+    assert simulator.heap_base % PAGE_SIZE == 0
+    assert simulator.heap_base - PAGE_SIZE < 0x500000 + 4 * 18000 <= simulator.heap_base
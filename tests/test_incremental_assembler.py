@@ -0,0 +1,72 @@
+from MIPS_Assembler import assemble, IncrementalAssembler
+from MIPS_Benchmark import assembler_source
+
+
+def edited(source, *positions):
+    # source with the first addu at or after each line position turned into a subu
+    lines = source.splitlines()
+    for position in positions:
+        while not lines[position].startswith('\taddu'):
+            position += 1
+        lines[position] = lines[position].replace('addu', 'subu')
+    return "\n".join(lines) + "\n"
+
+
+def test_first_update_matches_assemble():
+    source = assembler_source(2000)
+    program = IncrementalAssembler().update(source)
+    assert program.to_object() == assemble(source).to_object()
+
+
+def test_distant_edits_reencode_only_their_lines():
+    source = assembler_source(40000)
+    assembler = IncrementalAssembler()
+    assembler.update(source)
+    new_source = edited(source, 2000, 38000)
+    program = assembler.update(new_source)
+    assert assembler.reencoded == 2
+    assert assembler.patched == 0
+    assert program.to_object() == assemble(new_source).to_object()
+
+
+def test_inserted_lines_move_labels():
+    source = assembler_source(3000)
+    assembler = IncrementalAssembler()
+    assembler.update(source)
+    lines = source.splitlines()
+    lines.insert(100, "\taddu $t0, $t0, $t0")
+    lines.insert(2900, "extra:\n\taddu $t1, $t1, $t1")
+    new_source = "\n".join(lines) + "\n"
+    program = assembler.update(new_source)
+    assert assembler.reencoded == 2
+    assert program.to_object() == assemble(new_source).to_object()
+
+
+def test_error_leaves_the_state_unchanged():
+    source = assembler_source(500)
+    assembler = IncrementalAssembler()
+    before = assembler.update(source)
+    lines = source.splitlines()
+    lines.insert(50, "\tbeq $t0, $t1, nowhere")
+    try:
+        assembler.update("\n".join(lines) + "\n")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("undefined label accepted")
+    assert assembler.update(source).to_object() == before.to_object()
+    assert assembler.reencoded == 0
+
+
+def test_state_of_another_version_is_dropped(tmp_path):
+    source = assembler_source(200)
+    assembler = IncrementalAssembler()
+    assembler.update(source)
+    state = tmp_path / "state"
+    assembler.save(state)
+    restored = IncrementalAssembler()
+    assert restored.load(state)
+    assert restored.machine_code == assembler.machine_code
+    restored.STATE_VERSION = IncrementalAssembler.STATE_VERSION + 1
+    assert not restored.load(state)
+    assert restored.machine_code == []
@@ -0,0 +1,50 @@
+import io
+import os
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Profile import Profiler
+from MIPS_Trace import read_trace
+from MIPS_Interval import simulate_intervals
+from MIPS_Benchmark import BENCHMARK_DIRECTORY
+
+
+def benchmark(name):
+    with open(os.path.join(BENCHMARK_DIRECTORY, name + '.asm'), 'r') as MIPS_file:
+        asm_text = MIPS_file.read()
+    with open(os.path.join(BENCHMARK_DIRECTORY, name + '.in'), 'r') as in_file:
+        inputs = in_file.read().splitlines()
+    with open(os.path.join(BENCHMARK_DIRECTORY, name + '.out'), 'r') as out_file:
+        output = out_file.read()
+    return asm_text, assemble(asm_text).to_object(), inputs, output
+
+
+def test_intervals_match_one_run(tmp_path):
+    asm_text, machine_code, inputs, output = benchmark('syscall_io')
+    simulator = Simulator(list(inputs), io.StringIO(), echo=False)
+    simulator.load_program(asm_text, machine_code)
+    profiler = Profiler(simulator)
+    assert profiler.run() == 0
+
+    results = simulate_intervals(asm_text, machine_code, iter(inputs), 25000, str(tmp_path / "intervals"),
+                                 workers=2, profile=True, trace_filename=str(tmp_path / "trace.bin"))
+    assert results['verified']
+    assert results['exit_status'] == 0
+    assert results['output'] == output
+    assert results['instructions'] == simulator.current_loop_count
+    assert len(results['intervals']) == -(-simulator.current_loop_count // 25000)
+    assert sum(results['counters'].values()) == simulator.current_loop_count
+    assert results['profile']['pcs'] == {hex(pc): count for pc, count in profiler.pc_counts().items()}
+    header, records = read_trace(str(tmp_path / "trace.bin"))
+    assert results['trace']['records'] == header['count'] == simulator.current_loop_count
+    assert [record[0] for record in records[:3]] == [0, 1, 2]
+
+
+def test_budget_ends_the_intervals(tmp_path):
+    asm_text, machine_code, inputs, output = benchmark('syscall_io')
+    results = simulate_intervals(asm_text, machine_code, iter(inputs), 4000, str(tmp_path), workers=2,
+                                 max_steps=10000)
+    assert results['verified']
+    assert results['exit_status'] is None
+    assert results['instructions'] == 10000
+    assert [result['end'] - result['start'] for result in results['intervals']] == [4000, 4000, 2000]
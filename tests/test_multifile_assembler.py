@@ -0,0 +1,41 @@
+import pytest
+
+from MIPS_Assembler import assemble, assemble_files
+from MIPS_Benchmark import assembler_source
+
+MAIN = """.data
+count: .word 3
+.text
+main:
+\tjal helper
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+HELPER = """.data
+main: .asciiz "data label named like a text label"
+.text
+helper:
+\tbeq $t0, $zero, main
+\tjr $ra
+"""
+
+
+def test_data_and_text_labels_may_share_a_name():
+    program = assemble_files([MAIN, HELPER])
+    assert program.labels == {'main': 0x400000, 'helper': 0x40000c}
+    assert program.data_labels == {'count': 0x500000, 'main': 0x500004}
+    assert program.machine_code[3] >> 26 == 4 and program.machine_code[3] & 0xFFFF == 0xFFFC     # beq back to main
+
+
+@pytest.mark.parametrize('second', [".text\nmain:\n\tjr $ra\n", ".data\ncount: .word 1\n.text\n\tjr $ra\n"])
+def test_a_label_defined_twice_is_rejected(second):
+    with pytest.raises(ValueError, match="more than one file"):
+        assemble_files([MAIN, second])
+
+
+def test_workers_give_the_same_program():
+    source = assembler_source(3000)
+    single = assemble_files([source], workers=1, chunk_size=500)
+    parallel = assemble_files([source], workers=2, chunk_size=500)
+    assert parallel.to_object() == single.to_object() == assemble(source).to_object()
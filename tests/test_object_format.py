@@ -0,0 +1,62 @@
+import io
+import struct
+
+import pytest
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Object import pack_object, read_object, is_object, OBJECT_HAS_DATA, OBJECT_HEADER
+
+# Prints the string and the word of its data
+PRINT = """.data
+greeting: .asciiz "hello "
+number: .word 42
+.text
+main:
+\tlui $a0, 80
+\taddi $v0, $zero, 4
+\tsyscall
+\tlw $a0, 8($a0)
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def test_object_round_trip():
+    data = pack_object([1, 2, 0xFFFFFFFF], b'abcd', [('main', 0x400000), ('main', 0x500000), ('é', 0x400008)])
+    assert is_object(data)
+    program = read_object(data)
+    assert program['flags'] & OBJECT_HAS_DATA
+    assert bytes(program['text']) == struct.pack('<3I', 1, 2, 0xFFFFFFFF)
+    assert bytes(program['data']) == b'abcd'
+    assert program['symbols'] == [('main', 0x400000), ('main', 0x500000), ('é', 0x400008)]
+    assert not read_object(pack_object([1]))['flags'] & OBJECT_HAS_DATA
+
+
+def test_other_files_are_rejected():
+    assert not is_object(b'0' * 32 + b'\n')
+    with pytest.raises(ValueError, match="Not a MIPS object"):
+        read_object(b'XXXX' + bytes(OBJECT_HEADER.size))
+    newer = bytearray(pack_object([1]))
+    newer[4] = 99
+    with pytest.raises(ValueError, match="Unsupported MIPS object version 99"):
+        read_object(newer)
+
+
+@pytest.mark.parametrize('form', ['object', 'text'])
+def test_text_and_object_run_the_same(form):
+    program = assemble(PRINT)
+    machine_code = program.to_object() if form == 'object' else program.to_text()
+    simulator = Simulator([], io.StringIO(), echo=False)
+    simulator.load_program(PRINT, machine_code)
+    assert simulator.run() == 0
+    assert simulator.out_file.getvalue() == "hello 42"
+
+
+def test_object_with_data_needs_no_source():
+    simulator = Simulator([], io.StringIO(), echo=False)
+    simulator.load_program("", assemble(PRINT).to_object())
+    assert simulator.run() == 0
+    assert simulator.out_file.getvalue() == "hello 42"
@@ -0,0 +1,57 @@
+import io
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+
+# Prints the characters 'a' to 'e', reads a line, prints the integer read and exits
+PRINT_THEN_READ = """.text
+\taddi $t0, $zero, 97
+\taddi $t1, $zero, 102
+loop:
+\taddu $a0, $t0, $zero
+\taddi $v0, $zero, 11
+\tsyscall
+\taddi $t0, $t0, 1
+\tbne $t0, $t1, loop
+\taddi $v0, $zero, 5
+\tsyscall
+\taddu $a0, $v0, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+class RecordingFile(io.StringIO):
+    # Keeps the text of each write
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+def loaded(inputs, out_file):
+    simulator = Simulator(inputs, out_file, echo=False)
+    simulator.load_program(PRINT_THEN_READ, assemble(PRINT_THEN_READ).to_object())
+    return simulator
+
+
+def test_output_is_written_in_bulk_before_reading():
+    out_file = RecordingFile()
+    simulator = loaded(["42"], out_file)
+    simulator.run(28)       # The 5 characters are printed, the line not read yet
+    assert out_file.writes == ["abcde"]
+    assert simulator.output_position == 5
+    assert simulator.run() == 0
+    assert out_file.writes == ["abcde", "42"]
+
+
+def test_output_of_a_stopped_run_is_flushed():
+    out_file = RecordingFile()
+    simulator = loaded(["42"], out_file)
+    simulator.run(10)
+    assert out_file.getvalue() == "ab"
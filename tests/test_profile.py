@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+from MIPS_Simulator import Simulator, instructions
+from MIPS_Assembler import assemble
+from MIPS_Profile import Profiler
+
+# Runs an addu 5 times, overwrites it with the subu after the last syscall, and runs that 5 times
+SELF_MODIFYING = """.text
+main:
+\tlui $t0, 64
+\tlw $t4, 44($t0)
+\taddi $s0, $zero, 10
+loop:
+\taddu $t2, $t2, $t3
+\taddi $s0, $s0, -1
+\taddi $t1, $zero, 5
+\tbne $s0, $t1, skip
+\tsw $t4, 12($t0)
+skip:
+\tbne $s0, $zero, loop
+\taddi $v0, $zero, 10
+\tsyscall
+\tsubu $t2, $t2, $t3
+"""
+
+CALLS = """.text
+main:
+\taddi $s0, $zero, 3
+loop:
+\tjal function
+\taddi $s0, $s0, -1
+\tbne $s0, $zero, loop
+\taddi $v0, $zero, 10
+\tsyscall
+function:
+\taddi $t0, $t0, 1
+\tjr $ra
+"""
+
+
+def profiled(source, translate, stacks=False):
+    program = assemble(source)
+    simulator = Simulator([], io.StringIO(), echo=False, translate=translate)
+    simulator.load_program(source, program.to_object())
+    profiler = Profiler(simulator, stacks)
+    assert profiler.run() == 0
+    return profiler, program
+
+
+@pytest.mark.parametrize('translate', [True, False])
+def test_opcodes_are_counted_as_run(translate):
+    profiler, program = profiled(SELF_MODIFYING, translate)
+    opcodes = profiler.opcode_counts()
+    assert opcodes[instructions.index("addu")] == 5
+    assert opcodes[instructions.index("subu")] == 5
+    assert profiler.pc_counts()[0x40000c] == 10
+    assert sum(opcodes) == profiler.simulator.current_loop_count
+
+
+@pytest.mark.parametrize('translate', [True, False])
+def test_calls_and_stacks(translate):
+    profiler, program = profiled(CALLS, translate, stacks=True)
+    function = program.labels['function']
+    assert profiler.call_counts() == {(0x400004, function): 3}
+    assert profiler.collapsed_stacks(program.labels) == ["main 12", "main;function 6"]
+    assert sum(profiler.block_counts().values()) == profiler.simulator.current_loop_count
@@ -0,0 +1,115 @@
+import io
+import os
+
+import pytest
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Replay import SyscallRecorder, SyscallReplayer, read_syscall_log, LOG_OPEN, LOG_READ, LOG_WRITE, LOG_CLOSE
+
+# Reads a number of bytes from the input, copies that many bytes of in.txt to out.txt through the buffer, and
+# prints the buffer. The simulator opens the name after its first character
+COPY = """.data
+inname: .asciiz "xin.txt"
+outname: .asciiz "xout.txt"
+buffer: .asciiz "123456789012345"
+.text
+\taddi $v0, $zero, 5
+\tsyscall
+\taddu $s2, $v0, $zero
+\taddi $v0, $zero, 13
+\tlui $a0, 80
+\tsyscall
+\taddu $s0, $a0, $zero
+\taddi $v0, $zero, 14
+\taddu $a0, $s0, $zero
+\tlui $a1, 80
+\tori $a1, $a1, 20
+\taddu $a2, $s2, $zero
+\tsyscall
+\taddi $v0, $zero, 13
+\tlui $a0, 80
+\tori $a0, $a0, 8
+\tsyscall
+\taddu $s1, $a0, $zero
+\taddi $v0, $zero, 15
+\taddu $a0, $s1, $zero
+\tlui $a1, 80
+\tori $a1, $a1, 20
+\taddu $a2, $s2, $zero
+\tsyscall
+\taddi $v0, $zero, 16
+\taddu $a0, $s0, $zero
+\tsyscall
+\taddi $v0, $zero, 16
+\taddu $a0, $s1, $zero
+\tsyscall
+\tlui $a0, 80
+\tori $a0, $a0, 20
+\taddi $v0, $zero, 4
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def loaded(source, inputs=(), checkpoints=(), directory='.'):
+    simulator = Simulator(list(inputs), io.StringIO(), checkpoints, echo=False,
+                          checkpoint_directory=str(directory))
+    simulator.load_program(source, assemble(source).to_object())
+    return simulator
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    # Runs COPY in a directory holding in.txt, with a checkpoint between the read and the write
+    directory = tmp_path / "recorded"
+    directory.mkdir()
+    (directory / "in.txt").write_bytes(b"hello world")
+    monkeypatch.chdir(directory)
+    simulator = loaded(COPY, ["5"], [20], directory)
+    recorder = SyscallRecorder(simulator, str(tmp_path / "log"))
+    try:
+        assert simulator.run() == 0
+    finally:
+        recorder.close()
+    assert simulator.out_file.getvalue() == "hello6789012345"
+    assert (directory / "out.txt").read_bytes() == b"hello"
+    replayed = tmp_path / "replayed"
+    replayed.mkdir()
+    monkeypatch.chdir(replayed)
+    return tmp_path
+
+
+def test_log_holds_the_input_and_file_operations(recorded):
+    inputs, events = read_syscall_log(str(recorded / "log"))
+    assert inputs == ["5"]
+    assert [event[1] for event in events] == [LOG_OPEN, LOG_READ, LOG_OPEN, LOG_WRITE, LOG_CLOSE, LOG_CLOSE]
+    assert events[1][3] == b"hello"
+
+
+def test_replay_needs_no_host_file(recorded):
+    simulator = loaded(COPY)
+    replayer = SyscallReplayer(simulator, str(recorded / "log"))
+    assert simulator.run() == 0
+    replayer.close()
+    assert simulator.out_file.getvalue() == "hello6789012345"
+    assert os.listdir(recorded / "replayed") == []
+
+
+def test_replay_resumed_from_a_checkpoint(recorded):
+    simulator = loaded(COPY, directory=recorded / "recorded")
+    SyscallReplayer(simulator, str(recorded / "log"))
+    simulator.load_checkpoint(20)
+    assert simulator.run() == 0
+    assert simulator.out_file.getvalue() == "hello6789012345"
+
+
+def test_replay_detects_another_path(recorded):
+    other = COPY.replace("\taddu $a2, $s2, $zero\n\tsyscall\n\taddi $v0, $zero, 16",
+                         "\taddi $a2, $zero, 4\n\tsyscall\n\taddi $v0, $zero, 16")
+    assert other != COPY
+    simulator = loaded(other)
+    SyscallReplayer(simulator, str(recorded / "log"))
+    with pytest.raises(ValueError, match="Replay left the syscall log at instruction 23 \\(write of file"):
+        simulator.run()
@@ -0,0 +1,89 @@
+import io
+import os
+import sys
+import subprocess
+
+import pytest
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Reads 5 integers and prints their sum. After 17 instructions, 3 of them are read
+SUM = """.text
+main:
+\taddi $s0, $zero, 5
+\taddi $s1, $zero, 0
+loop:
+\taddi $v0, $zero, 5
+\tsyscall
+\taddu $s1, $s1, $v0
+\taddi $s0, $s0, -1
+\tbne $s0, $zero, loop
+\taddu $a0, $s1, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+LINES = ["1", "20", "300", "4000", "50000"]
+
+
+def simulator(directory, inputs, checkpoints=(), delta=False):
+    simulator = Simulator(inputs, io.StringIO(), checkpoints, echo=False, delta_checkpoints=delta,
+                          checkpoint_directory=str(directory))
+    simulator.load_program(SUM, assemble(SUM).to_object())
+    return simulator
+
+
+@pytest.fixture(params=[False, True], ids=['full', 'delta'])
+def checkpointed(tmp_path, request):
+    assert simulator(tmp_path, list(LINES), [17], request.param).run() == 0
+    return tmp_path
+
+
+def test_resume_from_a_list(checkpointed):
+    resumed = simulator(checkpointed, list(LINES))
+    resumed.load_checkpoint(17)
+    assert resumed.current_input_index == 3
+    assert resumed.run() == 0
+    assert resumed.out_file.getvalue() == "54321"
+
+
+def test_resume_from_a_stream_skips_by_reading(checkpointed):
+    resumed = simulator(checkpointed, iter(LINES))
+    resumed.load_checkpoint(17)
+    assert resumed.run() == 0
+    assert resumed.out_file.getvalue() == "54321"
+
+
+def test_stream_read_past_the_checkpoint_is_rejected(checkpointed):
+    resumed = simulator(checkpointed, iter(LINES))
+    assert resumed.run(22) is None      # 4 lines read
+    with pytest.raises(ValueError, match="cannot go back"):
+        resumed.load_checkpoint(17)
+    assert resumed.current_loop_count == 22
+
+
+def test_short_stream_is_rejected(checkpointed):
+    resumed = simulator(checkpointed, iter(LINES[:2]))
+    with pytest.raises(ValueError, match="holds only 2"):
+        resumed.load_checkpoint(17)
+
+
+def test_resume_from_standard_input(tmp_path):
+    (tmp_path / "sum.asm").write_text(SUM)
+    (tmp_path / "sum.bin").write_bytes(assemble(SUM).to_object())
+    (tmp_path / "checkpoints.txt").write_text("17\n")
+    command = [sys.executable, os.path.join(REPOSITORY, "MIPS_Simulator.py"), "sum.asm", "sum.bin",
+               "checkpoints.txt", "-", "out.txt", "--quiet"]
+    assert subprocess.run(command, input="\n".join(LINES) + "\n", cwd=tmp_path, text=True).returncode == 0
+    resumed = subprocess.run(command + ["--resume-from", "17"], input="\n".join(LINES) + "\n", cwd=tmp_path,
+                             text=True, capture_output=True)
+    assert resumed.returncode == 0
+    assert (tmp_path / "out.txt").read_text() == "54321"
+    short = subprocess.run(command + ["--resume-from", "17"], input="1\n", cwd=tmp_path, text=True,
+                           capture_output=True)
+    assert short.returncode == 2
+    assert "holds only 1" in short.stderr and "Traceback" not in short.stderr
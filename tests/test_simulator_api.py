@@ -0,0 +1,86 @@
+import io
+import os
+import sys
+import struct
+import subprocess
+
+import pytest
+
+from MIPS_Simulator import Simulator, process_exit_status, TEXT_BASE
+from MIPS_Assembler import assemble
+from MIPS_Benchmark import BENCHMARK_DIRECTORY
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Counts $t0 up to 100, then exits with the status in $a0
+COUNT = """.text
+main:
+\taddi $t1, $zero, 100
+loop:
+\taddi $t0, $t0, 1
+\tbne $t0, $t1, loop
+\taddi $v0, $zero, 17
+\tsyscall
+"""
+
+
+def loaded(source, translate=True, inputs=()):
+    simulator = Simulator(list(inputs), io.StringIO(), echo=False, translate=translate)
+    simulator.load_program(source, assemble(source).to_object())
+    return simulator
+
+
+def test_step_and_run_stop_after_the_instructions_asked_for():
+    simulator = loaded(COUNT)
+    assert simulator.step(3) is None
+    assert simulator.current_loop_count == 3
+    assert simulator.get_register(8) == 1
+    assert simulator.PC == TEXT_BASE + 4
+    assert simulator.run(50) is None
+    assert simulator.current_loop_count == 53
+    assert simulator.get_register(8) == 26
+    simulator.set_register(4, 7)
+    assert simulator.run() == 7
+    assert simulator.get_register(8) == 100
+    assert simulator.current_loop_count == 1 + 2 * 100 + 2
+
+
+def test_write_memory_replaces_translated_code():
+    simulator = loaded(COUNT)
+    simulator.run(9)        # $t0 is 4
+    # addi $t0, $t0, 1 becomes addi $t0, $t0, 2, in the loop already translated
+    word = struct.unpack('<I', simulator.read_memory(TEXT_BASE + 4, 4))[0]
+    simulator.write_memory(TEXT_BASE + 4, struct.pack('<I', (word & ~0xFFFF) | 2))
+    assert simulator.run(1000) is not None
+    assert simulator.get_register(8) == 100
+    assert simulator.current_loop_count == 9 + 2 * 48 + 2
+
+
+@pytest.mark.parametrize('status, process_status', [(0, 0), (3, 3), (255, 255), (256, 1), (-1, 1)])
+def test_exit_status(tmp_path, status, process_status):
+    simulator = loaded(COUNT)
+    simulator.set_register(4, status)
+    assert process_exit_status(simulator.run()) == process_status
+    (tmp_path / "count.asm").write_text(COUNT.replace("main:", "main:\n\taddi $a0, $zero, " + str(status)))
+    (tmp_path / "count.bin").write_bytes(assemble((tmp_path / "count.asm").read_text()).to_object())
+    (tmp_path / "checkpoints.txt").write_text("")
+    (tmp_path / "empty.in").write_text("")
+    command = [sys.executable, os.path.join(REPOSITORY, "MIPS_Simulator.py"), "count.asm", "count.bin",
+               "checkpoints.txt", "empty.in", "out.txt", "--quiet"]
+    assert subprocess.run(command, cwd=tmp_path).returncode == process_status
+
+
+@pytest.mark.parametrize('name', ['recursion', 'self_modifying', 'sbrk_alloc'])
+def test_translated_and_interpreted_runs_end_in_the_same_state(name):
+    with open(os.path.join(BENCHMARK_DIRECTORY, name + '.asm'), 'r') as MIPS_file:
+        source = MIPS_file.read()
+    with open(os.path.join(BENCHMARK_DIRECTORY, name + '.in'), 'r') as in_file:
+        inputs = in_file.read().splitlines()
+    translated = loaded(source, True, inputs)
+    interpreted = loaded(source, False, inputs)
+    assert translated.run() == interpreted.run() == 0
+    assert translated.out_file.getvalue() == interpreted.out_file.getvalue()
+    assert translated.current_loop_count == interpreted.current_loop_count
+    assert list(translated.General_Purpose) == list(interpreted.General_Purpose)
+    assert (translated.PC, translated.Hi, translated.Lo) == (interpreted.PC, interpreted.Hi, interpreted.Lo)
+    assert translated.memory == interpreted.memory
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+
+# Prints the characters 'a' to 'e', reads a line, prints the integer read and exits
+PRINT_THEN_READ = """.text
+\taddi $t0, $zero, 97
+\taddi $t1, $zero, 102
+loop:
+\taddu $a0, $t0, $zero
+\taddi $v0, $zero, 11
+\tsyscall
+\taddi $t0, $t0, 1
+\tbne $t0, $t1, loop
+\taddi $v0, $zero, 5
+\tsyscall
+\taddu $a0, $v0, $zero
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def loaded(inputs, out_file):
+    simulator = Simulator(inputs, out_file, echo=False)
+    simulator.load_program(PRINT_THEN_READ, assemble(PRINT_THEN_READ).to_object())
+    return simulator
+
+
+def test_input_is_read_when_the_program_needs_it():
+    read = []
+
+    def lines():
+        for line in ["7\n", "unused\n"]:
+            read.append(line)
+            yield line
+    simulator = loaded(lines(), io.StringIO())
+    simulator.run(28)
+    assert read == []
+    assert simulator.run() == 0
+    assert read == ["7\n"]
+    assert simulator.current_input_index == 1
+    assert simulator.out_file.getvalue() == "abcde7"
+
+
+def test_missing_input_line_is_reported():
+    simulator = loaded([], io.StringIO())
+    with pytest.raises(EOFError, match="No input line left for instruction 28"):
+        simulator.run()
+    assert simulator.out_file.getvalue() == "abcde"
@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import subprocess
+
+from MIPS_Simulator import Simulator
+from MIPS_Assembler import assemble
+from MIPS_Trace import TraceRecorder, read_trace, render, TRACE_RING
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYSCALLS = """.data
+name: .asciiz "xout.txt"
+.text
+\taddi $v0, $zero, 5
+\tsyscall
+\taddi $v0, $zero, 13
+\tlui $a0, 0x50
+\tsyscall
+\taddi $v0, $zero, 15
+\tlui $a1, 0x50
+\taddi $a2, $zero, 4
+\tsyscall
+\taddi $v0, $zero, 1
+\tsyscall
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+LOOP = """.text
+\taddi $t0, $zero, 20000
+loop:
+\taddi $t0, $t0, -1
+\tbne $t0, $zero, loop
+\taddi $v0, $zero, 10
+\tsyscall
+"""
+
+
+def recorded(source, filename, inputs=(), ring=None):
+    simulator = Simulator(iter(inputs), io.StringIO(), echo=False)
+    simulator.load_program(source, assemble(source).to_object())
+    recorder = TraceRecorder(simulator, str(filename), ring)
+    assert recorder.run() == 0
+    return read_trace(str(filename))
+
+
+def test_syscall_records_the_register_it_writes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    header, records = recorded(SYSCALLS, tmp_path / "trace", ["42"])
+    syscalls = {step: render(record) for step, record in enumerate(records) if record[2] == 0xC}
+    assert syscalls[1].endswith("# $v0 = 0x2a")      # read integer
+    assert syscalls[4].endswith("# $a0 = " + hex(records[4][3]))    # open, the file descriptor in $a0
+    assert syscalls[8].endswith("# $a0 = 0x4")       # write, the length in $a0
+    assert "#" not in syscalls[10]                     # print integer writes no register
+    assert (tmp_path / "out.txt").read_bytes() == b"xout"
+
+
+def test_ring_keeps_the_last_steps(tmp_path):
+    header, records = recorded(LOOP, tmp_path / "trace", ring=100)
+    assert header['flags'] == TRACE_RING
+    assert header['count'] == 100
+    assert records[-1][0] == 1 + 2 * 20000 + 1
+    assert render(records[-1]).split()[3] == "syscall"
+
+
+def test_decode_into_a_closed_pipe(tmp_path):
+    recorded(LOOP, tmp_path / "trace")
+    decoder = subprocess.Popen([sys.executable, os.path.join(REPOSITORY, "MIPS_Trace.py"), "decode",
+                                str(tmp_path / "trace")], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    first_line = decoder.stdout.readline()
+    decoder.stdout.close()
+    errors = decoder.stderr.read()
+    decoder.wait()
+    assert b"addi $t0, $zero, 20000" in first_line
+    assert b"BrokenPipeError" not in errors and b"Traceback" not in errors